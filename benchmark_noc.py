@@ -0,0 +1,569 @@
+"""
+BENCHMARK DO NOC COMMANDER v12
+
+DESCRIÇÃO:
+    Mede, de forma reprodutível e sem acesso à rede, os caminhos quentes de
+    coleta e transmissão do noc_commander_v12_melhorado.py:
+
+    ✓ Latência do tick (coleta → alertas → JSON → último cliente) em p50/p95/p99
+    ✓ CPU do servidor por cliente e por tick
+    ✓ Bytes por quadro enviado ao WebSocket (quadros completos e deltas)
+    ✓ Custo da avaliação de alertas
+    ✓ Custo das linhas de base (anomalias) com milhares de séries
+    ✓ Vazão do registro de eventos
+    ✓ Tempo de importação a frio (cold start)
+
+    O ping, os contadores do psutil e os clientes WebSocket são substituídos
+    por versões falsas e determinísticas. Logs vão para um diretório
+    temporário, nunca para o noc_commander.log do projeto.
+
+EXECUÇÃO:
+    python benchmark_noc.py                          # matriz completa
+    python benchmark_noc.py --rapido                 # matriz reduzida
+    python benchmark_noc.py --saida atual.json --comparar anterior.json
+
+    Com --comparar, o código de saída é 1 se alguma métrica piorar além
+    da tolerância (padrão 15%).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+MODULO_NOC = "noc_commander_v12_melhorado"
+
+VERSAO_FORMATO = 1
+SEMENTE = 12
+PROCESSOS_SIMULADOS = 400
+INTERFACES_SIMULADAS = ("lo", "eth0", "eth1", "wg0")
+DISCOS_SIMULADOS = ("sda", "sdb", "nvme0n1")
+
+# Métricas comparadas entre execuções: nome -> True se "maior é pior"
+METRICAS_CENARIO = {
+    "tick_p50_ms": True,
+    "tick_p95_ms": True,
+    "cpu_ms_por_cliente_tick": True,
+    "bytes_por_quadro": True,
+    "quadros_por_s": False,
+}
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 1. DUBLÊS DETERMINÍSTICOS (ping, psutil e WebSocket)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class PingFalso:
+    """Substituto de ping3.ping: latência pseudo-aleatória e ~2% de perdas."""
+
+    def __init__(self, semente: int = SEMENTE):
+        self._aleatorio = random.Random(semente)
+
+    def __call__(self, host: str, timeout: int = 2, unit: str = "ms") -> Optional[float]:
+        if self._aleatorio.random() < 0.02:
+            return None
+        return self._aleatorio.uniform(2.0, 80.0)
+
+ContadoresRede = namedtuple("ContadoresRede", "bytes_sent bytes_recv packets_sent packets_recv "
+                                              "errin errout dropin dropout")
+ContadoresDisco = namedtuple("ContadoresDisco", "read_count write_count read_bytes write_bytes "
+                                                "read_time write_time busy_time")
+
+class ProcessoFalso:
+    """Processo sintético com contadores crescentes (para RastreadorProcessos)."""
+
+    def __init__(self, pid: int, aleatorio: random.Random):
+        self.pid = pid
+        self._aleatorio = aleatorio
+        self._cpu = 0.0
+        self._io = 0
+
+    def oneshot(self):
+        return contextlib.nullcontext()
+
+    def name(self):
+        return f"proc{self.pid}"
+
+    def cpu_times(self):
+        self._cpu += self._aleatorio.uniform(0.0, 0.05)
+        return SimpleNamespace(user=self._cpu, system=0.0)
+
+    def memory_info(self):
+        return SimpleNamespace(rss=(self.pid % 97 + 1) * 4 * 1024 ** 2)
+
+    def io_counters(self):
+        self._io += self._aleatorio.randint(0, 100_000)
+        return SimpleNamespace(read_bytes=self._io, write_bytes=self._io // 2)
+
+class PsutilFalso:
+    """
+    Substituto do módulo psutil com contadores sintéticos e sem esperas.
+    Atributos não simulados (exceções, constantes) vêm do psutil real.
+    """
+
+    def __init__(self, psutil_real, semente: int = SEMENTE):
+        self._real = psutil_real
+        self._aleatorio = random.Random(semente)
+        self._rx = 0
+        self._tx = 0
+        self._io = 0
+        self._processos = {pid: ProcessoFalso(pid, self._aleatorio)
+                           for pid in range(1000, 1000 + PROCESSOS_SIMULADOS)}
+
+    def __getattr__(self, nome):
+        return getattr(self._real, nome)
+
+    def cpu_percent(self, interval=None, percpu=False):
+        return round(self._aleatorio.uniform(5.0, 99.0), 1)
+
+    def virtual_memory(self):
+        return SimpleNamespace(percent=round(self._aleatorio.uniform(30.0, 97.0), 1),
+                               total=16 * 1024 ** 3)
+
+    def disk_usage(self, caminho):
+        return SimpleNamespace(percent=61.3, total=512 * 1024 ** 3)
+
+    def cpu_count(self, logical=True):
+        return 8
+
+    def pids(self):
+        return list(self._processos)
+
+    def Process(self, pid):
+        return self._processos[pid]
+
+    def net_io_counters(self, pernic=False):
+        self._rx += self._aleatorio.randint(10_000, 5_000_000)
+        self._tx += self._aleatorio.randint(1_000, 1_000_000)
+        contadores = ContadoresRede(bytes_sent=self._tx, bytes_recv=self._rx,
+                                    packets_sent=self._tx // 1200, packets_recv=self._rx // 1200,
+                                    errin=0, errout=0, dropin=0, dropout=0)
+        if not pernic:
+            return contadores
+        return {nome: contadores for nome in INTERFACES_SIMULADAS}
+
+    def net_if_stats(self):
+        return {nome: SimpleNamespace(speed=1000) for nome in INTERFACES_SIMULADAS}
+
+    def disk_io_counters(self, perdisk=False):
+        self._io += self._aleatorio.randint(0, 50_000_000)
+        contadores = ContadoresDisco(self._io // 4096, self._io // 8192, self._io, self._io // 2,
+                                     self._io // 10 ** 6, self._io // 10 ** 6, self._io // 10 ** 6)
+        if not perdisk:
+            return contadores
+        return {nome: contadores for nome in DISCOS_SIMULADOS}
+
+    def disk_partitions(self, all=False):
+        return [SimpleNamespace(device=f"/dev/{nome}", mountpoint=f"/mnt/{nome}", fstype="ext4")
+                for nome in DISCOS_SIMULADOS]
+
+class WebSocketFalso:
+    """Cliente WebSocket em processo: conta quadros e bytes recebidos."""
+
+    def __init__(self, indice: int, quadros: int, desconectar, mensagens: List[str] = ()):
+        self.client = SimpleNamespace(host="bench", port=indice)
+        self.quadros_previstos = quadros
+        self.quadros = 0
+        self.bytes = 0
+        self._desconectar = desconectar
+        self._mensagens = list(mensagens)
+
+    async def accept(self):
+        return None
+
+    async def send_text(self, texto: str):
+        self.bytes += len(texto.encode("utf-8"))
+        self.quadros += 1
+        if self.quadros >= self.quadros_previstos:
+            raise self._desconectar()
+
+    async def send_json(self, dados):
+        await self.send_text(json.dumps(dados, ensure_ascii=False, separators=(",", ":")))
+
+    async def receive_text(self):
+        if self._mensagens:
+            return self._mensagens.pop(0)
+        await asyncio.sleep(3600)
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 2. PREPARAÇÃO DO MÓDULO SOB TESTE
+# ═══════════════════════════════════════════════════════════════════════════
+
+def carregar_noc(diretorio_trabalho: str):
+    """
+    Importa o NOC Commander isolado: logs no diretório temporário, sem
+    WhatsApp, sem GPU/WMI e com ping/psutil falsos.
+    """
+    os.chdir(diretorio_trabalho)
+    if DIRETORIO not in sys.path:
+        sys.path.insert(0, DIRETORIO)
+    noc = importlib.import_module(MODULO_NOC)
+
+    # Manter só o arquivo de log (temporário); o console fica para o relatório
+    noc.LOG_LISTENER.handlers = tuple(
+        h for h in noc.LOG_LISTENER.handlers if type(h) is not logging.StreamHandler
+    )
+
+    noc.psutil = PsutilFalso(noc.psutil)
+    noc.DEPENDENCIAS["ping3"].definir(PingFalso())
+    noc.DEPENDENCIAS["gputil"].definir(None)
+    noc.DEPENDENCIAS["wmi"].definir(None)
+    noc.DEPENDENCIAS["pynvml"].definir(None)
+    noc.CONFIG["COLETORES"] = ["gpu_falsa", "temperatura_falsa"]
+    noc.CONFIG["WPP_HABILITADO"] = False
+    noc.CONFIG["COLETA_INTERVALO"] = 0
+    noc.CONFIG["CONEXOES_INTERVALO"] = 0  # Tabela TCP medida à parte (medir_conexoes)
+    noc.PERF.habilitado = True
+    return noc
+
+def gerar_alvos(quantidade: int) -> List[Dict]:
+    """Gera `quantidade` destinos WAN sintéticos."""
+    return [
+        {"nome": f"Alvo {i:04d}", "ip": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+         "provedor": f"ISP {i % 7}"}
+        for i in range(quantidade)
+    ]
+
+def reiniciar_estado(noc) -> None:
+    """Zera contadores e eventos entre cenários."""
+    noc.ESTADO.publicar(
+        eventos=[],
+        contadores_alertas={chave: 0 for chave in noc.ESTADO["contadores_alertas"]},
+    )
+    noc._ALERTAS_ATIVOS.clear()
+    noc.PERF.reiniciar()
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 3. CENÁRIOS
+# ═══════════════════════════════════════════════════════════════════════════
+
+async def executar_cenario(noc, clientes: int, alvos: int, ticks: int, delta: bool = False) -> Dict:
+    """
+    Conecta `clientes` WebSockets falsos ao hub, executa `ticks` ciclos de
+    coleta + publicação com `alvos` destinos e mede cada ciclo até o
+    último cliente receber o quadro. Com `delta`, os clientes assinam
+    diferenças em vez de quadros completos.
+    """
+    noc.ALVOS_WAN[:] = gerar_alvos(alvos)
+    reiniciar_estado(noc)
+    noc.HUB.ultimo_quadro = None
+
+    mensagens = [json.dumps({"assinar": {"delta": True}})] if delta else []
+    sockets = [WebSocketFalso(i, ticks, noc.WebSocketDisconnect, mensagens) for i in range(clientes)]
+    tarefas = [asyncio.create_task(noc.ws_endpoint(ws)) for ws in sockets]
+    await asyncio.sleep(0)
+    coletor = noc.ColetorMetricas()
+
+    latencias = []
+    cpu_inicio = time.process_time()
+    inicio = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        inicio_tick = time.perf_counter()
+        await noc.publicar_snapshot(coletor.coletar())
+        while any(ws.quadros < tick for ws in sockets):
+            await asyncio.sleep(0)
+        latencias.append((time.perf_counter() - inicio_tick) * 1000)
+    duracao = time.perf_counter() - inicio
+    cpu_ms = (time.process_time() - cpu_inicio) * 1000
+    await asyncio.gather(*tarefas)
+
+    quadros = sum(ws.quadros for ws in sockets)
+    latencias.sort()
+
+    def percentil(p: float) -> float:
+        return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))], 3)
+
+    return {
+        "clientes": clientes,
+        "alvos": alvos,
+        "delta": delta,
+        "ticks": ticks,
+        "tick_p50_ms": percentil(0.50),
+        "tick_p95_ms": percentil(0.95),
+        "tick_p99_ms": percentil(0.99),
+        "cpu_ms_por_cliente_tick": round(cpu_ms / max(1, quadros), 4),
+        "cpu_percent": round(cpu_ms / 10 / duracao, 1) if duracao else 0.0,
+        "bytes_por_quadro": round(sum(ws.bytes for ws in sockets) / max(1, quadros), 1),
+        "quadros_por_s": round(quadros / duracao, 1) if duracao else 0.0,
+        "duracao_s": round(duracao, 3),
+    }
+
+def medir_importacao(diretorio_trabalho: str, repeticoes: int = 3) -> Dict:
+    """
+    Mede a importação a frio do módulo em subprocessos novos (melhor de N).
+    Não inclui a sondagem das dependências opcionais, feita após o início.
+    """
+    codigo = (f"import sys; sys.path.insert(0, {DIRETORIO!r}); import {MODULO_NOC} as noc; "
+              "print(noc.TEMPOS_INICIALIZACAO['importacao_ms']); noc.encerrar_logging()")
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        processo = subprocess.run([sys.executable, "-c", codigo], cwd=diretorio_trabalho,
+                                  capture_output=True, text=True, timeout=120)
+        total = (time.perf_counter() - inicio) * 1000
+        linhas = processo.stdout.strip().splitlines()
+        if processo.returncode == 0 and linhas:
+            tempos.append((float(linhas[-1]), total))
+    if not tempos:
+        return {"importacao_ms": 0.0, "processo_ms": 0.0}
+    return {"importacao_ms": min(t[0] for t in tempos),
+            "processo_ms": round(min(t[1] for t in tempos), 1)}
+
+def medir_alertas(noc, alvos: int, repeticoes: int) -> Dict:
+    """Mede o custo de avaliar_alertas() para `alvos` destinos."""
+    aleatorio = random.Random(SEMENTE)
+    wan = [
+        {"nome": alvo["nome"], "status": "DOWN" if aleatorio.random() < 0.05 else "UP",
+         "latencia_ms": round(aleatorio.uniform(2, 250), 1), "perda_pacotes": 0.0}
+        for alvo in gerar_alvos(alvos)
+    ]
+    amostras = [(aleatorio.uniform(5, 99), aleatorio.uniform(30, 97)) for _ in range(repeticoes)]
+    reiniciar_estado(noc)
+
+    inicio = time.perf_counter()
+    for cpu, ram in amostras:
+        noc.avaliar_alertas(cpu, ram, wan)
+    duracao = time.perf_counter() - inicio
+
+    return {"alvos": alvos, "repeticoes": repeticoes,
+            "us_por_avaliacao": round(duracao * 1e6 / repeticoes, 3)}
+
+def medir_anomalias(noc, series: int, ticks: int) -> Dict:
+    """Mede o custo de LinhasDeBase.atualizar() com `series` séries por tick."""
+    aleatorio = random.Random(SEMENTE)
+    bases = noc.LinhasDeBase()
+    chaves = [f"latencia/Alvo {i:05d}" for i in range(series)]
+    amostras = [[aleatorio.uniform(2, 250) for _ in range(series)] for _ in range(ticks)]
+    t = time.time()
+
+    inicio = time.perf_counter()
+    for indice, valores in enumerate(amostras):
+        bases.atualizar(chaves, valores, t + indice)
+    duracao = time.perf_counter() - inicio
+
+    return {"series": series, "ticks": ticks, "ms_por_tick": round(duracao * 1000 / ticks, 3),
+            "numpy": noc.DEPENDENCIAS["numpy"].disponivel}
+
+def medir_eventos(noc, quantidade: int) -> Dict:
+    """Mede a vazão de registrar_evento() (inclui enfileirar o log)."""
+    reiniciar_estado(noc)
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        noc.registrar_evento("BENCH", "INFO", f"Evento sintético {i}", "Benchmark", float(i))
+    duracao = time.perf_counter() - inicio
+    reiniciar_estado(noc)
+    return {"eventos": quantidade, "eventos_por_s": round(quantidade / duracao, 1) if duracao else 0.0}
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 4. RESULTADOS E COMPARAÇÃO
+# ═══════════════════════════════════════════════════════════════════════════
+
+def medir_conexoes(noc, diretorio_trabalho: str, sockets: int) -> Dict:
+    """
+    Mede ColetorConexoes.amostrar() sobre uma tabela sintética no formato
+    de /proc/net/tcp com `sockets` linhas (independe das conexões reais).
+    """
+    aleatorio = random.Random(SEMENTE)
+    estados = ["01"] * 6 + ["06"] * 3 + ["08", "03"]
+    caminho = os.path.join(diretorio_trabalho, "tcp_sintetico")
+    with open(caminho, "w", encoding="ascii") as arquivo:
+        arquivo.write("  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt"
+                      "   uid  timeout inode\n")
+        for i in range(sockets):
+            porta = aleatorio.choice((0x01BB, 0x0050, 0x1F90, 0x0CEA))
+            remoto = f"{aleatorio.randrange(1, 2 ** 32):08X}:{aleatorio.randrange(1024, 65536):04X}"
+            arquivo.write(f"{i:6d}: 0100007F:{porta:04X} {remoto} {aleatorio.choice(estados)} "
+                          f"00000000:00000000 00:00000000 00000000  1000        0 {100000 + i} "
+                          f"1 0000000000000000 20 4 30 10 -1\n")
+
+    coletor = noc.ColetorConexoes(arquivos=[caminho])
+    coletor.amostrar()  # Aquecimento (cache de página)
+    inicio = time.perf_counter()
+    resumo = coletor.amostrar()
+    duracao = time.perf_counter() - inicio
+    os.remove(caminho)
+    return {"sockets": sockets, "lidos": resumo["total"], "parcial": resumo["parcial"],
+            "ms_por_amostra": round(duracao * 1000, 1)}
+
+def commit_atual() -> Optional[str]:
+    """Retorna o commit git do projeto, se disponível."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRETORIO,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def comparar(atual: Dict, anterior: Dict, tolerancia: float) -> List[str]:
+    """
+    Compara dois resultados e lista as regressões acima da tolerância.
+
+    Args:
+        atual: Resultado desta execução
+        anterior: Resultado de referência (ex: release anterior)
+        tolerancia: Piora relativa aceitável (0.15 = 15%)
+    """
+    regressoes = []
+
+    def verificar(rotulo: str, nome: str, novo: float, antigo: float, maior_pior: bool):
+        if not antigo:
+            return
+        variacao = (novo - antigo) / antigo
+        if (variacao if maior_pior else -variacao) > tolerancia:
+            regressoes.append(f"{rotulo} {nome}: {antigo} -> {novo} ({variacao:+.1%})")
+
+    referencia = {(c["clientes"], c["alvos"], c.get("delta", False)): c for c in anterior.get("cenarios", [])}
+    for cenario in atual["cenarios"]:
+        base = referencia.get((cenario["clientes"], cenario["alvos"], cenario["delta"]))
+        if base is None:
+            continue
+        rotulo = f"[{cenario['clientes']} clientes x {cenario['alvos']} alvos{' delta' if cenario['delta'] else ''}]"
+        for nome, maior_pior in METRICAS_CENARIO.items():
+            verificar(rotulo, nome, cenario[nome], base.get(nome, 0), maior_pior)
+
+    alertas_base = {a["alvos"]: a for a in anterior.get("alertas", [])}
+    for item in atual["alertas"]:
+        base = alertas_base.get(item["alvos"])
+        if base:
+            verificar(f"[alertas {item['alvos']} alvos]", "us_por_avaliacao",
+                      item["us_por_avaliacao"], base["us_por_avaliacao"], True)
+
+    anomalias_base = {a["series"]: a for a in anterior.get("anomalias", [])}
+    for item in atual["anomalias"]:
+        base = anomalias_base.get(item["series"])
+        if base:
+            verificar(f"[anomalias {item['series']} séries]", "ms_por_tick",
+                      item["ms_por_tick"], base["ms_por_tick"], True)
+
+    if anterior.get("conexoes"):
+        verificar(f"[conexões {atual['conexoes']['sockets']} sockets]", "ms_por_amostra",
+                  atual["conexoes"]["ms_por_amostra"], anterior["conexoes"]["ms_por_amostra"], True)
+
+    if anterior.get("inicializacao"):
+        verificar("[inicialização]", "importacao_ms", atual["inicializacao"]["importacao_ms"],
+                  anterior["inicializacao"]["importacao_ms"], True)
+
+    if anterior.get("eventos"):
+        verificar("[eventos]", "eventos_por_s", atual["eventos"]["eventos_por_s"],
+                  anterior["eventos"]["eventos_por_s"], False)
+
+    return regressoes
+
+def imprimir_relatorio(resultado: Dict) -> None:
+    """Mostra uma tabela resumida no console."""
+    print(f"{'clientes':>8} {'alvos':>6} {'delta':>6} {'p50 ms':>9} {'p95 ms':>9} {'cpu ms/cli':>11} "
+          f"{'bytes/q':>10} {'quadros/s':>10}")
+    for c in resultado["cenarios"]:
+        print(f"{c['clientes']:>8} {c['alvos']:>6} {'sim' if c['delta'] else 'não':>6} {c['tick_p50_ms']:>9} "
+              f"{c['tick_p95_ms']:>9} {c['cpu_ms_por_cliente_tick']:>11} {c['bytes_por_quadro']:>10} "
+              f"{c['quadros_por_s']:>10}")
+    for a in resultado["alertas"]:
+        print(f"alertas: {a['alvos']} alvos -> {a['us_por_avaliacao']} µs/avaliação")
+    for a in resultado["anomalias"]:
+        print(f"anomalias: {a['series']} séries -> {a['ms_por_tick']} ms/tick"
+              f"{'' if a['numpy'] else ' (sem NumPy)'}")
+    print(f"eventos: {resultado['eventos']['eventos_por_s']} eventos/s")
+    conexoes = resultado["conexoes"]
+    print(f"conexões TCP: {conexoes['sockets']} sockets -> {conexoes['ms_por_amostra']} ms/amostra"
+          f"{' (parcial: ' + str(conexoes['lidos']) + ' lidos)' if conexoes['parcial'] else ''}")
+    print(f"importação a frio: {resultado['inicializacao']['importacao_ms']} ms "
+          f"(processo completo: {resultado['inicializacao']['processo_ms']} ms)")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 5. PONTO DE ENTRADA
+# ═══════════════════════════════════════════════════════════════════════════
+
+def lista_inteiros(texto: str) -> List[int]:
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline do NOC Commander v12")
+    parser.add_argument("--clientes", type=lista_inteiros, default=[1, 10, 100, 500])
+    parser.add_argument("--alvos", type=lista_inteiros, default=[3, 100, 1000])
+    parser.add_argument("--ticks", type=int, default=20, help="Quadros por cliente")
+    parser.add_argument("--rapido", action="store_true", help="Matriz reduzida (1,10 x 3,100)")
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", help="Resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    if args.rapido:
+        args.clientes, args.alvos, args.ticks = [1, 10], [3, 100], 10
+
+    saida = os.path.abspath(args.saida)
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+
+    random.seed(SEMENTE)
+    with tempfile.TemporaryDirectory(prefix="noc_bench_") as temporario:
+        noc = carregar_noc(temporario)
+
+        cenarios = []
+        for alvos in args.alvos:
+            # Aquecimento: caches, imports tardios e alocações iniciais
+            asyncio.run(executar_cenario(noc, 1, alvos, args.ticks))
+            for clientes in args.clientes:
+                cenario = asyncio.run(executar_cenario(noc, clientes, alvos, args.ticks))
+                print(f"✓ {clientes} clientes x {alvos} alvos: "
+                      f"p95 {cenario['tick_p95_ms']} ms", flush=True)
+                cenarios.append(cenario)
+            # Protocolo de deltas com o maior número de clientes
+            clientes = max(args.clientes)
+            cenario = asyncio.run(executar_cenario(noc, clientes, alvos, args.ticks, delta=True))
+            print(f"✓ {clientes} clientes x {alvos} alvos (delta): "
+                  f"p95 {cenario['tick_p95_ms']} ms, {cenario['bytes_por_quadro']} bytes/quadro", flush=True)
+            cenarios.append(cenario)
+
+        resultado = {
+            "formato": VERSAO_FORMATO,
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "ambiente": {
+                "commit": commit_atual(),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "parametros": {"clientes": args.clientes, "alvos": args.alvos,
+                           "ticks": args.ticks, "semente": SEMENTE},
+            "cenarios": cenarios,
+            "alertas": [medir_alertas(noc, alvos, 2000) for alvos in args.alvos],
+            "anomalias": [medir_anomalias(noc, series, 50) for series in (100, 5000)],
+            "eventos": medir_eventos(noc, 20000),
+            "conexoes": medir_conexoes(noc, temporario, 100_000),
+            "inicializacao": medir_importacao(temporario),
+        }
+        noc.encerrar_logging()
+        os.chdir(DIRETORIO)
+
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    imprimir_relatorio(resultado)
+    print(f"📄 Resultados: {saida}")
+
+    if anterior is not None:
+        regressoes = comparar(resultado, anterior, args.tolerancia)
+        if regressoes:
+            print(f"❌ {len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for linha in regressoes:
+                print(f"   {linha}")
+            return 1
+        print("✅ Nenhuma regressão acima da tolerância")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,12 +15,28 @@ DESCRIÇÃO:
 
 FUNCIONALIDADES PRINCIPAIS:
     ✓ Monitoramento de CPU, RAM, Disco e GPU em tempo real
+    ✓ Top-N de processos por CPU/memória anexado aos alertas
+    ✓ Taxas de I/O por interface e por disco, uso de todas as partições
+    ✓ Histórico recente em memória (/api/historico)
+    ✓ Todas as GPUs e sensores de temperatura via coletores plugáveis (NVML, GPUtil, WMI, psutil)
+    ✓ Amostragem adaptativa: ociosa sem clientes, rajada de 250 ms perto dos limites
+    ✓ Detecção de anomalias por linha de base (EWMA + perfil por hora do dia)
+    ✓ Disponibilidade, MTTR/MTBF e SLOs por link e provedor (/api/sla)
+    ✓ Histórico e eventos persistidos em arquivos diários; exportação CSV/JSONL/Parquet (/api/export)
     ✓ Testes de velocidade de internet (Speedtest)
+    ✓ Utilização passiva do link (p95/pico sub-segundo, saturação sustentada, speedtests sob carga)
     ✓ Ping em tempo real para múltiplos destinos
+    ✓ Tabela de conexões TCP: estados, top-K por porta e por par remoto, filas de aceite
     ✓ Dashboard interativo via WebSocket
+    ✓ WebSocket com deltas e assinatura por alvo; render incremental (rAF) no navegador
+    ✓ Sparklines em canvas (CPU, RAM, rede, latência por alvo) com histórico float32 ao conectar
+    ✓ Recursos do dashboard com hash, pré-comprimidos (gzip/brotli) e cacheáveis; sem internet
     ✓ Alertas críticos com notificação WhatsApp
     ✓ Histórico de eventos e incidentes
     ✓ Suporte para Windows, Linux e macOS
+    ✓ Instrumentação interna de desempenho (/api/debug/perf)
+    ✓ Gravação e reprodução de snapshots (.nocrec)
+    ✓ Log assíncrono com rotação, compressão e JSON-lines opcional
 
 REQUISITOS:
     - Python 3.8 ou superior
@@ -29,7 +45,9 @@ REQUISITOS:
     - requests
     - ping3 (opcional)
     - speedtest-cli (opcional)
-    - GPUtil (opcional)
+    - GPUtil ou nvidia-ml-py (opcional)
+    - numpy (opcional)
+    - brotli (opcional)
     - WMI (Windows apenas)
 
 INSTALAÇÃO:
@@ -39,41 +57,276 @@ EXECUÇÃO:
     python noc_commander_v12_melhorado.py
     Acesse: http://localhost:8000
 
+GRAVAÇÃO E REPRODUÇÃO:
+    python noc_commander_v12_melhorado.py --gravar incidente.nocrec
+    python noc_commander_v12_melhorado.py --reproduzir incidente.nocrec --velocidade 100
+
+MÚLTIPLOS WORKERS (um coletor, N processos atendendo WebSocket/REST):
+    python noc_commander_v12_melhorado.py --workers 4
+
+EXPORTAÇÃO (streaming, memória constante):
+    curl -o marco.csv.gz "http://localhost:8000/api/export?inicio=2026-03-01&fim=2026-04-01&compactar=true"
+    curl "http://localhost:8000/api/export?tipo=eventos&formato=jsonl&alvos=Google%20DNS"
+
+FONTES DO DASHBOARD (rede sem internet):
+    Copie Inter-400.woff2, Inter-600.woff2, Inter-800.woff2, JetBrains Mono-500.woff2
+    e JetBrains Mono-700.woff2 para a pasta fontes/ ao lado do script
+
+COLETORES DE HARDWARE SIMULADOS (máquinas sem GPU/sensores):
+    python noc_commander_v12_melhorado.py --coletores gpu_falsa,temperatura_falsa
+
+BENCHMARK:
+    python benchmark_noc.py --rapido --comparar resultados_anteriores.json
+
 HISTÓRICO DE VERSÕES:
     v12.0 - Refatoração completa com documentação profissional
     v11.0 - Versão anterior com funcionalidades básicas
 """
 
+import time
+_INICIO_IMPORTACAO = time.perf_counter()  # Medição de cold start (TEMPOS_INICIALIZACAO)
+
+import array
 import asyncio
+import atexit
+import base64
+import bisect
+import contextlib
+import csv
+import fnmatch
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import math
 import random
+import struct
+import zlib
 import psutil
 import os
 import platform
-import time
 import socket
+import sys
 import threading
 import logging
+import logging.handlers
+import queue
+import re
+import shutil
 import requests
 import urllib.parse
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
-from fastapi import FastAPI, WebSocket
-from fastapi.responses import HTMLResponse, FileResponse
+from multiprocessing import shared_memory
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
 # ═══════════════════════════════════════════════════════════════════════════
 # 1. CONFIGURAÇÃO DE LOGGING
 # ═══════════════════════════════════════════════════════════════════════════
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] NOC-v12: %(message)s",
-    handlers=[
-        logging.FileHandler("noc_commander.log"),
-        logging.StreamHandler()
-    ]
-)
+# Papel do processo: "unico" (padrão), "coletor" ou "leitor" (worker uvicorn).
+# Com vários workers, só o processo coletor grava o arquivo de log.
+PAPEL_PROCESSO = os.environ.get("NOC_PAPEL", "unico")
+
+# Definida antes de CONFIG porque o log já é usado durante as importações
+CONFIG_LOG = {
+    "ARQUIVO": "noc_commander.log",
+    "NIVEL": logging.INFO,
+    "MAX_BYTES": 10 * 1024 * 1024,   # Gira ao atingir 10 MB...
+    "ROTACAO_DIARIA": True,          # ...ou na virada do dia
+    "BACKUPS": 14,                   # Arquivos antigos mantidos
+    "COMPRIMIR": True,               # Arquivos girados viram .gz
+    "JSON": False,                   # Arquivo em JSON-lines (um objeto por linha)
+    "LIMITE_REPETICOES": 5,          # Mensagens iguais aceitas por janela (0 = sem limite)
+    "JANELA_REPETICOES": 60,         # Segundos
+}
+
+FORMATO_LOG = "%(asctime)s [%(levelname)s] NOC-v12: %(message)s"
+
+class ArquivoLogRotativo(logging.handlers.RotatingFileHandler):
+    """
+    Arquivo de log que gira por tamanho e, opcionalmente, na virada do dia.
+    Os arquivos girados são comprimidos com gzip (noc_commander.log.1.gz, ...).
+    """
+    
+    def __init__(self, arquivo: str, max_bytes: int, backups: int,
+                 diario: bool = True, comprimir: bool = True):
+        super().__init__(arquivo, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        self.diario = diario
+        self._dia = time.localtime()[:3]
+        if comprimir:
+            self.namer = lambda nome: nome + ".gz"
+            self.rotator = self._comprimir
+    
+    @staticmethod
+    def _comprimir(origem: str, destino: str) -> None:
+        with open(origem, "rb") as entrada, gzip.open(destino, "wb") as saida:
+            shutil.copyfileobj(entrada, saida)
+        os.remove(origem)
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.diario and time.localtime(record.created)[:3] != self._dia:
+            return True
+        return bool(super().shouldRollover(record))
+    
+    def doRollover(self) -> None:
+        self._dia = time.localtime()[:3]
+        super().doRollover()
+
+class FormatadorJSON(logging.Formatter):
+    """Formata cada registro como um objeto JSON em uma única linha."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False)
+
+class FiltroRepeticoes(logging.Filter):
+    """
+    Limita mensagens repetidas a `limite` por `janela` segundos.
+    
+    Mensagens que só diferem nos números ("CPU CRÍTICA: 96.1%" e
+    "CPU CRÍTICA: 97.4%") contam como a mesma. Quando uma janela com
+    supressões expira, o total sai numa mensagem própria, via `emitir`
+    (sem passar de novo pelo filtro): no próximo registro de qualquer
+    chave, ao descartar as janelas por excesso de chaves ou em descarregar().
+    """
+    
+    _NUMEROS = re.compile(r"\d+(?:[.,]\d+)?")
+    _MAX_CHAVES = 2048
+    
+    def __init__(self, limite: int, janela: float, emitir: Callable[[logging.LogRecord], None]):
+        super().__init__()
+        self.limite = limite
+        self.janela = janela
+        self.emitir = emitir
+        # chave -> [início, aceitas + suprimidas, suprimidas, último registro suprimido]
+        self._janelas: Dict[Tuple, List] = {}
+        self._proximo_resumo = math.inf  # Primeira expiração entre as janelas com supressões
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limite <= 0:
+            return True
+        
+        chave = (record.name, record.levelno, self._NUMEROS.sub("#", str(record.msg)))
+        with self._lock:
+            resumos = self._expirar(record.created) if record.created >= self._proximo_resumo else []
+            janela = self._janelas.get(chave)
+            if janela is None or record.created - janela[0] >= self.janela:
+                if len(self._janelas) >= self._MAX_CHAVES:
+                    resumos += self._expirar(math.inf)
+                self._janelas[chave] = [record.created, 1, 0, None]
+                aceito = True
+            else:
+                janela[1] += 1
+                aceito = janela[1] <= self.limite
+                if not aceito:
+                    janela[2] += 1
+                    janela[3] = record
+                    self._proximo_resumo = min(self._proximo_resumo, janela[0] + self.janela)
+        for resumo in resumos:
+            self.emitir(resumo)
+        return aceito
+    
+    def descarregar(self) -> None:
+        """Emite os totais pendentes de todas as janelas (ex: no encerramento)."""
+        with self._lock:
+            resumos = self._expirar(math.inf)
+        for resumo in resumos:
+            self.emitir(resumo)
+    
+    def _expirar(self, agora: float) -> List[logging.LogRecord]:
+        """Remove as janelas expiradas em `agora`; devolve os resumos das que suprimiram algo."""
+        resumos = []
+        proximo = math.inf
+        for chave, (inicio, _, suprimidas, ultimo) in list(self._janelas.items()):
+            if agora - inicio < self.janela:
+                if suprimidas:
+                    proximo = min(proximo, inicio + self.janela)
+                continue
+            del self._janelas[chave]
+            if suprimidas:
+                resumos.append(logging.LogRecord(
+                    ultimo.name, ultimo.levelno, ultimo.pathname, ultimo.lineno,
+                    f"{ultimo.getMessage()} (+{suprimidas} repetições suprimidas em {self.janela}s)",
+                    None, None, ultimo.funcName))
+        self._proximo_resumo = proximo
+        return resumos
+
+_LOG_ATIVO = False  # LOG_LISTENER iniciado e ainda não encerrado
+
+def configurar_logging(gravar_arquivo: bool = True) -> logging.handlers.QueueListener:
+    """
+    Configura o log assíncrono: quem chama `logger.*` apenas enfileira o
+    registro; uma thread de fundo grava no arquivo e no console.
+    
+    Args:
+        gravar_arquivo: False para registrar apenas no console
+    
+    Returns:
+        QueueListener já iniciado
+    """
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(FORMATO_LOG))
+    handlers = [console]
+    
+    if gravar_arquivo:
+        arquivo = ArquivoLogRotativo(
+            CONFIG_LOG["ARQUIVO"],
+            max_bytes=CONFIG_LOG["MAX_BYTES"],
+            backups=CONFIG_LOG["BACKUPS"],
+            diario=CONFIG_LOG["ROTACAO_DIARIA"],
+            comprimir=CONFIG_LOG["COMPRIMIR"],
+        )
+        arquivo.setFormatter(FormatadorJSON() if CONFIG_LOG["JSON"] else logging.Formatter(FORMATO_LOG))
+        handlers.insert(0, arquivo)
+    
+    fila = queue.SimpleQueue()
+    produtor = logging.handlers.QueueHandler(fila)
+    produtor.addFilter(FiltroRepeticoes(CONFIG_LOG["LIMITE_REPETICOES"],
+                                        CONFIG_LOG["JANELA_REPETICOES"], fila.put))
+    
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(produtor)
+    raiz.setLevel(CONFIG_LOG["NIVEL"])
+    
+    global _LOG_ATIVO
+    ouvinte = logging.handlers.QueueListener(fila, *handlers, respect_handler_level=True)
+    ouvinte.start()
+    _LOG_ATIVO = True
+    return ouvinte
+
+def encerrar_logging() -> None:
+    """Esvazia a fila de log e fecha os arquivos (idempotente)."""
+    global _LOG_ATIVO
+    if _LOG_ATIVO:
+        _LOG_ATIVO = False
+        for handler in logging.getLogger().handlers:
+            for filtro in handler.filters:
+                if isinstance(filtro, FiltroRepeticoes):
+                    filtro.descarregar()
+        LOG_LISTENER.stop()
+        for handler in LOG_LISTENER.handlers:
+            handler.close()
+
+LOG_LISTENER = configurar_logging(gravar_arquivo=PAPEL_PROCESSO != "leitor")
+atexit.register(encerrar_logging)
 logger = logging.getLogger("NOC-Commander-v12")
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -117,41 +370,162 @@ class MetricasLocais:
     temperatura_cpu: float
 
 # ═══════════════════════════════════════════════════════════════════════════
-# 3. IMPORTAÇÕES DEFENSIVAS
+# 3. DEPENDÊNCIAS OPCIONAIS (CARREGADAS SOB DEMANDA)
 # ═══════════════════════════════════════════════════════════════════════════
 
-try:
+class DependenciaNaoAplicavel(Exception):
+    """O backend não se aplica a esta plataforma (ex: WMI fora do Windows)."""
+
+class DependenciaOpcional:
+    """
+    Backend opcional importado apenas no primeiro uso.
+    
+    O resultado (módulo/função ou None) fica em cache. A resolução é segura
+    entre threads e pode ser antecipada em segundo plano por
+    `sondar_dependencias()`, sem atrasar o início do servidor.
+    """
+    
+    def __init__(self, nome: str, carregar: Callable[[], Any], instalacao: str = ""):
+        self.nome = nome
+        self._carregar = carregar
+        self._instalacao = instalacao
+        self._lock = threading.Lock()
+        self._resolvido = False
+        self._valor = None
+        self.erro: Optional[str] = None
+        self.tempo_ms: Optional[float] = None
+    
+    def obter(self) -> Any:
+        """Retorna o backend (resolvendo-o na primeira chamada) ou None."""
+        if self._resolvido:
+            return self._valor
+        
+        with self._lock:
+            if not self._resolvido:
+                inicio = time.perf_counter()
+                try:
+                    self._valor = self._carregar()
+                    logger.info(f"🧩 {self.nome} disponível")
+                except DependenciaNaoAplicavel as e:
+                    self.erro = str(e)
+                    logger.debug(f"{self.nome} não se aplica: {e}")
+                except Exception as e:
+                    self.erro = str(e)
+                    dica = f" Instale com: {self._instalacao}" if self._instalacao else ""
+                    logger.warning(f"⚠️  {self.nome} não disponível: {e}.{dica}")
+                self.tempo_ms = round((time.perf_counter() - inicio) * 1000, 1)
+                self._resolvido = True
+        return self._valor
+    
+    def definir(self, valor: Any) -> None:
+        """Substitui o backend (testes, benchmark ou desativação manual)."""
+        with self._lock:
+            self._valor = valor
+            self.erro = None if valor is not None else "desativado"
+            self._resolvido = True
+    
+    @property
+    def disponivel(self) -> bool:
+        return self.obter() is not None
+    
+    def estado(self) -> Dict:
+        """Situação atual sem forçar a resolução."""
+        if not self._resolvido:
+            return {"status": "pendente"}
+        return {
+            "status": "disponivel" if self._valor is not None else "indisponivel",
+            "erro": self.erro,
+            "tempo_ms": self.tempo_ms,
+        }
+
+def _carregar_ping3():
     from ping3 import ping
-    PING3_DISPONIVEL = True
-except ImportError:
-    ping = None
-    PING3_DISPONIVEL = False
-    logger.warning("⚠️  ping3 não instalado. Instale com: pip install ping3")
+    return ping
 
-try:
+def _carregar_speedtest():
     import speedtest
-    SPEEDTEST_DISPONIVEL = True
-except ImportError:
-    speedtest = None
-    SPEEDTEST_DISPONIVEL = False
-    logger.warning("⚠️  speedtest-cli não instalado. Instale com: pip install speedtest-cli")
+    return speedtest
 
-try:
+def _carregar_gputil():
     import GPUtil
-    GPUTIL_DISPONIVEL = True
-except ImportError:
-    GPUtil = None
-    GPUTIL_DISPONIVEL = False
-    logger.warning("⚠️  GPUtil não instalado. Instale com: pip install GPUtil")
+    return GPUtil
 
-try:
+def _carregar_wmi():
+    if os.name != "nt":
+        raise DependenciaNaoAplicavel("disponível apenas no Windows")
     import wmi
-    WMI_INTERFACE = wmi.WMI() if os.name == "nt" else None
-    WMI_DISPONIVEL = WMI_INTERFACE is not None
-except Exception as e:
-    WMI_INTERFACE = None
-    WMI_DISPONIVEL = False
-    logger.warning(f"⚠️  WMI não disponível: {e}")
+    return wmi
+
+def _carregar_pynvml():
+    import pynvml
+    return pynvml
+
+def _carregar_pyarrow():
+    import pyarrow
+    import pyarrow.parquet
+    return pyarrow
+
+def _carregar_brotli():
+    import brotli
+    return brotli
+
+def _carregar_numpy():
+    import numpy
+    return numpy
+
+DEPENDENCIAS: Dict[str, DependenciaOpcional] = {
+    "ping3": DependenciaOpcional("ping3", _carregar_ping3, "pip install ping3"),
+    "speedtest": DependenciaOpcional("speedtest-cli", _carregar_speedtest, "pip install speedtest-cli"),
+    "gputil": DependenciaOpcional("GPUtil", _carregar_gputil, "pip install GPUtil"),
+    "wmi": DependenciaOpcional("WMI", _carregar_wmi, "pip install WMI"),
+    "numpy": DependenciaOpcional("NumPy", _carregar_numpy, "pip install numpy"),
+    "pynvml": DependenciaOpcional("NVML", _carregar_pynvml, "pip install nvidia-ml-py"),
+    "pyarrow": DependenciaOpcional("PyArrow", _carregar_pyarrow, "pip install pyarrow"),
+    "brotli": DependenciaOpcional("Brotli", _carregar_brotli, "pip install brotli"),
+}
+
+_WMI_LOCAL = threading.local()
+
+def obter_conexao_wmi(namespace: Optional[str] = None):
+    """
+    Conexão WMI da thread atual, criada no primeiro uso (uma por namespace).
+    Objetos COM não podem ser compartilhados entre threads: os coletores de
+    hardware rodam todos na thread dedicada do GerenciadorColetores, então
+    há uma única conexão por namespace durante toda a execução.
+    
+    Args:
+        namespace: Ex: "root\\wmi" (None = namespace padrão, root\\cimv2)
+    """
+    wmi = DEPENDENCIAS["wmi"].obter()
+    if wmi is None:
+        return None
+    
+    conexoes = getattr(_WMI_LOCAL, "conexoes", None)
+    if conexoes is None:
+        try:
+            import pythoncom
+            pythoncom.CoInitialize()
+        except ImportError:
+            pass
+        conexoes = _WMI_LOCAL.conexoes = {}
+    
+    conexao = conexoes.get(namespace)
+    if conexao is None:
+        try:
+            conexao = wmi.WMI(namespace=namespace) if namespace else wmi.WMI()
+        except Exception as e:
+            logger.debug(f"Erro ao conectar ao WMI ({namespace or 'padrão'}): {e}")
+            conexao = False
+        conexoes[namespace] = conexao
+    return conexao or None
+
+# Tempos de inicialização (cold start), em ms
+TEMPOS_INICIALIZACAO: Dict[str, Optional[float]] = {
+    "importacao_ms": None,     # Importação deste módulo
+    "pronto_ms": None,         # Criação do processo → servidor aceitando conexões
+    "dependencias_ms": None,   # Sondagem paralela das dependências opcionais
+    "recursos_ms": None,       # Hash e pré-compressão dos recursos do dashboard
+}
 
 # ═══════════════════════════════════════════════════════════════════════════
 # 4. CONFIGURAÇÕES DO SISTEMA
@@ -166,6 +540,10 @@ CONFIG = {
     # Intervalos (segundos)
     "SPEEDTEST_INTERVALO": 300,  # A cada 5 minutos
     "COLETA_INTERVALO": 1,        # A cada 1 segundo
+    "COLETA_INTERVALO_OCIOSO": 10,    # Sem clientes, sem gravação e nada perto dos limites
+    "COLETA_INTERVALO_RAJADA": 0.25,  # Métricas perto de um limite em LIMITES
+    "RAJADA_FRACAO": 0.9,             # "Perto" = acima de 90% do limite
+    "RAJADA_PERMANENCIA": 10,         # Segundos em rajada após a métrica se afastar
     "ALERT_COOLDOWN": 300,        # Mínimo 5 minutos entre alertas
     
     # Servidor
@@ -175,8 +553,91 @@ CONFIG = {
     # Histórico
     "MAX_EVENTOS": 1000,
     "MAX_ALERTAS": 500,
+    
+    # Instrumentação de desempenho (/api/debug/perf)
+    "PERF_HABILITADO": False,     # Medições internas desligadas por padrão
+    "PERF_LOG_INTERVALO": 0,      # Resumo periódico no log (0 = desativado)
+    "PERF_LAG_INTERVALO": 0.5,    # Amostragem do atraso do event loop
+    
+    # Gravação e reprodução de snapshots
+    "GRAVACAO_ARQUIVO": None,       # Ex: "incidente.nocrec" (None = não gravar)
+    "REPRODUCAO_ARQUIVO": None,     # Reproduz uma gravação no lugar dos coletores
+    "REPRODUCAO_VELOCIDADE": 1.0,   # 1 = tempo real, 100 = 100x, 0 = sem espera
+    "REPRODUCAO_REPETIR": False,    # Reinicia a gravação ao chegar no fim
+    "REPRODUCAO_PAUSA_MAXIMA": 5.0, # Segundos máximos de espera entre quadros (lacunas entre sessões)
+    
+    # Múltiplos workers (snapshots em memória compartilhada)
+    "WORKERS": 1,                    # >1: um processo coletor + N workers uvicorn
+    "SHM_NOME": None,                # Definido automaticamente pelo processo principal
+    "SHM_TAMANHO": 8 * 1024 * 1024,  # Bytes (metade quadro, metade estado)
+    "SHM_POLL_INTERVALO": 0.05,      # Segundos entre verificações dos workers
+    
+    # Rastreamento de processos
+    "PROCESSOS_TOP_N": 5,             # Processos listados por CPU e por memória
+    "PROCESSOS_MAX_POR_CICLO": 300,   # Processos amostrados por coleta (custo limitado)
+    
+    # I/O por interface e por disco
+    "PARTICOES_INTERVALO": 60,        # Segundos entre releituras de partições/velocidade das NICs
+    "PARTICOES_USO_INTERVALO": 10,    # Segundos entre leituras do uso de cada partição
+    "DISPOSITIVOS_IGNORADOS": r"^(loop|ram|zram)\d+$",  # Discos virtuais sem interesse
+    "HISTORICO_PONTOS": 3600,         # Snapshots mantidos em memória (/api/historico)
+    
+    # Coletores de hardware (GPU e temperatura)
+    "COLETORES": None,   # None = detecção automática; ex: ["gpu_falsa", "temperatura_falsa"]
+    
+    # Linhas de base e anomalias
+    "BASE_CONSTANTE_TEMPO": 600,          # Segundos de memória da média móvel (EWMA)
+    "BASE_SAZONAL_CONSTANTE": 3 * 3600,   # Segundos (dentro da mesma hora) do perfil horário
+    "BASE_MIN_SEGUNDOS": 60,              # Segundos de observação antes de emitir escores
+    "BASE_MIN_SEGUNDOS_SAZONAL": 300,     # Segundos na hora antes de usar o perfil horário
+    "BASE_MIN_DIAS_HABITUAL": 5,          # Dias distintos na hora antes de um limite estático ser "habitual"
+    "ANOMALIA_Z": 4.0,                    # Desvios padrão para considerar anomalia
+    "ANOMALIA_PERSISTENCIA": 3,           # Segundos seguidos acima de ANOMALIA_Z (mín. 2 amostras)
+    "ANOMALIA_DESVIO_RELATIVO": 0.05,     # Desvio mínimo: 5% da média...
+    "ANOMALIA_DESVIO_MINIMO": 0.5,        # ...ou 0.5 unidade (evita escores infinitos)
+    
+    # Disponibilidade e SLA dos links WAN (/api/sla)
+    "SLA_ARQUIVO": "noc_sla.json",   # Persistência entre reinícios (None = só memória)
+    "SLA_SALVAR_INTERVALO": 60,      # Segundos entre gravações do arquivo
+    "SLA_RETENCAO_DIAS": 400,        # Intervalos e horas mais antigos são descartados
+    "SLA_LACUNA_MAXIMA": 60,         # Sem amostras por mais que isso = monitor parado (não conta)
+    "SLA_META": 99.5,                # Disponibilidade contratada (%)
+    
+    # Persistência do histórico e dos eventos (/api/export)
+    "PERSISTENCIA_DIR": "noc_dados",       # Arquivos diários .jsonl.gz (None = desativado)
+    "PERSISTENCIA_INTERVALO": 30,          # Segundos entre gravações (perda máxima num crash)
+    "PERSISTENCIA_RETENCAO_DIAS": 90,
+    "EXPORTACAO_LOTE": 500,                # Linhas por bloco da resposta em streaming
+    
+    # Utilização passiva do link (capacidade = último speedtest confiável)
+    "UTILIZACAO_AMOSTRAGEM": 0.1,          # Segundos entre leituras dos contadores (0 = usar o tick)
+    "UTILIZACAO_INTERFACES": None,         # None = interface(s) da rota padrão; ex: ["eth0"]
+    "INTERFACES_VIRTUAIS": r"^(docker\d*|br-.*|veth.*|virbr.*|vnet\d*|vmnet.*|vboxnet.*|tun\d*|tap\d*"
+                           r"|wg\d*|tailscale\d*|zt.*|cni.*|flannel.*|cali.*|lxcbr.*|lxdbr.*|vEthernet.*"
+                           r"|utun\d*|bridge\d*|ifb\d*|awdl\d*|llw\d*)$",  # Nunca contam como link
+    "UTILIZACAO_JANELAS": [10, 60, 300],   # Janelas (s) de média, p95 e pico
+    "SATURACAO_LIMIAR": 90,                # % da capacidade
+    "SATURACAO_DURACAO": 60,               # Segundos acima do limiar para considerar sustentada
+    "SATURACAO_FRACAO": 0.8,               # Fração das amostras da duração acima do limiar
+    "SPEEDTEST_JANELA_CARGA": 10,          # Segundos de tráfego avaliados antes de cada speedtest
+    "SPEEDTEST_CARGA_MAXIMA": 0.2,         # Carga prévia acima disso (fração) = teste não confiável
+    
+    # Tabela de conexões TCP (thread própria; tempo limitado mesmo com 100k+ sockets)
+    "CONEXOES_INTERVALO": 5,        # Segundos entre amostras (0 = desativado)
+    "CONEXOES_TOP_K": 10,           # Linhas das tabelas por porta local e por par remoto
+    "CONEXOES_MAX": 200_000,        # Sockets lidos por amostra (acima disso o resumo é parcial)
+    "CONEXOES_ORCAMENTO_MS": 250,   # Tempo máximo de uma amostra
+    
+    # Dashboard
+    "FONTES_DIR": "fontes",   # Fontes servidas localmente (relativo ao script; None = só fontes do sistema)
+    "SPARKLINE_MINUTOS": 10,  # Histórico enviado a cada cliente ao conectar
+    "SPARKLINE_PONTOS": 300,  # Pontos por série nesse envio (média em blocos)
 }
 
+# Processos filhos (coletor e workers) herdam a configuração do principal
+if os.environ.get("NOC_CONFIG"):
+    CONFIG.update(json.loads(os.environ["NOC_CONFIG"]))
+
 # Limites de alerta (thresholds)
 LIMITES = {
     "cpu": 90,              # %
@@ -185,13 +646,154 @@ LIMITES = {
     "ping": 200,            # ms
     "temperatura_cpu": 80,  # °C
     "perda_pacotes": 10,    # %
+    "conexoes": 50_000,             # Sockets TCP abertos
+    "conexoes_time_wait": 20_000,   # Risco de esgotar portas efêmeras
+    "conexoes_syn_recv": 1_000,     # Handshakes pendentes (SYN flood / backlog cheio)
+    "conexoes_close_wait": 1_000,   # Aplicação não fecha os sockets (vazamento)
 }
 
+# Destinos monitorados via ICMP
+ALVOS_WAN = [
+    {"nome": "Google DNS", "ip": "8.8.8.8", "provedor": "Google"},
+    {"nome": "Cloudflare DNS", "ip": "1.1.1.1", "provedor": "Cloudflare"},
+    {"nome": "Gateway Local", "ip": "192.168.1.1", "provedor": "Router Local"},
+]
+
 # ═══════════════════════════════════════════════════════════════════════════
 # 5. ESTADO GLOBAL DO SISTEMA
 # ═══════════════════════════════════════════════════════════════════════════
 
-ESTADO = {
+class DictImutavel(dict):
+    """
+    Dicionário somente leitura usado nos snapshots de estado.
+    Continua sendo um `dict` para o json e o FastAPI, mas recusa alterações.
+    """
+    
+    __slots__ = ()
+    
+    def _recusar(self, *args, **kwargs):
+        raise TypeError("Snapshot de estado é imutável; use ESTADO.publicar()")
+    
+    __setitem__ = __delitem__ = _recusar
+    clear = pop = popitem = setdefault = update = _recusar
+    
+    def __ior__(self, outro):
+        self._recusar()
+    
+    def __copy__(self):
+        return self
+    
+    def __reduce__(self):
+        return (DictImutavel, (dict(self),))
+    
+    def __deepcopy__(self, memo):
+        return self
+
+def congelar(valor: Any) -> Any:
+    """
+    Converte dicts/listas (recursivamente) em DictImutavel/tuplas.
+    
+    Tuplas são tratadas como já congeladas: assim, anexar a uma tupla de
+    1000 eventos não percorre novamente os 1000 itens.
+    """
+    if isinstance(valor, (DictImutavel, tuple)):
+        return valor
+    if isinstance(valor, dict):
+        return DictImutavel((chave, congelar(v)) for chave, v in valor.items())
+    if isinstance(valor, list):
+        return tuple(congelar(v) for v in valor)
+    return valor
+
+class SnapshotEstado(NamedTuple):
+    """Versão imutável do estado global."""
+    versao: int
+    dados: DictImutavel
+    versoes: DictImutavel  # Chave -> versão da última alteração
+    
+    def mudou_desde(self, versao: int, *chaves: str) -> bool:
+        """
+        Indica se este snapshot (ou alguma das `chaves`) mudou após `versao`.
+        """
+        if not chaves:
+            return self.versao > versao
+        return any(self.versoes.get(chave, 0) > versao for chave in chaves)
+
+class EstadoVersionado:
+    """
+    Estado global com snapshots imutáveis e versionados (copy-on-write).
+    
+    Leitores pegam o snapshot atual sem lock (troca de referência atômica);
+    escritores de qualquer thread publicam uma nova versão sob lock. Cada
+    snapshot leva, junto dos dados, a versão da última alteração de cada
+    chave, permitindo checar de forma barata se algo mudou desde a versão N.
+    """
+    
+    def __init__(self, inicial: Dict):
+        self._lock = threading.Lock()
+        self._atual = SnapshotEstado(0, congelar(inicial), DictImutavel({chave: 0 for chave in inicial}))
+    
+    @property
+    def versao(self) -> int:
+        return self._atual.versao
+    
+    def ler(self) -> SnapshotEstado:
+        """Snapshot atual (consistente entre chaves)."""
+        return self._atual
+    
+    def __getitem__(self, chave: str) -> Any:
+        return self._atual.dados[chave]
+    
+    def publicar(self, **mudancas) -> int:
+        """
+        Publica uma nova versão com as chaves alteradas.
+        
+        Returns:
+            Número da nova versão
+        """
+        return self.atualizar(lambda dados: mudancas)
+    
+    def atualizar(self, funcao: Callable[[DictImutavel], Optional[Dict]]) -> int:
+        """
+        Leitura-modificação-escrita atômica.
+        
+        Args:
+            funcao: Recebe os dados atuais e devolve as chaves alteradas;
+                    None ou {} mantém a versão atual (nada é publicado)
+        
+        Returns:
+            Versão resultante
+        """
+        with self._lock:
+            atual = self._atual
+            mudancas = funcao(atual.dados)
+            if not mudancas:
+                return atual.versao
+            
+            versao = atual.versao + 1
+            dados = dict(atual.dados)
+            versoes = dict(atual.versoes)
+            for chave, valor in mudancas.items():
+                dados[chave] = congelar(valor)
+                versoes[chave] = versao
+            self._atual = SnapshotEstado(versao, DictImutavel(dados), DictImutavel(versoes))
+            return versao
+    
+    def mudou_desde(self, versao: int, *chaves: str) -> bool:
+        """Atalho para `ler().mudou_desde(...)` sobre o snapshot atual."""
+        return self._atual.mudou_desde(versao, *chaves)
+    
+    def exportar(self) -> Dict:
+        """Estado completo com versões, para replicação em outro processo."""
+        atual = self._atual
+        return {"versao": atual.versao, "versoes": dict(atual.versoes), "dados": atual.dados}
+    
+    def importar(self, exportado: Dict) -> None:
+        """Substitui o estado por uma cópia exportada, mantendo as versões."""
+        with self._lock:
+            self._atual = SnapshotEstado(exportado["versao"], congelar(exportado["dados"]),
+                                         DictImutavel(exportado["versoes"]))
+
+ESTADO = EstadoVersionado({
     # Velocidade de internet
     "velocidade": {
         "download": 0.0,
@@ -200,6 +802,15 @@ ESTADO = {
         "isp": "Aguardando...",
         "status": "Iniciando",
         "ultima_atualizacao": None,
+        "confiavel": None,
+        "carga_previa_mbps": None,
+    },
+    
+    # Capacidade do link usada na utilização passiva (último speedtest confiável)
+    "capacidade_link": {
+        "download_mbps": 0.0,
+        "upload_mbps": 0.0,
+        "medida_em": None,
     },
     
     # Status de testes
@@ -226,7 +837,16 @@ ESTADO = {
         "disco_max": 0,
         "picos_cpu": 0,
     }
-}
+})
+
+def incrementar_contador(nivel: str, quantidade: int = 1) -> None:
+    """Incrementa ESTADO["contadores_alertas"][nivel] de forma atômica."""
+    ESTADO.atualizar(lambda dados: {
+        "contadores_alertas": {
+            **dados["contadores_alertas"],
+            nivel: dados["contadores_alertas"][nivel] + quantidade,
+        }
+    })
 
 # ═══════════════════════════════════════════════════════════════════════════
 # 6. FUNÇÕES UTILITÁRIAS
@@ -253,11 +873,13 @@ def registrar_evento(tipo: str, severidade: str, mensagem: str,
         valor=valor
     )
     
-    ESTADO["eventos"].append(asdict(evento))
+    registro = congelar(asdict(evento))
+    ARQUIVOS.adicionar("eventos", {**registro, "t": time.time()})
     
     # Manter apenas os últimos N eventos
-    if len(ESTADO["eventos"]) > CONFIG["MAX_EVENTOS"]:
-        ESTADO["eventos"] = ESTADO["eventos"][-CONFIG["MAX_EVENTOS"]:]
+    ESTADO.atualizar(lambda dados: {
+        "eventos": (dados["eventos"] + (registro,))[-CONFIG["MAX_EVENTOS"]:]
+    })
     
     logger.info(f"[{severidade}] {componente}: {mensagem}")
 
@@ -319,71 +941,6 @@ def obter_info_host() -> Dict:
         "arquitetura": platform.machine(),
     }
 
-def obter_dados_gpu() -> Dict:
-    """
-    Obtém informações da GPU (Nvidia ou integrada).
-    
-    Returns:
-        Dicionário com nome, carga e temperatura da GPU
-    """
-    dados = {
-        "nome": "GPU Integrada/N/A",
-        "carga": 0.0,
-        "temperatura": 0.0,
-        "disponivel": False
-    }
-    
-    # Tentar obter dados de GPU Nvidia
-    if GPUTIL_DISPONIVEL and GPUtil:
-        try:
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                gpu = gpus[0]
-                dados = {
-                    "nome": gpu.name,
-                    "carga": round(gpu.load * 100, 1),
-                    "temperatura": int(gpu.temperature),
-                    "disponivel": True
-                }
-                return dados
-        except Exception as e:
-            logger.debug(f"Erro ao obter dados GPU (Nvidia): {e}")
-    
-    # Fallback para WMI (Windows)
-    if WMI_DISPONIVEL and WMI_INTERFACE:
-        try:
-            for controlador in WMI_INTERFACE.Win32_VideoController():
-                dados["nome"] = controlador.Name
-                dados["disponivel"] = True
-                break
-        except Exception as e:
-            logger.debug(f"Erro ao obter dados GPU (WMI): {e}")
-    
-    return dados
-
-def obter_velocidade_rede(ultima_io, ultimo_tempo: float) -> Tuple:
-    """
-    Calcula velocidade de rede em tempo real.
-    
-    Args:
-        ultima_io: Último estado de I/O de rede
-        ultimo_tempo: Último timestamp
-        
-    Returns:
-        Tupla com (io_atual, tempo_atual, rx_bytes_s, tx_bytes_s)
-    """
-    io_atual = psutil.net_io_counters()
-    tempo_atual = time.time()
-    delta_tempo = tempo_atual - ultimo_tempo
-    
-    if delta_tempo <= 0:
-        delta_tempo = 1
-    
-    rx = (io_atual.bytes_recv - ultima_io.bytes_recv) / delta_tempo
-    tx = (io_atual.bytes_sent - ultima_io.bytes_sent) / delta_tempo
-    
-    return io_atual, tempo_atual, rx, tx
-
 def ping_real(host: str, timeout: int = 2) -> float:
     """
     Executa ping real para um host.
@@ -395,11 +952,13 @@ def ping_real(host: str, timeout: int = 2) -> float:
     Returns:
         Latência em ms ou 9999 se falhar
     """
-    if not PING3_DISPONIVEL or not ping:
+    ping = DEPENDENCIAS["ping3"].obter()
+    if not ping:
         return 9999
     
     try:
-        resultado = ping(host, timeout=timeout, unit='ms')
+        with PERF.medir(f"ping:{host}"):
+            resultado = ping(host, timeout=timeout, unit='ms')
         if resultado is None:
             return 9999
         return round(resultado, 1)
@@ -408,150 +967,3883 @@ def ping_real(host: str, timeout: int = 2) -> float:
         return 9999
 
 # ═══════════════════════════════════════════════════════════════════════════
-# 7. WORKER DE SPEEDTEST
+# 6.1 INSTRUMENTAÇÃO DE DESEMPENHO
 # ═══════════════════════════════════════════════════════════════════════════
 
-def worker_speedtest() -> None:
-    """
-    Worker que executa testes de velocidade periodicamente.
-    Roda em thread separada e atualiza ESTADO["velocidade"].
+class HistogramaLatencia:
     """
-    logger.info("🚀 Worker de Speedtest iniciado")
-    
-    while True:
-        try:
-            ESTADO["testando"] = True
-            ESTADO["velocidade"]["status"] = "Testando..."
-            
-            if SPEEDTEST_DISPONIVEL and speedtest:
-                logger.info("⏱️  Iniciando teste de velocidade...")
-                
-                teste = speedtest.Speedtest()
-                teste.get_best_server()
-                
-                # Obter informações do cliente
-                info_cliente = teste.results.client
-                isp = info_cliente.get("isp", "Desconhecido")
-                
-                # Executar testes
-                velocidade_down = round(teste.download() / 1e6, 2)
-                velocidade_up = round(teste.upload() / 1e6, 2)
-                ping_resultado = round(teste.results.ping, 1)
-                
-                ESTADO["velocidade"] = {
-                    "download": velocidade_down,
-                    "upload": velocidade_up,
-                    "ping": ping_resultado,
-                    "isp": isp,
-                    "status": "Online",
-                    "ultima_atualizacao": datetime.now().strftime("%H:%M:%S")
-                }
-                
-                logger.info(f"✅ Speedtest concluído: {velocidade_down} Mbps ⬇️  | "
-                           f"{velocidade_up} Mbps ⬆️  | {ping_resultado}ms | ISP: {isp}")
-                
-                registrar_evento(
-                    tipo="SPEEDTEST",
-                    severidade="INFO",
-                    mensagem=f"Teste concluído: {velocidade_down} Mbps",
-                    componente="WAN",
-                    valor=velocidade_down
-                )
-            else:
-                ESTADO["velocidade"]["status"] = "Biblioteca não disponível"
-                logger.warning("⚠️  Speedtest-cli não disponível")
-        
-        except Exception as e:
-            logger.error(f"❌ Erro no Speedtest: {e}")
-            ESTADO["velocidade"]["status"] = "Erro/Timeout"
-            registrar_evento(
-                tipo="SPEEDTEST_ERRO",
-                severidade="AVISO",
-                mensagem=f"Erro ao executar speedtest: {str(e)}",
-                componente="WAN"
-            )
-        
-        finally:
-            ESTADO["testando"] = False
-            time.sleep(CONFIG["SPEEDTEST_INTERVALO"])
+    Histograma de latências com faixas fixas (em ms).
 
-async def enviar_whatsapp(mensagem: str) -> bool:
-    """
-    Envia alerta via WhatsApp usando CallMeBot.
-    
-    Args:
-        mensagem: Texto do alerta
-        
-    Returns:
-        True se enviado com sucesso, False caso contrário
+    Mantém contagens acumuladas por faixa e uma janela das últimas
+    amostras, usada para calcular percentis exatos recentes.
     """
-    if not CONFIG["WPP_HABILITADO"]:
-        logger.debug("WhatsApp desabilitado")
-        return False
-    
-    tempo_atual = time.time()
-    tempo_desde_ultimo = tempo_atual - ESTADO["ultimo_alerta"]
-    
-    if tempo_desde_ultimo <= CONFIG["ALERT_COOLDOWN"]:
-        logger.debug(f"Alerta em cooldown ({tempo_desde_ultimo:.0f}s)")
-        return False
-    
-    ESTADO["ultimo_alerta"] = tempo_atual
-    
-    try:
-        texto_alerta = f"🚨 NOC ALERTA: {mensagem}"
-        url = (
-            "https://api.callmebot.com/whatsapp.php"
-            f"?phone={CONFIG['WPP_PHONE']}"
-            f"&text={urllib.parse.quote(texto_alerta)}"
-            f"&apikey={CONFIG['WPP_KEY']}"
-        )
-        
-        await asyncio.to_thread(requests.get, url, timeout=10)
-        logger.info(f"📱 WhatsApp enviado: {mensagem}")
-        return True
-    
-    except Exception as e:
-        logger.error(f"❌ Erro ao enviar WhatsApp: {e}")
+
+    FAIXAS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                 1000, 2500, 5000, 10000, 30000, 60000)
+
+    def __init__(self, janela: int = 512):
+        self._lock = threading.Lock()
+        self._contagens = [0] * (len(self.FAIXAS_MS) + 1)
+        self._recentes = deque(maxlen=janela)
+        self.total = 0
+        self.soma_ms = 0.0
+        self.maximo_ms = 0.0
+
+    def registrar(self, ms: float) -> None:
+        """Registra uma amostra de latência em milissegundos."""
+        indice = bisect.bisect_left(self.FAIXAS_MS, ms)
+        with self._lock:
+            self._contagens[indice] += 1
+            self._recentes.append(ms)
+            self.total += 1
+            self.soma_ms += ms
+            if ms > self.maximo_ms:
+                self.maximo_ms = ms
+
+    def resumo(self) -> Dict:
+        """
+        Resume o histograma.
+
+        Returns:
+            Dicionário com contagem, média, máximo, percentis e faixas
+        """
+        with self._lock:
+            contagens = list(self._contagens)
+            recentes = sorted(self._recentes)
+            total, soma, maximo = self.total, self.soma_ms, self.maximo_ms
+
+        def percentil(p: float) -> float:
+            if not recentes:
+                return 0.0
+            return round(recentes[min(len(recentes) - 1, int(p * len(recentes)))], 3)
+
+        faixas = {f"<={limite}": n for limite, n in zip(self.FAIXAS_MS, contagens) if n}
+        if contagens[-1]:
+            faixas["+inf"] = contagens[-1]
+
+        return {
+            "contagem": total,
+            "media_ms": round(soma / total, 3) if total else 0.0,
+            "max_ms": round(maximo, 3),
+            "p50_ms": percentil(0.50),
+            "p95_ms": percentil(0.95),
+            "p99_ms": percentil(0.99),
+            "faixas": faixas,
+        }
+
+class _Medicao:
+    """Gerenciador de contexto que cronometra um trecho e registra no histograma."""
+
+    __slots__ = ("_perf", "_nome", "_inicio")
+
+    def __init__(self, perf: "InstrumentacaoDesempenho", nome: str):
+        self._perf = perf
+        self._nome = nome
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._perf.registrar(self._nome, (time.perf_counter() - self._inicio) * 1000)
         return False
 
-# ═══════════════════════════════════════════════════════════════════════════
-# 8. COLETA DE DADOS DE CONECTIVIDADE
-# ═══════════════════════════════════════════════════════════════════════════
+_MEDICAO_NULA = contextlib.nullcontext()
 
-def obter_dados_wan_reais() -> List[Dict]:
+class InstrumentacaoDesempenho:
     """
-    Obtém dados reais de conectividade WAN.
-    
-    Returns:
+    Registro central das medições internas do NOC Commander.
+
+    Quando desabilitado, `medir()` devolve um contexto nulo compartilhado e
+    `registrar*()` retornam imediatamente, mantendo o custo desprezível.
+    """
+
+    def __init__(self, habilitado: bool = False):
+        self.habilitado = habilitado
+        self.inicio = time.time()
+        self._histogramas: Dict[str, HistogramaLatencia] = {}
+        self._clientes: Dict[int, Dict] = {}
+        self._proximo_cliente = 0
+        self._lock = threading.Lock()
+
+    def medir(self, nome: str):
+        """
+        Cronometra um bloco `with` e registra em `nome`.
+
+        Args:
+            nome: Nome do coletor/etapa (ex: "cpu", "ping:8.8.8.8", "tick")
+        """
+        if not self.habilitado:
+            return _MEDICAO_NULA
+        return _Medicao(self, nome)
+
+    def registrar(self, nome: str, ms: float) -> None:
+        """Registra uma duração em milissegundos para `nome`."""
+        if not self.habilitado:
+            return
+        histograma = self._histogramas.get(nome)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(nome, HistogramaLatencia())
+        histograma.registrar(ms)
+
+    def registrar_cliente(self, endereco: str) -> int:
+        """
+        Registra um cliente WebSocket conectado.
+
+        Returns:
+            Identificador do cliente para `registrar_envio`/`remover_cliente`
+        """
+        with self._lock:
+            self._proximo_cliente += 1
+            cliente_id = self._proximo_cliente
+            self._clientes[cliente_id] = {
+                "endereco": endereco,
+                "conectado_em": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+                "mensagens": 0,
+                "bytes": 0,
+                "envio": HistogramaLatencia(janela=128),
+            }
+        return cliente_id
+
+    def registrar_envio(self, cliente_id: int, ms: float, tamanho: int) -> None:
+        """Registra a latência e o tamanho de um envio ao cliente."""
+        if not self.habilitado:
+            return
+        cliente = self._clientes.get(cliente_id)
+        if cliente is None:
+            return
+        cliente["mensagens"] += 1
+        cliente["bytes"] += tamanho
+        cliente["envio"].registrar(ms)
+
+    def remover_cliente(self, cliente_id: int) -> None:
+        """Remove um cliente desconectado."""
+        with self._lock:
+            self._clientes.pop(cliente_id, None)
+
+    def resumo(self, detalhado: bool = True) -> Dict:
+        """
+        Gera o relatório exposto em /api/debug/perf.
+
+        Args:
+            detalhado: Inclui as faixas dos histogramas
+        """
+        with self._lock:
+            histogramas = dict(self._histogramas)
+            clientes = dict(self._clientes)
+
+        def resumir(histograma: HistogramaLatencia) -> Dict:
+            dados = histograma.resumo()
+            if not detalhado:
+                dados.pop("faixas")
+            return dados
+
+        return {
+            "habilitado": self.habilitado,
+            "desde": datetime.fromtimestamp(self.inicio).strftime("%d/%m/%Y %H:%M:%S"),
+            "medicoes": {nome: resumir(h) for nome, h in sorted(histogramas.items())},
+            "clientes": [
+                {
+                    "id": cliente_id,
+                    "endereco": dados["endereco"],
+                    "conectado_em": dados["conectado_em"],
+                    "mensagens": dados["mensagens"],
+                    "bytes": dados["bytes"],
+                    "envio": resumir(dados["envio"]),
+                }
+                for cliente_id, dados in sorted(clientes.items())
+            ],
+        }
+
+    def reiniciar(self) -> None:
+        """Descarta as medições acumuladas (clientes conectados são mantidos)."""
+        with self._lock:
+            self._histogramas = {}
+            self.inicio = time.time()
+            for dados in self._clientes.values():
+                dados.update(mensagens=0, bytes=0, envio=HistogramaLatencia(janela=128))
+
+PERF = InstrumentacaoDesempenho(habilitado=CONFIG["PERF_HABILITADO"])
+
+async def monitorar_lag_loop() -> None:
+    """
+    Mede o atraso do event loop: quanto um `sleep` demora além do pedido.
+    Atrasos altos indicam código bloqueante dentro do loop.
+    """
+    loop = asyncio.get_running_loop()
+    intervalo = CONFIG["PERF_LAG_INTERVALO"]
+
+    while True:
+        inicio = loop.time()
+        await asyncio.sleep(intervalo)
+        if PERF.habilitado:
+            atraso = max(0.0, loop.time() - inicio - intervalo)
+            PERF.registrar("loop_lag", atraso * 1000)
+
+async def registrar_perf_periodico() -> None:
+    """Escreve no log, periodicamente, um resumo compacto das medições."""
+    while True:
+        await asyncio.sleep(CONFIG["PERF_LOG_INTERVALO"])
+        if not PERF.habilitado:
+            continue
+        resumo = PERF.resumo(detalhado=False)
+        linhas = [
+            f"{nome}: p50={m['p50_ms']}ms p95={m['p95_ms']}ms max={m['max_ms']}ms n={m['contagem']}"
+            for nome, m in resumo["medicoes"].items()
+        ]
+        logger.info(f"📊 PERF ({len(resumo['clientes'])} clientes) | " + " | ".join(linhas))
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 6.2 RASTREAMENTO DE PROCESSOS (TOP-N)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class RastreadorProcessos:
+    """
+    Mantém os processos que mais consomem CPU e memória.
+    
+    A tabela de `psutil.Process` é reaproveitada entre coletas e só muda
+    quando a lista de PIDs muda. CPU%, RSS e I/O são calculados por deltas
+    em relação à amostra anterior de cada processo. Cada coleta amostra no
+    máximo `max_por_ciclo` processos em rodízio, então o custo fica limitado
+    mesmo com milhares de processos (o CPU% de cada um é a média desde sua
+    última amostra).
+    """
+    
+    def __init__(self, top_n: int = 5, max_por_ciclo: int = 300):
+        self.top_n = top_n
+        self.max_por_ciclo = max_por_ciclo
+        self._processos: Dict[int, Dict] = {}
+        self._pids: set = set()
+        self._fila: deque = deque()  # (pid, geração) em rodízio
+        self._geracao = 0
+        self._num_cpus = psutil.cpu_count() or 1
+    
+    def _sincronizar_pids(self) -> None:
+        """Atualiza a tabela apenas quando processos surgem ou terminam."""
+        pids = set(psutil.pids())
+        if pids == self._pids:
+            return
+        
+        for pid in self._pids - pids:
+            self._processos.pop(pid, None)
+        for pid in pids - self._pids:
+            self._geracao += 1
+            self._processos[pid] = {"pid": pid, "geracao": self._geracao}
+            self._fila.append((pid, self._geracao))
+        self._pids = pids
+    
+    def _amostrar(self, info: Dict, agora: float) -> bool:
+        """
+        Atualiza CPU%, RSS e I/O de um processo.
+        
+        Returns:
+            False se o processo terminou (deve sair da tabela)
+        """
+        try:
+            processo = info.get("processo")
+            if processo is None:
+                processo = info["processo"] = psutil.Process(info["pid"])
+            with processo.oneshot():
+                if "nome" not in info:
+                    info["nome"] = processo.name()
+                tempos = processo.cpu_times()
+                rss = processo.memory_info().rss
+                try:
+                    contadores_io = processo.io_counters()
+                    io = (contadores_io.read_bytes, contadores_io.write_bytes)
+                except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                    io = None
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            return False
+        except psutil.AccessDenied:
+            return True
+        
+        cpu_total = tempos.user + tempos.system
+        anterior = info.get("t")
+        if anterior is not None and agora > anterior:
+            intervalo = agora - anterior
+            info["cpu"] = max(0.0, (cpu_total - info["cpu_total"]) / intervalo / self._num_cpus * 100)
+            if io is not None and info.get("io") is not None:
+                info["io_leitura"] = max(0.0, (io[0] - info["io"][0]) / intervalo)
+                info["io_escrita"] = max(0.0, (io[1] - info["io"][1]) / intervalo)
+        
+        info["cpu_total"] = cpu_total
+        info["t"] = agora
+        info["rss"] = rss
+        info["io"] = io
+        return True
+    
+    @staticmethod
+    def _resumir(info: Dict) -> Dict:
+        return {
+            "pid": info["pid"],
+            "nome": info.get("nome", "?"),
+            "cpu": round(info.get("cpu", 0.0), 1),
+            "memoria_mb": round(info["rss"] / 1024 ** 2, 1),
+            "io_leitura": formatar_bytes(info["io_leitura"]) if "io_leitura" in info else None,
+            "io_escrita": formatar_bytes(info["io_escrita"]) if "io_escrita" in info else None,
+        }
+    
+    def coletar(self) -> Dict:
+        """
+        Returns:
+            Dicionário com totais e listas top_cpu / top_memoria
+        """
+        self._sincronizar_pids()
+        agora = time.monotonic()
+        
+        amostrados = 0
+        for _ in range(min(self.max_por_ciclo, len(self._fila))):
+            pid, geracao = self._fila.popleft()
+            info = self._processos.get(pid)
+            if info is None or info["geracao"] != geracao:
+                continue  # Processo já saiu da tabela
+            amostrados += 1
+            if self._amostrar(info, agora):
+                self._fila.append((pid, geracao))
+            else:
+                self._processos.pop(pid, None)
+                self._pids.discard(pid)
+        
+        medidos = [info for info in self._processos.values() if "rss" in info]
+        top_cpu = heapq.nlargest(self.top_n, medidos, key=lambda info: info.get("cpu", 0.0))
+        top_memoria = heapq.nlargest(self.top_n, medidos, key=lambda info: info["rss"])
+        
+        return {
+            "total": len(self._processos),
+            "amostrados": amostrados,
+            "top_cpu": [self._resumir(info) for info in top_cpu],
+            "top_memoria": [self._resumir(info) for info in top_memoria],
+        }
+
+def descrever_processos(processos: Optional[List[Dict]], campo: str, unidade: str,
+                        limite: int = 3) -> str:
+    """
+    Resume os principais processos para anexar a um alerta.
+    
+    Returns:
+        Ex: " | Top: chrome (1234) 45.2%, python (987) 20.1%" ou ""
+    """
+    if not processos:
+        return ""
+    itens = [f"{p['nome']} ({p['pid']}) {p[campo]}{unidade}" for p in processos[:limite]]
+    return " | Top: " + ", ".join(itens)
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 6.3 I/O POR INTERFACE E POR DISCO
+# ═══════════════════════════════════════════════════════════════════════════
+
+_PADRAO_LOOPBACK = re.compile(r"^(lo\d*|Loopback.*)$", re.IGNORECASE)
+
+class TaxasDispositivos:
+    """
+    Converte contadores cumulativos por dispositivo (psutil pernic/perdisk)
+    em taxas por segundo, todos os dispositivos de uma vez.
+    
+    Com NumPy, os contadores viram uma matriz (dispositivos × campos) e o
+    delta é uma única operação vetorizada; sem NumPy, listas equivalentes.
+    O intervalo usa relógio monotônico. O psutil já corrige o estouro de
+    contadores de 32 bits (nowrap=True); um contador que ainda assim
+    diminui foi reiniciado (driver recarregado, hotplug) e tem taxa zero.
+    """
+    
+    def __init__(self, campos: Sequence[str], ignorar: Optional[str] = None):
+        self.campos = tuple(campos)
+        self._ignorar = re.compile(ignorar) if ignorar else None
+        self._indices: Optional[List[int]] = None
+        self._todos: Tuple[str, ...] = ()
+        self._mascara: List[bool] = []
+        self.nomes: Tuple[str, ...] = ()
+        self._anterior = None
+        self._t: Optional[float] = None
+    
+    def _reindexar(self, contadores: Dict[str, tuple]) -> Optional[List[int]]:
+        """
+        Chamado só quando a lista de dispositivos muda.
+        
+        Returns:
+            Linha anterior de cada dispositivo atual (-1 = novo)
+        """
+        if self._indices is None:
+            exemplo = next(iter(contadores.values()))
+            # Campos ausentes na plataforma (ex: busy_time fora do Linux) são descartados
+            self.campos = tuple(c for c in self.campos if c in exemplo._fields)
+            self._indices = [exemplo._fields.index(c) for c in self.campos]
+        
+        self._todos = tuple(contadores)
+        self._mascara = [not (self._ignorar and self._ignorar.match(n)) for n in self._todos]
+        antigos = {nome: i for i, nome in enumerate(self.nomes)}
+        self.nomes = tuple(n for n, manter in zip(self._todos, self._mascara) if manter)
+        return [antigos.get(nome, -1) for nome in self.nomes]
+    
+    def atualizar(self, contadores: Dict[str, tuple]) -> Tuple[Tuple[str, ...], Any]:
+        """
+        Args:
+            contadores: Ex: psutil.net_io_counters(pernic=True)
+            
+        Returns:
+            Tupla (nomes, taxas) com uma linha de taxas por dispositivo
+            (ndarray com NumPy, lista de listas sem)
+        """
+        if not contadores:
+            return (), []
+        
+        agora = time.monotonic()
+        linhas_anteriores = None
+        if tuple(contadores) != self._todos:
+            linhas_anteriores = self._reindexar(contadores)
+        
+        np = DEPENDENCIAS["numpy"].obter()
+        if np is not None:
+            atual = np.array(list(contadores.values()), dtype=np.float64)[:, self._indices]
+            if not all(self._mascara):
+                atual = atual[np.array(self._mascara)]
+            taxas = self._delta_numpy(np, atual, linhas_anteriores, agora)
+        else:
+            atual = [
+                [float(c[i]) for i in self._indices]
+                for c, manter in zip(contadores.values(), self._mascara) if manter
+            ]
+            taxas = self._delta_listas(atual, linhas_anteriores, agora)
+        
+        self._anterior = atual
+        self._t = agora
+        return self.nomes, taxas
+    
+    def _delta_numpy(self, np, atual, linhas_anteriores, agora: float):
+        if self._anterior is None or self._t is None or agora <= self._t:
+            return np.zeros_like(atual)
+        
+        anterior = self._anterior
+        if linhas_anteriores is not None:
+            # Dispositivos novos usam a própria leitura como base (taxa zero)
+            linhas = np.array(linhas_anteriores, dtype=np.intp)
+            conhecidos = linhas >= 0
+            anterior = atual.copy()
+            anterior[conhecidos] = self._anterior[linhas[conhecidos]]
+        
+        return np.maximum(atual - anterior, 0.0) / (agora - self._t)
+    
+    def _delta_listas(self, atual, linhas_anteriores, agora: float):
+        if self._anterior is None or self._t is None or agora <= self._t:
+            return [[0.0] * len(self.campos) for _ in atual]
+        
+        anterior = self._anterior
+        if linhas_anteriores is not None:
+            # Dispositivos novos usam a própria leitura como base (taxa zero)
+            anterior = [self._anterior[i] if i >= 0 else linha
+                        for i, linha in zip(linhas_anteriores, atual)]
+        
+        intervalo = agora - self._t
+        return [[max(0.0, valor - valor_antes) / intervalo for valor, valor_antes in zip(linha, antes)]
+                for linha, antes in zip(atual, anterior)]
+
+def _tabela_dispositivos(nomes: Sequence[str], campos: Sequence[str], valores: Any) -> Dict:
+    """Formato colunar enviado no snapshot: {campos, nomes, valores[linha][coluna]}."""
+    if hasattr(valores, "round"):
+        valores = valores.round(1).tolist()
+    else:
+        valores = [[round(v, 1) for v in linha] for linha in valores]
+    return {"campos": list(campos), "nomes": list(nomes), "valores": valores}
+
+class ColetorIO:
+    """
+    Taxas de I/O por interface de rede e por disco, uso de todas as
+    partições e total de rede (sem loopback).
+    
+    A lista de partições e a velocidade nominal das NICs são lidas a cada
+    PARTICOES_INTERVALO segundos e o uso das partições a cada
+    PARTICOES_USO_INTERVALO; a velocidade e a máscara "sem loopback" de
+    cada NIC ficam em cache até a lista de interfaces mudar. O resto é
+    vetorizado por TaxasDispositivos.
+    """
+    
+    CAMPOS_REDE = ("bytes_recv", "bytes_sent", "packets_recv", "packets_sent",
+                   "errin", "errout", "dropin", "dropout")
+    CAMPOS_DISCO = ("read_bytes", "write_bytes", "read_count", "write_count", "busy_time")
+    
+    def __init__(self):
+        self._rede = TaxasDispositivos(self.CAMPOS_REDE)
+        self._discos = TaxasDispositivos(self.CAMPOS_DISCO, ignorar=CONFIG["DISPOSITIVOS_IGNORADOS"])
+        self._particoes: List = []
+        self._uso_particoes: List[Dict] = []
+        self._velocidades: Dict[str, int] = {}
+        # (nomes, com NumPy?, velocidades, máscara sem loopback) da última lista de NICs
+        self._cache_nics: Optional[Tuple[Tuple[str, ...], bool, Any, Any]] = None
+        self._proxima_leitura = 0.0
+        self._proximo_uso = 0.0
+    
+    def _atualizar_cache(self) -> None:
+        agora = time.monotonic()
+        if agora >= self._proxima_leitura:
+            self._proxima_leitura = agora + CONFIG["PARTICOES_INTERVALO"]
+            try:
+                self._particoes = psutil.disk_partitions(all=False)
+            except Exception as e:
+                logger.debug(f"Erro ao listar partições: {e}")
+            try:
+                self._velocidades = {nome: stats.speed for nome, stats in psutil.net_if_stats().items()}
+                self._cache_nics = None
+            except Exception as e:
+                logger.debug(f"Erro ao ler velocidade das interfaces: {e}")
+            self._proximo_uso = agora  # Partições novas: uso lido já neste tick
+        if agora >= self._proximo_uso:
+            self._proximo_uso = agora + CONFIG["PARTICOES_USO_INTERVALO"]
+            self._uso_particoes = self._ler_particoes()
+    
+    def _nics(self, nomes: Tuple[str, ...], np) -> Tuple[Any, Any]:
+        """Velocidades (Mbps) e máscara sem loopback, recalculadas só quando as NICs mudam."""
+        cache = self._cache_nics
+        if cache is None or cache[0] is not nomes or cache[1] != (np is not None):
+            velocidades = [self._velocidades.get(nome, 0) for nome in nomes]
+            fisicas = [not _PADRAO_LOOPBACK.match(nome) for nome in nomes]
+            if np is not None:
+                velocidades = np.array(velocidades, dtype=np.float64)
+                fisicas = np.array(fisicas)
+            self._cache_nics = (nomes, np is not None, velocidades, fisicas)
+        return self._cache_nics[2], self._cache_nics[3]
+    
+    def _ler_particoes(self) -> List[Dict]:
+        particoes = []
+        for particao in self._particoes:
+            try:
+                uso = psutil.disk_usage(particao.mountpoint)
+            except (PermissionError, OSError):
+                continue  # Ex: leitor de CD vazio no Windows
+            particoes.append({
+                "ponto": particao.mountpoint,
+                "dispositivo": particao.device,
+                "tipo": particao.fstype,
+                "percentual": round(uso.percent, 1),
+                "total_gb": round(uso.total / 1024 ** 3, 1),
+            })
+        return particoes
+    
+    def _coletar_rede(self) -> Tuple[float, float, Dict]:
+        nomes, taxas = self._rede.atualizar(psutil.net_io_counters(pernic=True))
+        campos = ("rx", "tx", "pacotes_rx", "pacotes_tx", "erros", "descartes",
+                  "velocidade_mbps", "saturacao")
+        if not nomes:
+            return 0.0, 0.0, _tabela_dispositivos(nomes, campos, [])
+        
+        # saturacao = maior sentido (rx/tx) sobre a velocidade nominal; 0 se desconhecida
+        np = DEPENDENCIAS["numpy"].obter()
+        velocidades, fisicas = self._nics(nomes, np)
+        if np is not None:
+            bits = np.maximum(taxas[:, 0], taxas[:, 1]) * 8
+            saturacao = np.divide(bits * 100, velocidades * 1e6,
+                                  out=np.zeros_like(bits), where=velocidades > 0)
+            valores = np.column_stack((taxas[:, :4], taxas[:, 4] + taxas[:, 5],
+                                       taxas[:, 6] + taxas[:, 7], velocidades, saturacao))
+            rx, tx = float(taxas[fisicas, 0].sum()), float(taxas[fisicas, 1].sum())
+        else:
+            valores = [
+                linha[:4] + [linha[4] + linha[5], linha[6] + linha[7], float(velocidade),
+                             max(linha[0], linha[1]) * 8 * 100 / (velocidade * 1e6) if velocidade else 0.0]
+                for linha, velocidade in zip(taxas, velocidades)
+            ]
+            rx = sum(linha[0] for linha, fisica in zip(taxas, fisicas) if fisica)
+            tx = sum(linha[1] for linha, fisica in zip(taxas, fisicas) if fisica)
+        return rx, tx, _tabela_dispositivos(nomes, campos, valores)
+    
+    def _coletar_discos(self) -> Dict:
+        try:
+            contadores = psutil.disk_io_counters(perdisk=True)
+        except Exception as e:
+            logger.debug(f"Erro ao ler contadores de disco: {e}")
+            contadores = {}
+        nomes, taxas = self._discos.atualizar(contadores)
+        
+        # busy_time (ms ocupados por segundo) / 10 = % de utilização (só Linux/BSD)
+        campos = ["leitura", "escrita", "iops_leitura", "iops_escrita"]
+        if "busy_time" in self._discos.campos:
+            campos.append("utilizacao")
+            if hasattr(taxas, "shape"):
+                taxas = taxas.copy()
+                taxas[:, 4] = (taxas[:, 4] / 10).clip(0, 100)
+            else:
+                taxas = [linha[:4] + [min(100.0, linha[4] / 10)] for linha in taxas]
+        return _tabela_dispositivos(nomes, campos, taxas)
+    
+    def coletar(self) -> Dict:
+        """
+        Returns:
+            Dicionário com rx/tx totais (bytes/s), interfaces, discos e particoes
+        """
+        self._atualizar_cache()
+        rx, tx, interfaces = self._coletar_rede()
+        return {
+            "rx": rx,
+            "tx": tx,
+            "interfaces": interfaces,
+            "discos": self._coletar_discos(),
+            "particoes": self._uso_particoes,
+        }
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 6.4 HISTÓRICO DE MÉTRICAS (EM MEMÓRIA)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class HistoricoMetricas:
+    """
+    Buffer circular com os últimos HISTORICO_PONTOS pontos de métricas.
+    
+    Cada ponto reaproveita as tabelas colunares do payload (interfaces,
+    discos), sem cópia. Workers partem do histórico persistido pelo coletor
+    e seguem com os quadros lidos da memória compartilhada.
+    """
+    
+    def __init__(self, capacidade: int):
+        self._pontos: deque = deque(maxlen=capacidade)
+    
+    def __len__(self) -> int:
+        return len(self._pontos)
+    
+    @property
+    def capacidade(self) -> int:
+        return self._pontos.maxlen
+    
+    def carregar(self, pontos: Sequence[Dict]) -> None:
+        """Insere pontos já extraídos (ex: lidos de ARQUIVOS) antes dos atuais."""
+        if self._pontos:
+            pontos = [ponto for ponto in pontos if ponto["t"] < self._pontos[0]["t"]]
+        if pontos:
+            self._pontos = deque(list(pontos) + list(self._pontos), maxlen=self._pontos.maxlen)
+    
+    def adicionar(self, payload: Dict) -> Dict:
+        """
+        Extrai o ponto de histórico de um payload do dashboard.
+        
+        Returns:
+            O ponto armazenado (wan = {nome: [status, latência ms, perda %]},
+            link = {sentido: [média, p95, pico em Mbps]} da menor janela,
+            conexoes = {total, ESTABLISHED, TIME_WAIT, ...})
+        """
+        local = payload["local"]
+        metricas = local["metricas"]
+        ponto = {
+            "t": payload["t"],
+            "cpu": metricas["cpu"],
+            "ram": metricas["ram"],
+            "disco": metricas["disco"],
+            "rx": metricas["rx_bs"],
+            "tx": metricas["tx_bs"],
+            "temperatura_cpu": metricas.get("temperatura_cpu"),
+            "interfaces": local.get("interfaces"),
+            "discos": local.get("discos"),
+            "wan": {w["nome"]: [w["status"], w["latencia_ms"], w["perda_pacotes"]] for w in payload["wan"]},
+        }
+        utilizacao = payload.get("utilizacao")
+        if utilizacao and utilizacao["janelas"]:
+            janela = next(iter(utilizacao["janelas"].values()))
+            ponto["link"] = {
+                sentido: [estatisticas["media_mbps"], estatisticas["p95_mbps"], estatisticas["pico_mbps"]]
+                for sentido, estatisticas in janela.items() if estatisticas
+            }
+        conexoes = payload.get("conexoes")
+        if conexoes:
+            ponto["conexoes"] = {"total": conexoes["total"],
+                                 **{estado: conexoes["estados"].get(estado, 0) for estado in ESTADOS_HISTORICO}}
+        self._pontos.append(ponto)
+        return ponto
+    
+    def consultar(self, desde: float = 0, limite: Optional[int] = None,
+                  campos: Sequence[str] = ()) -> List[Dict]:
+        """
+        Args:
+            desde: Apenas pontos com t > desde (epoch)
+            limite: Máximo de pontos (os mais recentes)
+            campos: Subconjunto de chaves (além de "t")
+        """
+        pontos = list(self._pontos)
+        if desde:
+            inicio = bisect.bisect_right([p["t"] for p in pontos], desde)
+            pontos = pontos[inicio:]
+        if limite:
+            pontos = pontos[-limite:]
+        if campos:
+            pontos = [{"t": p["t"], **{c: p[c] for c in campos if c in p}} for p in pontos]
+        return pontos
+    
+    def compacto(self, segundos: float, pontos_max: int, alvos: Optional[frozenset] = None) -> Dict:
+        """
+        Últimos `segundos` de CPU, RAM, rx/tx e latência por alvo, para o
+        handshake das sparklines: cada série é float32 little-endian em
+        base64 (NaN = sem dado, ex: alvo DOWN), reduzida por média em
+        blocos a no máximo `pontos_max` pontos.
+        
+        Args:
+            alvos: Alvos WAN incluídos (None = todos os do ponto mais recente)
+            
+        Returns:
+            {"segundos", "t0", "t": offsets de t0 em s, "series": {nome: base64}}
+        """
+        pontos = self.consultar(desde=time.time() - segundos)
+        resultado = {"segundos": segundos, "t0": None, "t": "", "series": {}}
+        if not pontos:
+            return resultado
+        
+        nomes = [nome for nome in pontos[-1]["wan"] if alvos is None or nome in alvos]
+        extratores = [
+            ("cpu", lambda p: p["cpu"]),
+            ("ram", lambda p: p["ram"]),
+            ("rx", lambda p: p["rx"]),
+            ("tx", lambda p: p["tx"]),
+        ]
+        for nome in nomes:
+            def latencia(p, nome=nome):
+                medicao = p["wan"].get(nome)
+                return medicao[1] if medicao and medicao[0] == "UP" else None
+            extratores.append((f"latencia/{nome}", latencia))
+        
+        passo = max(1, math.ceil(len(pontos) / pontos_max))
+        blocos = [pontos[i:i + passo] for i in range(0, len(pontos), passo)]
+        t0 = blocos[0][-1]["t"]
+        resultado["t0"] = t0
+        resultado["t"] = _float32_base64([bloco[-1]["t"] - t0 for bloco in blocos])
+        for serie, extrair in extratores:
+            valores = []
+            for bloco in blocos:
+                amostras = [v for v in map(extrair, bloco) if v is not None and math.isfinite(v)]
+                valores.append(sum(amostras) / len(amostras) if amostras else math.nan)
+            resultado["series"][serie] = _float32_base64(valores)
+        return resultado
+
+def _float32_base64(valores: Sequence[float]) -> str:
+    """Valores como float32 little-endian em base64 (Float32Array no navegador)."""
+    dados = array.array("f", valores)
+    if sys.byteorder == "big":
+        dados.byteswap()
+    return base64.b64encode(dados.tobytes()).decode("ascii")
+
+HISTORICO = HistoricoMetricas(CONFIG["HISTORICO_PONTOS"])
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 6.5 COLETORES DE HARDWARE (GPU E TEMPERATURA)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ColetorHardware:
+    """
+    Interface dos coletores de hardware.
+    
+    `iniciar()` abre os recursos de longa duração (sessão NVML, conexão
+    WMI) e retorna False se o backend não se aplica a esta máquina;
+    `amostrar()` é chamado no máximo a cada `intervalo` segundos e retorna
+    {capacidade: [leituras]}; `fechar()` libera os recursos.
+    """
+    
+    nome = ""
+    capacidades: Tuple[str, ...] = ()   # "gpu" e/ou "temperatura"
+    intervalo = 1.0                     # Cadência declarada (segundos)
+    
+    def iniciar(self) -> bool:
+        return True
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        raise NotImplementedError
+    
+    def fechar(self) -> None:
+        pass
+
+def _leitura_gpu(indice: int, nome: str, carga: float = 0.0, temperatura: float = 0.0,
+                 memoria_usada_mb: Optional[float] = None,
+                 memoria_total_mb: Optional[float] = None) -> Dict:
+    return {
+        "indice": indice,
+        "nome": nome,
+        "carga": round(carga, 1),
+        "temperatura": round(temperatura, 1),
+        "memoria_usada_mb": memoria_usada_mb,
+        "memoria_total_mb": memoria_total_mb,
+        "disponivel": True,
+    }
+
+class ColetorNVML(ColetorHardware):
+    """GPUs Nvidia via NVML: uma sessão e um handle por GPU, abertos uma vez."""
+    
+    nome = "nvml"
+    capacidades = ("gpu",)
+    intervalo = 1.0
+    
+    def iniciar(self) -> bool:
+        self._nvml = DEPENDENCIAS["pynvml"].obter()
+        if self._nvml is None:
+            return False
+        try:
+            self._nvml.nvmlInit()
+        except Exception as e:
+            logger.debug(f"NVML indisponível: {e}")
+            return False
+        self._handles = [self._nvml.nvmlDeviceGetHandleByIndex(i)
+                         for i in range(self._nvml.nvmlDeviceGetCount())]
+        self._nomes = []
+        for handle in self._handles:
+            nome = self._nvml.nvmlDeviceGetName(handle)
+            self._nomes.append(nome.decode() if isinstance(nome, bytes) else nome)
+        return bool(self._handles)
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        nvml = self._nvml
+        gpus = []
+        for indice, (handle, nome) in enumerate(zip(self._handles, self._nomes)):
+            memoria = nvml.nvmlDeviceGetMemoryInfo(handle)
+            gpus.append(_leitura_gpu(
+                indice, nome,
+                carga=nvml.nvmlDeviceGetUtilizationRates(handle).gpu,
+                temperatura=nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU),
+                memoria_usada_mb=round(memoria.used / 1024 ** 2),
+                memoria_total_mb=round(memoria.total / 1024 ** 2),
+            ))
+        return {"gpu": gpus}
+    
+    def fechar(self) -> None:
+        try:
+            self._nvml.nvmlShutdown()
+        except Exception:
+            pass
+
+class ColetorGPUtil(ColetorHardware):
+    """GPUs Nvidia via GPUtil (executa nvidia-smi a cada amostra: cadência baixa)."""
+    
+    nome = "gputil"
+    capacidades = ("gpu",)
+    intervalo = 5.0
+    
+    def iniciar(self) -> bool:
+        self._gputil = DEPENDENCIAS["gputil"].obter()
+        return self._gputil is not None and bool(self.amostrar()["gpu"])
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        return {"gpu": [
+            _leitura_gpu(indice, gpu.name, carga=gpu.load * 100, temperatura=gpu.temperature,
+                         memoria_usada_mb=gpu.memoryUsed, memoria_total_mb=gpu.memoryTotal)
+            for indice, gpu in enumerate(self._gputil.getGPUs())
+        ]}
+
+class ColetorWMIVideo(ColetorHardware):
+    """Controladores de vídeo via WMI (Windows): só nomes, enumerados uma vez."""
+    
+    nome = "wmi_video"
+    capacidades = ("gpu",)
+    intervalo = 300.0
+    
+    def iniciar(self) -> bool:
+        self._gpus: List[Dict] = []
+        self.amostrar()
+        return bool(self._gpus)
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        conexao = obter_conexao_wmi()
+        if conexao:
+            self._gpus = [_leitura_gpu(indice, controlador.Name)
+                          for indice, controlador in enumerate(conexao.Win32_VideoController())]
+        return {"gpu": self._gpus}
+
+# Chips cujos sensores medem a CPU (psutil.sensors_temperatures)
+_SENSORES_CPU = ("coretemp", "k10temp", "zenpower", "cpu_thermal", "cpu-thermal", "soc_thermal")
+
+class ColetorSensoresPsutil(ColetorHardware):
+    """Sensores de temperatura do psutil (Linux/FreeBSD)."""
+    
+    nome = "psutil_sensores"
+    capacidades = ("temperatura",)
+    intervalo = 2.0
+    
+    def iniciar(self) -> bool:
+        return hasattr(psutil, "sensors_temperatures") and bool(self.amostrar()["temperatura"])
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        leituras = []
+        for chip, sensores in psutil.sensors_temperatures().items():
+            for sensor in sensores:
+                leituras.append({
+                    "sensor": chip,
+                    "rotulo": sensor.label or chip,
+                    "atual": round(sensor.current, 1),
+                    "critico": sensor.critical,
+                    "cpu": chip in _SENSORES_CPU,
+                })
+        return {"temperatura": leituras}
+
+class ColetorTemperaturaWMI(ColetorHardware):
+    """Zonas térmicas ACPI via WMI (Windows; normalmente exige administrador)."""
+    
+    nome = "wmi_temperatura"
+    capacidades = ("temperatura",)
+    intervalo = 5.0
+    
+    def iniciar(self) -> bool:
+        try:
+            return bool(self.amostrar()["temperatura"])
+        except Exception as e:
+            logger.debug(f"Temperatura WMI indisponível: {e}")
+            return False
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        conexao = obter_conexao_wmi("root\\wmi")
+        if not conexao:
+            return {"temperatura": []}
+        return {"temperatura": [
+            {
+                "sensor": "acpi",
+                "rotulo": zona.InstanceName,
+                "atual": round(zona.CurrentTemperature / 10 - 273.15, 1),  # Décimos de Kelvin
+                "critico": round(zona.CriticalTripPoint / 10 - 273.15, 1) if zona.CriticalTripPoint else None,
+                "cpu": True,
+            }
+            for zona in conexao.MSAcpi_ThermalZoneTemperature()
+        ]}
+
+class ColetorGPUFalsa(ColetorHardware):
+    """Duas GPUs sintéticas e determinísticas (testes sem hardware)."""
+    
+    nome = "gpu_falsa"
+    capacidades = ("gpu",)
+    
+    def iniciar(self) -> bool:
+        self._aleatorio = random.Random(7)
+        return True
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        return {"gpu": [
+            _leitura_gpu(indice, f"GPU Simulada {indice}",
+                         carga=self._aleatorio.uniform(0, 100),
+                         temperatura=self._aleatorio.uniform(35, 85),
+                         memoria_usada_mb=self._aleatorio.randint(0, 8192),
+                         memoria_total_mb=8192)
+            for indice in range(2)
+        ]}
+
+class ColetorTemperaturaFalsa(ColetorHardware):
+    """Sensores de CPU sintéticos em passeio aleatório entre 40 e 95 °C."""
+    
+    nome = "temperatura_falsa"
+    capacidades = ("temperatura",)
+    
+    def iniciar(self) -> bool:
+        self._aleatorio = random.Random(11)
+        self._atual = [55.0, 52.0]
+        return True
+    
+    def amostrar(self) -> Dict[str, List[Dict]]:
+        self._atual = [min(95.0, max(40.0, t + self._aleatorio.uniform(-3, 3))) for t in self._atual]
+        return {"temperatura": [
+            {"sensor": "simulado", "rotulo": f"Core {i}", "atual": round(t, 1),
+             "critico": 100.0, "cpu": True}
+            for i, t in enumerate(self._atual)
+        ]}
+
+COLETORES_HARDWARE: Dict[str, type] = {
+    classe.nome: classe
+    for classe in (ColetorNVML, ColetorGPUtil, ColetorWMIVideo, ColetorSensoresPsutil,
+                   ColetorTemperaturaWMI, ColetorGPUFalsa, ColetorTemperaturaFalsa)
+}
+
+# Detecção automática: o primeiro backend que inicia vence, por capacidade
+PRIORIDADE_COLETORES = {
+    "gpu": ("nvml", "gputil", "wmi_video"),
+    "temperatura": ("psutil_sensores", "wmi_temperatura"),
+}
+
+GPU_INDISPONIVEL = {"nome": "GPU Integrada/N/A", "carga": 0.0, "temperatura": 0.0, "disponivel": False}
+
+class GerenciadorColetores:
+    """
+    Inicia os coletores de hardware, respeita a cadência de cada um e
+    combina as leituras por capacidade. Entre amostras (e se uma amostra
+    falhar) a última leitura de cada coletor é reaproveitada.
+    
+    iniciar/amostrar/fechar podem ser chamados de qualquer thread (ex:
+    asyncio.to_thread), mas executam sempre numa única thread dedicada:
+    sessões NVML e conexões WMI/COM são abertas e usadas nela.
+    """
+    
+    def __init__(self, nomes: Optional[Sequence[str]] = None):
+        self._nomes = nomes
+        self.ativos: List[ColetorHardware] = []
+        self._proxima: Dict[str, float] = {}
+        self._ultimas: Dict[str, Dict[str, List[Dict]]] = {}
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="noc-hardware")
+    
+    def _executar(self, funcao: Callable, *args) -> Any:
+        return self._thread.submit(funcao, *args).result()
+    
+    def _iniciar_coletor(self, nome: str) -> bool:
+        classe = COLETORES_HARDWARE.get(nome)
+        if classe is None:
+            logger.warning(f"⚠️  Coletor desconhecido: {nome}")
+            return False
+        coletor = classe()
+        try:
+            if not coletor.iniciar():
+                return False
+        except Exception as e:
+            logger.debug(f"Coletor {nome} não iniciou: {e}")
+            return False
+        self.ativos.append(coletor)
+        self._proxima[nome] = 0.0
+        logger.info(f"🔌 Coletor de hardware ativo: {nome} ({', '.join(coletor.capacidades)}, "
+                    f"a cada {coletor.intervalo:g}s)")
+        return True
+    
+    def iniciar(self) -> None:
+        self._executar(self._iniciar)
+    
+    def amostrar(self, forcar: Sequence[str] = ()) -> Dict[str, List[Dict]]:
+        """
+        Args:
+            forcar: Capacidades amostradas mesmo fora da cadência (modo rajada)
+            
+        Returns:
+            {"gpu": [...], "temperatura": [...]} com todos os dispositivos
+        """
+        return self._executar(self._amostrar, forcar)
+    
+    def fechar(self) -> None:
+        self._executar(self._fechar)
+        self._thread.shutdown(wait=False)
+    
+    def _iniciar(self) -> None:
+        if self._nomes:
+            for nome in self._nomes:
+                self._iniciar_coletor(nome)
+            return
+        for ordem in PRIORIDADE_COLETORES.values():
+            for nome in ordem:
+                if self._iniciar_coletor(nome):
+                    break
+    
+    def _amostrar(self, forcar: Sequence[str]) -> Dict[str, List[Dict]]:
+        agora = time.monotonic()
+        for coletor in self.ativos:
+            if agora < self._proxima[coletor.nome] and not set(forcar) & set(coletor.capacidades):
+                continue
+            self._proxima[coletor.nome] = agora + coletor.intervalo
+            try:
+                with PERF.medir(f"hw_{coletor.nome}"):
+                    self._ultimas[coletor.nome] = coletor.amostrar()
+            except Exception as e:
+                logger.debug(f"Erro no coletor {coletor.nome}: {e}")
+        
+        leituras: Dict[str, List[Dict]] = {capacidade: [] for capacidade in PRIORIDADE_COLETORES}
+        for ultima in self._ultimas.values():
+            for capacidade, itens in ultima.items():
+                leituras.setdefault(capacidade, []).extend(itens)
+        return leituras
+    
+    def _fechar(self) -> None:
+        for coletor in self.ativos:
+            try:
+                coletor.fechar()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar coletor {coletor.nome}: {e}")
+        self.ativos.clear()
+
+def temperatura_cpu(temperaturas: List[Dict]) -> Optional[float]:
+    """Maior leitura entre os sensores de CPU (None se não houver)."""
+    leituras = [t["atual"] for t in temperaturas if t["cpu"]]
+    return max(leituras) if leituras else None
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 6.6 LINHAS DE BASE E ANOMALIAS
+# ═══════════════════════════════════════════════════════════════════════════
+
+class LinhasDeBase:
+    """
+    Linha de base de cada série (métrica × alvo) em memória constante:
+    média/variância EWMA e um perfil por hora do dia (24 médias/variâncias).
+    
+    Todas as séries de um tick são atualizadas juntas (operações vetoriais
+    com NumPy; listas sem NumPy). O peso de cada amostra depende do tempo
+    decorrido, não da cadência de coleta. O escore é o desvio padronizado
+    em relação à EWMA e, com o perfil da hora maduro, o menor dos dois: só
+    é anômalo o que foge do recente e do habitual para aquela hora.
+    
+    Maturidade e persistência são contadas em segundos observados, não em
+    amostras: ticks mais frequentes não aceleram nem uma nem outra. Uma
+    anomalia começa após ANOMALIA_PERSISTENCIA segundos com escore acima
+    de ANOMALIA_Z (cada amostra vale no máximo metade disso, então são
+    pelo menos duas) e termina quando o escore cai abaixo da metade de
+    ANOMALIA_Z. Apenas desvios para cima contam (mais CPU, mais latência).
+    """
+    
+    _CAMPOS = ("media", "variancia", "segundos", "persistencia", "ativa")
+    # Por hora do dia (24 × séries); sazonal_dias = dias distintos em que a
+    # hora foi observada, sazonal_dia = último deles (ordinal da data)
+    _CAMPOS_SAZONAIS = ("sazonal_media", "sazonal_variancia", "sazonal_segundos",
+                        "sazonal_dias", "sazonal_dia")
+    
+    def __init__(self):
+        self.chaves: List[str] = []
+        self._indices: Dict[str, int] = {}
+        self._ultimas_chaves: Tuple[str, ...] = ()
+        self._posicoes: Any = None
+        self._np = None
+        self._t: Optional[float] = None
+        self._dados: Dict[str, Any] = {}
+    
+    def __len__(self) -> int:
+        return len(self.chaves)
+    
+    def _crescer(self, quantidade: int) -> None:
+        """Acrescenta séries novas (raro: só quando surgem alvos/métricas)."""
+        np = self._np
+        if np is not None:
+            for campo in self._CAMPOS:
+                tipo = bool if campo == "ativa" else np.float64
+                self._dados[campo] = np.concatenate((self._dados[campo], np.zeros(quantidade, dtype=tipo)))
+            for campo in self._CAMPOS_SAZONAIS:
+                self._dados[campo] = np.concatenate(
+                    (self._dados[campo], np.zeros((24, quantidade))), axis=1)
+        else:
+            for campo in self._CAMPOS:
+                self._dados[campo].extend([False if campo == "ativa" else 0.0] * quantidade)
+            for campo in self._CAMPOS_SAZONAIS:
+                for linha in self._dados[campo]:
+                    linha.extend([0.0] * quantidade)
+    
+    def _posicionar(self, chaves: Sequence[str]) -> Any:
+        chaves = tuple(chaves)
+        if chaves == self._ultimas_chaves:
+            return self._posicoes
+        
+        novas = [chave for chave in dict.fromkeys(chaves) if chave not in self._indices]
+        for chave in novas:
+            self._indices[chave] = len(self.chaves)
+            self.chaves.append(chave)
+        if novas:
+            self._crescer(len(novas))
+        
+        posicoes = [self._indices[chave] for chave in chaves]
+        self._ultimas_chaves = chaves
+        self._posicoes = self._np.array(posicoes, dtype=self._np.intp) if self._np is not None else posicoes
+        return self._posicoes
+    
+    def atualizar(self, chaves: Sequence[str], valores: Sequence[float],
+                  t: float) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Args:
+            chaves: Identificador de cada série (ex: "cpu", "latencia/Google DNS")
+            valores: Valor atual de cada série (NaN = sem leitura neste tick)
+            t: Epoch do snapshot (define a hora do dia e o peso da amostra)
+            
+        Returns:
+            Tupla (anomalias que começaram agora, anomalias ativas); cada item
+            tem serie, valor, esperado, desvio e z
+        """
+        if self._t is None:
+            self._np = DEPENDENCIAS["numpy"].obter()
+            self._inicializar()
+            intervalo = CONFIG["COLETA_INTERVALO"]
+        else:
+            intervalo = min(max(t - self._t, 0.0), CONFIG["BASE_CONSTANTE_TEMPO"])
+        self._t = t
+        if not chaves or intervalo <= 0:
+            return [], []
+        
+        alfa = 1 - math.exp(-intervalo / CONFIG["BASE_CONSTANTE_TEMPO"])
+        alfa_sazonal = 1 - math.exp(-intervalo / CONFIG["BASE_SAZONAL_CONSTANTE"])
+        momento = datetime.fromtimestamp(t)
+        hora, dia = momento.hour, momento.toordinal()
+        posicoes = self._posicionar(chaves)
+        
+        if self._np is not None:
+            return self._atualizar_numpy(posicoes, valores, hora, dia, intervalo, alfa, alfa_sazonal)
+        return self._atualizar_listas(posicoes, valores, hora, dia, intervalo, alfa, alfa_sazonal)
+    
+    def habitual(self, chave: str, valor: float, t: float) -> bool:
+        """
+        Indica se `valor` é habitual para a série naquela hora do dia: o
+        perfil horário cobre ao menos BASE_MIN_DIAS_HABITUAL dias distintos
+        e o escore fica abaixo de ANOMALIA_Z. Só minutos de observação não
+        bastam: um incidente novo e sustentado viraria o próprio perfil.
+        """
+        i = self._indices.get(chave)
+        if i is None or valor is None:
+            return False
+        hora = datetime.fromtimestamp(t).hour
+        d = self._dados
+        if self._np is not None:
+            dias_h, media_h, variancia_h = (float(d[campo][hora, i]) for campo in
+                                            ("sazonal_dias", "sazonal_media", "sazonal_variancia"))
+        else:
+            dias_h, media_h, variancia_h = (d[campo][hora][i] for campo in
+                                            ("sazonal_dias", "sazonal_media", "sazonal_variancia"))
+        if dias_h < CONFIG["BASE_MIN_DIAS_HABITUAL"]:
+            return False
+        dp_h = max(math.sqrt(variancia_h), abs(media_h) * CONFIG["ANOMALIA_DESVIO_RELATIVO"],
+                   CONFIG["ANOMALIA_DESVIO_MINIMO"])
+        return (valor - media_h) / dp_h < CONFIG["ANOMALIA_Z"]
+    
+    def _inicializar(self) -> None:
+        np = self._np
+        if np is not None:
+            self._dados = {campo: np.zeros(0, dtype=bool if campo == "ativa" else np.float64)
+                           for campo in self._CAMPOS}
+            self._dados.update({campo: np.zeros((24, 0)) for campo in self._CAMPOS_SAZONAIS})
+        else:
+            self._dados = {campo: [] for campo in self._CAMPOS}
+            self._dados.update({campo: [[] for _ in range(24)] for campo in self._CAMPOS_SAZONAIS})
+    
+    def _atualizar_numpy(self, posicoes, valores, hora: int, dia: int, intervalo: float,
+                         alfa: float, alfa_sazonal: float):
+        np = self._np
+        d = self._dados
+        passo = min(intervalo, CONFIG["ANOMALIA_PERSISTENCIA"] / 2)
+        x = np.asarray(valores, dtype=np.float64)
+        validos = ~np.isnan(x)
+        i, x = posicoes[validos], x[validos]
+        
+        def desvio(media, variancia):
+            return np.maximum(np.sqrt(variancia), np.maximum(
+                np.abs(media) * CONFIG["ANOMALIA_DESVIO_RELATIVO"], CONFIG["ANOMALIA_DESVIO_MINIMO"]))
+        
+        # Escore antes de incorporar a amostra
+        media, variancia, segundos = d["media"][i], d["variancia"][i], d["segundos"][i]
+        media_h = d["sazonal_media"][hora, i]
+        variancia_h = d["sazonal_variancia"][hora, i]
+        segundos_h = d["sazonal_segundos"][hora, i]
+        
+        esperado, dp = media, desvio(media, variancia)
+        z = np.where(segundos >= CONFIG["BASE_MIN_SEGUNDOS"], (x - media) / dp, 0.0)
+        dp_h = desvio(media_h, variancia_h)
+        z_h = (x - media_h) / dp_h
+        usar_hora = (segundos_h >= CONFIG["BASE_MIN_SEGUNDOS_SAZONAL"]) & (np.abs(z_h) < np.abs(z))
+        z = np.where(usar_hora, z_h, z)
+        esperado = np.where(usar_hora, media_h, esperado)
+        dp = np.where(usar_hora, dp_h, dp)
+        
+        # EWMA (a primeira amostra de cada série vira a média)
+        delta = x - media
+        d["media"][i] = np.where(segundos > 0, media + alfa * delta, x)
+        d["variancia"][i] = np.where(segundos > 0, (1 - alfa) * (variancia + alfa * delta * delta), 0.0)
+        d["segundos"][i] = segundos + intervalo
+        delta_h = x - media_h
+        d["sazonal_media"][hora, i] = np.where(segundos_h > 0, media_h + alfa_sazonal * delta_h, x)
+        d["sazonal_variancia"][hora, i] = np.where(
+            segundos_h > 0, (1 - alfa_sazonal) * (variancia_h + alfa_sazonal * delta_h * delta_h), 0.0)
+        d["sazonal_segundos"][hora, i] = segundos_h + intervalo
+        d["sazonal_dias"][hora, i] += d["sazonal_dia"][hora, i] != dia
+        d["sazonal_dia"][hora, i] = dia
+        
+        # Persistência e histerese
+        limite = CONFIG["ANOMALIA_Z"]
+        persistencia = np.where(z >= limite, d["persistencia"][i] + passo, 0.0)
+        d["persistencia"][i] = persistencia
+        ativa_antes = d["ativa"][i]
+        ativa = (persistencia >= CONFIG["ANOMALIA_PERSISTENCIA"]) | (ativa_antes & (z >= limite / 2))
+        d["ativa"][i] = ativa
+        
+        def descrever(mascara) -> List[Dict]:
+            return self._descrever(i[mascara].tolist(), x[mascara].tolist(), esperado[mascara].tolist(),
+                                   dp[mascara].tolist(), z[mascara].tolist())
+        
+        return descrever(ativa & ~ativa_antes), descrever(ativa)
+    
+    def _atualizar_listas(self, posicoes, valores, hora: int, dia: int, intervalo: float,
+                          alfa: float, alfa_sazonal: float):
+        d = self._dados
+        passo = min(intervalo, CONFIG["ANOMALIA_PERSISTENCIA"] / 2)
+        limite = CONFIG["ANOMALIA_Z"]
+        novas: List[tuple] = []
+        ativas: List[tuple] = []
+        
+        def desvio(media, variancia):
+            return max(math.sqrt(variancia), abs(media) * CONFIG["ANOMALIA_DESVIO_RELATIVO"],
+                       CONFIG["ANOMALIA_DESVIO_MINIMO"])
+        
+        for i, x in zip(posicoes, valores):
+            if x is None or math.isnan(x):
+                continue
+            media, variancia, segundos = d["media"][i], d["variancia"][i], d["segundos"][i]
+            media_h = d["sazonal_media"][hora][i]
+            variancia_h = d["sazonal_variancia"][hora][i]
+            segundos_h = d["sazonal_segundos"][hora][i]
+            
+            esperado, dp = media, desvio(media, variancia)
+            z = (x - media) / dp if segundos >= CONFIG["BASE_MIN_SEGUNDOS"] else 0.0
+            dp_h = desvio(media_h, variancia_h)
+            z_h = (x - media_h) / dp_h
+            if segundos_h >= CONFIG["BASE_MIN_SEGUNDOS_SAZONAL"] and abs(z_h) < abs(z):
+                z, esperado, dp = z_h, media_h, dp_h
+            
+            delta = x - media
+            d["media"][i] = media + alfa * delta if segundos else x
+            d["variancia"][i] = (1 - alfa) * (variancia + alfa * delta * delta) if segundos else 0.0
+            d["segundos"][i] = segundos + intervalo
+            delta_h = x - media_h
+            d["sazonal_media"][hora][i] = media_h + alfa_sazonal * delta_h if segundos_h else x
+            d["sazonal_variancia"][hora][i] = (
+                (1 - alfa_sazonal) * (variancia_h + alfa_sazonal * delta_h * delta_h) if segundos_h else 0.0)
+            d["sazonal_segundos"][hora][i] = segundos_h + intervalo
+            if d["sazonal_dia"][hora][i] != dia:
+                d["sazonal_dias"][hora][i] += 1
+                d["sazonal_dia"][hora][i] = dia
+            
+            persistencia = d["persistencia"][i] + passo if z >= limite else 0.0
+            d["persistencia"][i] = persistencia
+            ativa_antes = d["ativa"][i]
+            ativa = persistencia >= CONFIG["ANOMALIA_PERSISTENCIA"] or (ativa_antes and z >= limite / 2)
+            d["ativa"][i] = ativa
+            if ativa:
+                ativas.append((i, x, esperado, dp, z))
+                if not ativa_antes:
+                    novas.append((i, x, esperado, dp, z))
+        
+        def descrever(itens: List[tuple]) -> List[Dict]:
+            return self._descrever(*zip(*itens)) if itens else []
+        
+        return descrever(novas), descrever(ativas)
+    
+    def _descrever(self, indices, valores, esperados, desvios, escores) -> List[Dict]:
+        return [
+            {"serie": self.chaves[i], "valor": round(x, 2), "esperado": round(e, 2),
+             "desvio": round(dp, 2), "z": round(z, 1)}
+            for i, x, e, dp, z in zip(indices, valores, esperados, desvios, escores)
+        ]
+
+def series_do_snapshot(snapshot: Dict) -> Tuple[List[str], List[float]]:
+    """
+    Séries acompanhadas pelas linhas de base: CPU, RAM, temperatura da CPU,
+    a latência de cada alvo WAN (NaN enquanto o alvo estiver DOWN) e as
+    contagens de conexões TCP (quando o coletor está ativo).
+    """
+    chaves = ["cpu", "ram", "temperatura_cpu"]
+    temperatura = snapshot.get("temperatura_cpu")
+    valores = [snapshot["cpu"], snapshot["ram"], math.nan if temperatura is None else temperatura]
+    for w in snapshot["wan"]:
+        chaves.append(f"latencia/{w['nome']}")
+        valores.append(w["latencia_ms"] if w["status"] == "UP" else math.nan)
+    conexoes = snapshot.get("conexoes")
+    if conexoes:
+        parcial = conexoes.get("parcial")  # Contagem truncada: sem leitura neste tick
+        chaves.append("conexoes/total")
+        valores.append(math.nan if parcial else conexoes["total"])
+        for estado in ESTADOS_HISTORICO:
+            chaves.append(f"conexoes/{estado}")
+            valores.append(math.nan if parcial else conexoes["estados"].get(estado, 0))
+    return chaves, valores
+
+BASES = LinhasDeBase()
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 6.7 UTILIZAÇÃO PASSIVA DO LINK
+# ═══════════════════════════════════════════════════════════════════════════
+
+def interfaces_rota_padrao() -> Set[str]:
+    """Interfaces com rota padrão IPv4/IPv6 (Linux, via /proc); vazio nos demais sistemas."""
+    nomes = set()
+    try:
+        with open("/proc/net/route", encoding="ascii") as arquivo:
+            for linha in itertools.islice(arquivo, 1, None):
+                campos = linha.split()
+                if len(campos) > 7 and campos[1] == "00000000" and campos[7] == "00000000":
+                    nomes.add(campos[0])
+    except OSError:
+        pass
+    try:
+        with open("/proc/net/ipv6_route", encoding="ascii") as arquivo:
+            for linha in arquivo:
+                campos = linha.split()
+                if len(campos) > 9 and campos[1] == "00" and not campos[0].strip("0"):
+                    nomes.add(campos[9])
+    except OSError:
+        pass
+    return nomes
+
+class UtilizacaoLink:
+    """
+    Utilização do link de internet medida passivamente: taxas rx/tx da
+    interface do link comparadas à capacidade do último speedtest
+    confiável, sem gerar tráfego. A interface é UTILIZACAO_INTERFACES ou,
+    sem configuração, a da rota padrão (reavaliada a cada
+    PARTICOES_INTERVALO); loopback, bridges e interfaces virtuais
+    (INTERFACES_VIRTUAIS: docker, veth, túneis...) nunca entram na soma.
+    
+    Uma thread lê os contadores a cada UTILIZACAO_AMOSTRAGEM segundos
+    (100 ms por padrão) e guarda as taxas numa janela deslizante, de onde
+    saem média, p95 e pico de cada janela em UTILIZACAO_JANELAS. Sem a
+    thread (amostragem 0, benchmark) as taxas de cada tick alimentam a
+    janela. Amostras tomadas durante um speedtest são descartadas: o
+    tráfego do próprio teste não é carga do link.
+    
+    Saturação sustentada: ao menos SATURACAO_FRACAO das amostras dos
+    últimos SATURACAO_DURACAO segundos acima de SATURACAO_LIMIAR % da
+    capacidade.
+    """
+    
+    SENTIDOS = (("download", 1), ("upload", 2))
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._amostras: deque = deque()  # (t, rx, tx) com taxas em bytes/s
+        self._selecao: Tuple[Tuple[str, ...], List[bool]] = ((), [])
+        self._proxima_selecao = 0.0
+        self.interfaces: List[str] = []
+        self.amostrando = False
+        self.em_teste = False
+    
+    def iniciar(self) -> None:
+        """Inicia a thread de amostragem (no-op se UTILIZACAO_AMOSTRAGEM = 0)."""
+        if self.amostrando or CONFIG["UTILIZACAO_AMOSTRAGEM"] <= 0:
+            return
+        self.amostrando = True
+        threading.Thread(target=self._amostrar_continuamente, daemon=True).start()
+    
+    def selecionar(self, nomes: Sequence[str]) -> List[bool]:
+        """
+        Máscara das interfaces que formam o link, recalculada quando as NICs
+        mudam ou a cada PARTICOES_INTERVALO (a rota padrão pode mudar).
+        Sem rota padrão conhecida, vale a soma das físicas.
+        """
+        nomes = tuple(nomes)
+        agora = time.monotonic()
+        if nomes == self._selecao[0] and agora < self._proxima_selecao:
+            return self._selecao[1]
+        self._proxima_selecao = agora + CONFIG["PARTICOES_INTERVALO"]
+        
+        configuradas = CONFIG["UTILIZACAO_INTERFACES"]
+        if configuradas:
+            mascara = [nome in configuradas for nome in nomes]
+        else:
+            virtuais = re.compile(CONFIG["INTERFACES_VIRTUAIS"], re.IGNORECASE)
+            fisicas = [not _PADRAO_LOOPBACK.match(nome) and not virtuais.match(nome) for nome in nomes]
+            rota = interfaces_rota_padrao()
+            mascara = [fisica and nome in rota for fisica, nome in zip(fisicas, nomes)]
+            if not any(mascara):
+                mascara = fisicas
+        
+        interfaces = [nome for nome, incluida in zip(nomes, mascara) if incluida]
+        if interfaces != self.interfaces:
+            logger.info(f"📶 Utilização do link medida em: {', '.join(interfaces) or 'nenhuma interface'}")
+            self.interfaces = interfaces
+        self._selecao = (nomes, mascara)
+        return mascara
+    
+    def somar(self, tabela: Dict) -> Tuple[float, float]:
+        """Taxas rx/tx (bytes/s) do link a partir da tabela "interfaces" do snapshot."""
+        i_rx, i_tx = tabela["campos"].index("rx"), tabela["campos"].index("tx")
+        rx = tx = 0.0
+        for linha, incluida in zip(tabela["valores"], self.selecionar(tabela["nomes"])):
+            if incluida:
+                rx += linha[i_rx]
+                tx += linha[i_tx]
+        return rx, tx
+    
+    def _ler_contadores(self) -> Tuple[Tuple[str, ...], int, int]:
+        contadores = psutil.net_io_counters(pernic=True)
+        rx = tx = 0
+        for contador, incluida in zip(contadores.values(), self.selecionar(contadores)):
+            if incluida:
+                rx += contador.bytes_recv
+                tx += contador.bytes_sent
+        return tuple(self.interfaces), rx, tx
+    
+    def _amostrar_continuamente(self) -> None:
+        anterior = None
+        while True:
+            try:
+                nomes, rx, tx = self._ler_contadores()
+                agora = time.monotonic()
+                if anterior is not None and not self.em_teste:
+                    nomes_antes, rx_antes, tx_antes, t_antes = anterior
+                    # Interface do link trocada ou contador reiniciado: só rebaseia
+                    if nomes == nomes_antes and rx >= rx_antes and tx >= tx_antes and agora > t_antes:
+                        intervalo = agora - t_antes
+                        self.registrar(time.time(), (rx - rx_antes) / intervalo, (tx - tx_antes) / intervalo)
+                anterior = (nomes, rx, tx, agora)
+            except Exception as e:
+                logger.debug(f"Erro ao amostrar utilização do link: {e}")
+            time.sleep(CONFIG["UTILIZACAO_AMOSTRAGEM"])
+    
+    def registrar(self, t: float, rx: float, tx: float) -> None:
+        """Acrescenta uma amostra (bytes/s) e descarta as mais antigas que a maior janela."""
+        retencao = max(max(CONFIG["UTILIZACAO_JANELAS"]), CONFIG["SATURACAO_DURACAO"])
+        with self._lock:
+            self._amostras.append((t, rx, tx))
+            while self._amostras[0][0] < t - retencao:
+                self._amostras.popleft()
+    
+    def _recentes(self, segundos: float, agora: Optional[float] = None) -> List[Tuple[float, float, float]]:
+        agora = time.time() if agora is None else agora
+        with self._lock:
+            amostras = list(self._amostras)
+        inicio = bisect.bisect_left([amostra[0] for amostra in amostras], agora - segundos)
+        return amostras[inicio:]
+    
+    def carga_recente(self, segundos: float) -> Optional[Dict[str, float]]:
+        """
+        Returns:
+            Tráfego médio em Mbps por sentido nos últimos `segundos`, ou None sem amostras
+        """
+        amostras = self._recentes(segundos)
+        if not amostras:
+            return None
+        return {
+            sentido: round(sum(amostra[i] for amostra in amostras) / len(amostras) * 8 / 1e6, 2)
+            for sentido, i in self.SENTIDOS
+        }
+    
+    @staticmethod
+    def _estatisticas(taxas: List[float], capacidade_mbps: float) -> Optional[Dict]:
+        if not taxas:
+            return None
+        mbps = sorted(taxa * 8 / 1e6 for taxa in taxas)
+        valores = {
+            "media_mbps": sum(mbps) / len(mbps),
+            "p95_mbps": mbps[min(len(mbps) - 1, int(0.95 * len(mbps)))],
+            "pico_mbps": mbps[-1],
+        }
+        estatisticas = {chave: round(valor, 2) for chave, valor in valores.items()}
+        for chave, nome in (("media_mbps", "uso_medio_pct"), ("p95_mbps", "uso_p95_pct"),
+                            ("pico_mbps", "uso_pico_pct")):
+            estatisticas[nome] = round(valores[chave] * 100 / capacidade_mbps, 1) if capacidade_mbps else None
+        return estatisticas
+    
+    def _saturado(self, amostras: List[Tuple[float, float, float]], indice: int,
+                  capacidade_mbps: float, agora: float) -> bool:
+        duracao = CONFIG["SATURACAO_DURACAO"]
+        # Exige amostras cobrindo a duração (não dispara logo após o início ou um speedtest)
+        if not capacidade_mbps or not amostras or amostras[0][0] > agora - duracao * 0.9:
+            return False
+        limiar = capacidade_mbps * 1e6 / 8 * CONFIG["SATURACAO_LIMIAR"] / 100
+        acima = sum(1 for amostra in amostras if amostra[indice] >= limiar)
+        return acima >= CONFIG["SATURACAO_FRACAO"] * len(amostras)
+    
+    def resumo(self, capacidade: Dict, agora: Optional[float] = None) -> Dict:
+        """
+        Args:
+            capacidade: ESTADO["capacidade_link"] ({download_mbps, upload_mbps, ...})
+            
+        Returns:
+            Estatísticas por janela e sentido e flags de saturação sustentada
+        """
+        agora = time.time() if agora is None else agora
+        capacidades = {sentido: capacidade.get(f"{sentido}_mbps") or 0.0 for sentido, _ in self.SENTIDOS}
+        amostras = self._recentes(max(max(CONFIG["UTILIZACAO_JANELAS"]), CONFIG["SATURACAO_DURACAO"]), agora)
+        tempos = [amostra[0] for amostra in amostras]
+        
+        janelas = {}
+        for segundos in sorted(CONFIG["UTILIZACAO_JANELAS"]):
+            recorte = amostras[bisect.bisect_left(tempos, agora - segundos):]
+            janelas[f"{segundos}s"] = {
+                sentido: self._estatisticas([amostra[i] for amostra in recorte], capacidades[sentido])
+                for sentido, i in self.SENTIDOS
+            }
+        
+        recorte = amostras[bisect.bisect_left(tempos, agora - CONFIG["SATURACAO_DURACAO"]):]
+        return {
+            "capacidade": capacidade,
+            "amostragem_ms": round(CONFIG["UTILIZACAO_AMOSTRAGEM"] * 1000) if self.amostrando else None,
+            "interfaces": self.interfaces,
+            "janelas": janelas,
+            "saturado": {
+                sentido: self._saturado(recorte, i, capacidades[sentido], agora)
+                for sentido, i in self.SENTIDOS
+            },
+        }
+    
+    @staticmethod
+    def teste_confiavel(carga: Optional[Dict[str, float]], resultado: Dict[str, float],
+                        capacidade: Dict) -> Optional[bool]:
+        """
+        Um speedtest é confiável se o tráfego de fundo pouco antes dele
+        ficou abaixo de SPEEDTEST_CARGA_MAXIMA da capacidade (a maior entre
+        a conhecida e a medida no próprio teste).
+        
+        Returns:
+            True/False, ou None quando não há amostras de carga
+        """
+        if carga is None:
+            return None
+        for sentido in ("download", "upload"):
+            referencia = max(capacidade.get(f"{sentido}_mbps") or 0.0, resultado[sentido])
+            if referencia and carga[sentido] > CONFIG["SPEEDTEST_CARGA_MAXIMA"] * referencia:
+                return False
+        return True
+
+UTILIZACAO = UtilizacaoLink()
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 6.8 TABELA DE CONEXÕES TCP
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Estados de /proc/net/tcp (include/net/tcp_states.h) com os nomes do psutil
+_ESTADOS_TCP = {
+    "01": "ESTABLISHED", "02": "SYN_SENT", "03": "SYN_RECV", "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2", "06": "TIME_WAIT", "07": "CLOSE", "08": "CLOSE_WAIT",
+    "09": "LAST_ACK", "0A": "LISTEN", "0B": "CLOSING", "0C": "SYN_RECV",  # 0C = NEW_SYN_RECV
+}
+_ARQUIVOS_TCP = ("/proc/net/tcp", "/proc/net/tcp6")
+ESTADOS_HISTORICO = ("ESTABLISHED", "TIME_WAIT", "CLOSE_WAIT", "SYN_RECV")  # Histórico e linhas de base
+_LINHAS_POR_BLOCO = 8192
+
+def _ip_proc(hexa: str) -> str:
+    """Endereço de /proc/net/tcp[6] (palavras de 32 bits little-endian) em texto."""
+    dados = bytes.fromhex(hexa)
+    if len(dados) == 4:
+        return socket.inet_ntop(socket.AF_INET, dados[::-1])
+    ip = socket.inet_ntop(socket.AF_INET6, b"".join(dados[i:i + 4][::-1] for i in range(0, 16, 4)))
+    return ip[7:] if ip.startswith("::ffff:") and "." in ip else ip  # IPv4 mapeado
+
+class ColetorConexoes:
+    """
+    Tabela de conexões TCP agregada: contagens por estado e top-K por
+    porta local e por par remoto (com o detalhamento por estado), além da
+    fila de aceite das portas em escuta (backlog de SYN/accept).
+    
+    Roda numa thread própria a cada CONEXOES_INTERVALO segundos; o tick de
+    coleta só lê o último resumo. No Linux, /proc/net/tcp e tcp6 são lidos
+    diretamente em blocos, contando tuplas (estado, porta, par) sem
+    decodificar nada; só o top-K é convertido no final. Fora do Linux,
+    psutil.net_connections().
+    
+    Tempo limitado: a leitura para em CONEXOES_MAX sockets ou quando o
+    tempo gasto mais a agregação das tuplas já distintas (custo por tupla
+    medido na amostra anterior) passaria de CONEXOES_ORCAMENTO_MS; o
+    resumo sai "parcial". tcp e tcp6 são lidos em blocos alternados, então
+    um resumo parcial ainda cobre as duas famílias (e o que uma não usa
+    fica para a outra). Contagens parciais são limites inferiores: servem
+    para disparar limites, não para encerrá-los nem para as linhas de
+    base. Se uma amostra custar mais de 5% do intervalo, a cadência é
+    estendida na mesma proporção.
+    """
+    
+    def __init__(self, arquivos: Sequence[str] = _ARQUIVOS_TCP):
+        self._arquivos = [caminho for caminho in arquivos if os.path.exists(caminho)]
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._custo_tupla = 2e-6  # Segundos de agregação por tupla distinta (medido a cada amostra grande)
+        self.ultimo: Optional[Dict] = None
+    
+    def iniciar(self) -> None:
+        """Inicia a thread de amostragem (no-op se CONEXOES_INTERVALO = 0)."""
+        if self._thread is not None or CONFIG["CONEXOES_INTERVALO"] <= 0:
+            return
+        self._thread = threading.Thread(target=self._amostrar_continuamente, daemon=True)
+        self._thread.start()
+    
+    def fechar(self) -> None:
+        self._parar.set()
+    
+    def _amostrar_continuamente(self) -> None:
+        while not self._parar.is_set():
+            intervalo = CONFIG["CONEXOES_INTERVALO"]
+            try:
+                with PERF.medir("conexoes"):
+                    self.ultimo = self.amostrar()
+                intervalo = max(intervalo, self.ultimo["duracao_ms"] / 1000 * 20)
+            except psutil.AccessDenied:
+                logger.warning("⚠️  Sem permissão para listar conexões TCP; coletor desativado")
+                return
+            except Exception as e:
+                logger.debug(f"Erro ao amostrar conexões TCP: {e}")
+            self._parar.wait(intervalo)
+    
+    def _esgotado(self, contagem: Counter, lidas: int, limite: int, prazo: float,
+                  bloco: int, duracao_bloco: float) -> bool:
+        """Próximo bloco (mesma duração do anterior, até `bloco` tuplas novas) + agregação passariam do prazo?"""
+        agregacao = (len(contagem) + bloco) * self._custo_tupla
+        return lidas >= limite or time.perf_counter() + duracao_bloco + agregacao > prazo
+    
+    def _contar_proc(self, limite: int, prazo: float) -> Tuple[Counter, bool]:
+        contagem: Counter = Counter()
+        lidas = 0
+        with contextlib.ExitStack() as pilha:
+            abertos = []
+            for caminho in self._arquivos:
+                arquivo = pilha.enter_context(open(caminho, encoding="ascii", errors="replace"))
+                next(arquivo, None)  # Cabeçalho
+                abertos.append(arquivo)
+            
+            # Blocos alternados entre tcp e tcp6: um corte por orçamento cobre as duas famílias
+            while abertos:
+                for arquivo in list(abertos):
+                    inicio_bloco = time.perf_counter()
+                    pedido = min(_LINHAS_POR_BLOCO, limite - lidas)
+                    bloco = list(itertools.islice(arquivo, pedido))
+                    if len(bloco) < pedido:
+                        abertos.remove(arquivo)  # Fim do arquivo
+                    # (estado, porta local, IP remoto, filas tx:rx só em LISTEN); o resto da linha não é separado
+                    contagem.update(
+                        (campos[3], campos[1][-4:], campos[2][:-5], campos[4] if campos[3] == "0A" else None)
+                        for campos in (linha.split(None, 5) for linha in bloco)
+                    )
+                    lidas += len(bloco)
+                    duracao_bloco = time.perf_counter() - inicio_bloco
+                    if lidas >= limite:
+                        return contagem, any(next(aberto, None) is not None for aberto in abertos)
+                    if abertos and self._esgotado(contagem, lidas, limite, prazo, len(bloco), duracao_bloco):
+                        return contagem, True
+        return contagem, False
+    
+    def _contar_psutil(self, limite: int, prazo: float) -> Tuple[Counter, bool]:
+        """
+        psutil.net_connections() monta a lista inteira antes de devolvê-la:
+        o orçamento aqui só limita a contagem das tuplas, não a listagem,
+        que é o custo dominante (e cresce com o número de sockets).
+        """
+        contagem: Counter = Counter()
+        inicio_bloco = time.perf_counter()
+        for lidas, conexao in enumerate(psutil.net_connections(kind="tcp"), 1):
+            contagem[(conexao.status, conexao.laddr.port if conexao.laddr else 0,
+                      conexao.raddr.ip if conexao.raddr else "",
+                      "" if conexao.status == psutil.CONN_LISTEN else None)] += 1
+            if lidas % _LINHAS_POR_BLOCO == 0:
+                duracao_bloco = time.perf_counter() - inicio_bloco
+                if self._esgotado(contagem, lidas, limite, prazo, _LINHAS_POR_BLOCO, duracao_bloco):
+                    return contagem, True
+                inicio_bloco = time.perf_counter()
+        return contagem, False
+    
+    def amostrar(self) -> Dict:
+        """
+        Returns:
+            Resumo: total, estados, portas/pares (top-K) e escuta (maiores filas de aceite)
+        """
+        inicio = time.perf_counter()
+        prazo = inicio + CONFIG["CONEXOES_ORCAMENTO_MS"] / 1000
+        if self._arquivos:
+            fonte = "proc"
+            contagem, parcial = self._contar_proc(CONFIG["CONEXOES_MAX"], prazo)
+        else:
+            fonte = "psutil"
+            contagem, parcial = self._contar_psutil(CONFIG["CONEXOES_MAX"], prazo)
+        
+        # Totais sobre as tuplas distintas; sockets em escuta ficam fora das tabelas
+        agregacao = time.perf_counter()
+        estados: Dict[str, int] = defaultdict(int)
+        portas: Dict[Any, int] = defaultdict(int)
+        pares: Dict[str, int] = defaultdict(int)
+        escuta: Dict[Any, int] = {}
+        for (estado, porta, par, filas), quantidade in contagem.items():
+            estados[estado] += quantidade
+            if filas is not None:
+                if filas:
+                    escuta[porta] = max(escuta.get(porta, 0), int(filas[9:], 16))  # rx_queue = fila de aceite
+                continue
+            portas[porta] += quantidade
+            pares[par] += quantidade
+        
+        # Detalhamento por estado só do top-K
+        top_k = CONFIG["CONEXOES_TOP_K"]
+        detalhe_portas = {porta: {} for porta in heapq.nlargest(top_k, portas, key=portas.__getitem__)}
+        detalhe_pares = {par: {} for par in heapq.nlargest(top_k, pares, key=pares.__getitem__)}
+        for (estado, porta, par, filas), quantidade in contagem.items():
+            if filas is None:
+                for detalhe in (detalhe_portas.get(porta), detalhe_pares.get(par)):
+                    if detalhe is not None:
+                        detalhe[estado] = detalhe.get(estado, 0) + quantidade
+        if len(contagem) >= _LINHAS_POR_BLOCO:
+            self._custo_tupla = (time.perf_counter() - agregacao) / len(contagem)
+        
+        def nomear(contagens: Dict[str, int]) -> Dict[str, int]:
+            """Códigos de /proc → nomes do psutil (03 e 0C somam em SYN_RECV), do maior para o menor."""
+            nomes: Dict[str, int] = {}
+            for estado, quantidade in contagens.items():
+                estado = _ESTADOS_TCP.get(estado, estado) if fonte == "proc" else estado
+                nomes[estado] = nomes.get(estado, 0) + quantidade
+            return dict(sorted(nomes.items(), key=lambda item: -item[1]))
+        
+        def porta_int(porta) -> int:
+            return int(porta, 16) if fonte == "proc" else porta
+        
+        return {
+            "t": time.time(),
+            "fonte": fonte,
+            "parcial": parcial,
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "total": sum(estados.values()),
+            "estados": nomear(estados),
+            "portas": [{"porta": porta_int(porta), "total": portas[porta], "estados": nomear(detalhe)}
+                       for porta, detalhe in detalhe_portas.items()],
+            "pares": [{"ip": _ip_proc(par) if fonte == "proc" else par, "total": pares[par],
+                       "estados": nomear(detalhe)}
+                      for par, detalhe in detalhe_pares.items()],
+            "escuta": [{"porta": porta_int(porta), "fila_aceite": fila}
+                       for porta, fila in heapq.nlargest(top_k, escuta.items(), key=lambda item: item[1])
+                       if fila],
+        }
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 7. WORKER DE SPEEDTEST
+# ═══════════════════════════════════════════════════════════════════════════
+
+def worker_speedtest() -> None:
+    """
+    Worker que executa testes de velocidade periodicamente.
+    Roda em thread separada e publica ESTADO["velocidade"].
+    """
+    logger.info("🚀 Worker de Speedtest iniciado")
+    
+    def definir_status(status: str, **extras) -> None:
+        ESTADO.atualizar(lambda dados: {
+            "velocidade": {**dados["velocidade"], "status": status},
+            **extras,
+        })
+    
+    while True:
+        try:
+            definir_status("Testando...", testando=True)
+            
+            speedtest = DEPENDENCIAS["speedtest"].obter()
+            if speedtest:
+                logger.info("⏱️  Iniciando teste de velocidade...")
+                
+                # Tráfego de fundo antes do teste; durante o teste a utilização não é amostrada
+                carga = UTILIZACAO.carga_recente(CONFIG["SPEEDTEST_JANELA_CARGA"])
+                UTILIZACAO.em_teste = True
+                with PERF.medir("speedtest"):
+                    teste = speedtest.Speedtest()
+                    teste.get_best_server()
+                    
+                    # Obter informações do cliente
+                    info_cliente = teste.results.client
+                    isp = info_cliente.get("isp", "Desconhecido")
+                    
+                    # Executar testes
+                    with PERF.medir("speedtest_download"):
+                        velocidade_down = round(teste.download() / 1e6, 2)
+                    with PERF.medir("speedtest_upload"):
+                        velocidade_up = round(teste.upload() / 1e6, 2)
+                    ping_resultado = round(teste.results.ping, 1)
+                
+                capacidade = ESTADO["capacidade_link"]
+                confiavel = UTILIZACAO.teste_confiavel(
+                    carga, {"download": velocidade_down, "upload": velocidade_up}, capacidade)
+                agora = datetime.now().strftime("%H:%M:%S")
+                atualizacao = {"velocidade": {
+                    "download": velocidade_down,
+                    "upload": velocidade_up,
+                    "ping": ping_resultado,
+                    "isp": isp,
+                    "status": "Online" if confiavel is not False else "Sob carga",
+                    "ultima_atualizacao": agora,
+                    "confiavel": confiavel,
+                    "carga_previa_mbps": carga,
+                }}
+                # Teste sob carga subestima o link: só substitui a capacidade se não houver outra
+                if confiavel is not False or not capacidade["download_mbps"]:
+                    atualizacao["capacidade_link"] = {
+                        "download_mbps": velocidade_down,
+                        "upload_mbps": velocidade_up,
+                        "medida_em": agora,
+                    }
+                ESTADO.publicar(**atualizacao)
+                
+                logger.info(f"✅ Speedtest concluído: {velocidade_down} Mbps ⬇️  | "
+                           f"{velocidade_up} Mbps ⬆️  | {ping_resultado}ms | ISP: {isp}")
+                
+                ressalva = ""
+                if confiavel is False:
+                    ressalva = (f" (não confiável: {carga['download']}/{carga['upload']} Mbps "
+                                f"de tráfego antes do teste)")
+                registrar_evento(
+                    tipo="SPEEDTEST",
+                    severidade="INFO",
+                    mensagem=f"Teste concluído: {velocidade_down} Mbps{ressalva}",
+                    componente="WAN",
+                    valor=velocidade_down
+                )
+            else:
+                definir_status("Biblioteca não disponível")
+                logger.warning("⚠️  Speedtest-cli não disponível")
+        
+        except Exception as e:
+            logger.error(f"❌ Erro no Speedtest: {e}")
+            definir_status("Erro/Timeout")
+            registrar_evento(
+                tipo="SPEEDTEST_ERRO",
+                severidade="AVISO",
+                mensagem=f"Erro ao executar speedtest: {str(e)}",
+                componente="WAN"
+            )
+        
+        finally:
+            UTILIZACAO.em_teste = False
+            ESTADO.publicar(testando=False)
+            time.sleep(CONFIG["SPEEDTEST_INTERVALO"])
+
+async def enviar_whatsapp(mensagem: str) -> bool:
+    """
+    Envia alerta via WhatsApp usando CallMeBot.
+    
+    Args:
+        mensagem: Texto do alerta
+        
+    Returns:
+        True se enviado com sucesso, False caso contrário
+    """
+    if not CONFIG["WPP_HABILITADO"]:
+        logger.debug("WhatsApp desabilitado")
+        return False
+    
+    tempo_atual = time.time()
+    
+    reservado = False
+    
+    # Checar e reservar o cooldown na mesma operação atômica
+    def reservar(dados):
+        nonlocal reservado
+        if tempo_atual - dados["ultimo_alerta"] <= CONFIG["ALERT_COOLDOWN"]:
+            return None
+        reservado = True
+        return {"ultimo_alerta": tempo_atual}
+    
+    ESTADO.atualizar(reservar)
+    if not reservado:
+        tempo_desde_ultimo = tempo_atual - ESTADO["ultimo_alerta"]
+        logger.debug(f"Alerta em cooldown ({tempo_desde_ultimo:.0f}s)")
+        return False
+    
+    try:
+        texto_alerta = f"🚨 NOC ALERTA: {mensagem}"
+        url = (
+            "https://api.callmebot.com/whatsapp.php"
+            f"?phone={CONFIG['WPP_PHONE']}"
+            f"&text={urllib.parse.quote(texto_alerta)}"
+            f"&apikey={CONFIG['WPP_KEY']}"
+        )
+        
+        await asyncio.to_thread(requests.get, url, timeout=10)
+        logger.info(f"📱 WhatsApp enviado: {mensagem}")
+        return True
+    
+    except Exception as e:
+        logger.error(f"❌ Erro ao enviar WhatsApp: {e}")
+        return False
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 8. COLETA DE DADOS DE CONECTIVIDADE
+# ═══════════════════════════════════════════════════════════════════════════
+
+def obter_dados_wan_reais(alvos: Optional[List[Dict]] = None) -> List[Dict]:
+    """
+    Obtém dados reais de conectividade WAN.
+    
+    Args:
+        alvos: Subconjunto de ALVOS_WAN (None = todos)
+        
+    Returns:
         Lista de dicionários com status de cada link WAN
     """
-    alvos = [
-        {"nome": "Google DNS", "ip": "8.8.8.8", "provedor": "Google"},
-        {"nome": "Cloudflare DNS", "ip": "1.1.1.1", "provedor": "Cloudflare"},
-        {"nome": "Gateway Local", "ip": "192.168.1.1", "provedor": "Router Local"},
-    ]
+    wan_lista = []
+    
+    for alvo in ALVOS_WAN if alvos is None else alvos:
+        ms = ping_real(alvo["ip"])
+        status = "UP" if ms != 9999 else "DOWN"
+        perda = 0.0 if ms != 9999 else 100.0
+        
+        wan_lista.append({
+            "nome": alvo["nome"],
+            "provedor": alvo["provedor"],
+            "tipo": "ICMP",
+            "status": status,
+            "latencia_ms": ms if ms != 9999 else 0,
+            "perda_pacotes": perda,
+            "jitter": 0.0,
+            "banda_down": "--",
+            "banda_up": "--",
+        })
+    
+    return wan_lista
+
+# Condições de alerta ativas: chave -> (severidade, mensagem)
+_ALERTAS_ATIVOS: Dict[str, Tuple[str, str]] = {}
+
+# Métrica de cada condição com linha de base (pode ser habitual na hora)
+_SERIES_ALERTAS = {"cpu": "cpu", "ram": "ram", "temperatura": "temperatura_cpu"}
+
+def avaliar_alertas(cpu: float, ram: float, wan: List[Dict],
+                    processos: Optional[Dict] = None,
+                    temperatura: Optional[float] = None,
+                    t: Optional[float] = None) -> Tuple[bool, str, bool]:
+    """
+    Compara as métricas coletadas com LIMITES. Só o início de cada condição
+    (ou a mudança de severidade) e o fim (INFO) viram eventos e contam,
+    então é seguro chamar a cada tick, inclusive nos de rajada.
+    
+    Um limite de CPU/RAM/temperatura ultrapassado por um valor que a linha
+    de base considera habitual para a hora (BASES.habitual) vira AVISO,
+    sem notificação: só o que é crítico e fora do normal acorda alguém.
+    
+    Args:
+        cpu: Uso de CPU (%)
+        ram: Uso de RAM (%)
+        wan: Lista retornada por obter_dados_wan_reais()
+        processos: Resultado de RastreadorProcessos.coletar() (opcional),
+                   usado para apontar os responsáveis nos alertas de CPU/RAM
+        temperatura: Temperatura da CPU em °C (None = sem sensor)
+        t: Epoch do snapshot (hora do perfil habitual; None = agora)
+        
+    Returns:
+        Tupla (alerta_ativo, mensagem_alerta, novo): só condições CRÍTICAS
+        ativam o alerta; novo = alguma acabou de começar (é quando notificar)
+    """
+    processos = processos or {}
+    t = time.time() if t is None else t
+    links_down = sum(1 for w in wan if w["status"] == "DOWN")
+    valores = {"cpu": cpu, "ram": ram, "temperatura": temperatura}
+    
+    # Ordem = prioridade da mensagem exibida
+    condicoes = {
+        "wan": links_down >= 2 and f"WAN CRÍTICA: {links_down} links desconectados",
+        "cpu": cpu >= LIMITES["cpu"] and (
+            f"CPU CRÍTICA: {cpu}%" + descrever_processos(processos.get("top_cpu"), "cpu", "%")),
+        "ram": ram >= LIMITES["ram"] and (
+            f"RAM CRÍTICA: {ram}%" + descrever_processos(processos.get("top_memoria"), "memoria_mb", " MB")),
+        "temperatura": temperatura is not None and temperatura >= LIMITES["temperatura_cpu"] and (
+            f"TEMPERATURA CPU CRÍTICA: {temperatura}°C"),
+    }
+    
+    novo = False
+    mensagem_alerta = ""
+    for chave, mensagem in condicoes.items():
+        anterior = _ALERTAS_ATIVOS.get(chave)
+        if not mensagem:
+            if anterior:
+                del _ALERTAS_ATIVOS[chave]
+                registrar_evento(
+                    tipo="ALERTA_FIM",
+                    severidade="INFO",
+                    mensagem=f"Fim do alerta ({anterior[1]})",
+                    componente="Sistema",
+                )
+            continue
+        
+        severidade = "CRÍTICO"
+        serie = _SERIES_ALERTAS.get(chave)
+        if serie and BASES.habitual(serie, valores[chave], t):
+            severidade = "AVISO"
+            mensagem += " (habitual para o horário)"
+        _ALERTAS_ATIVOS[chave] = (severidade, mensagem)
+        
+        if anterior is None or anterior[0] != severidade:
+            registrar_evento(tipo="ALERTA", severidade=severidade, mensagem=mensagem, componente="Sistema")
+            incrementar_contador("critico" if severidade == "CRÍTICO" else "aviso")
+            novo = novo or severidade == "CRÍTICO"
+        if severidade == "CRÍTICO" and not mensagem_alerta:
+            mensagem_alerta = mensagem
+    
+    return bool(mensagem_alerta), mensagem_alerta, novo
+
+def avaliar_anomalias(novas: List[Dict]) -> Optional[str]:
+    """
+    Registra como AVISO as anomalias que acabaram de começar.
+    
+    Args:
+        novas: Primeiro item retornado por LinhasDeBase.atualizar()
+        
+    Returns:
+        Mensagem de alerta (a de maior escore) ou None
+    """
+    if not novas:
+        return None
+    
+    for anomalia in novas:
+        registrar_evento(
+            tipo="ANOMALIA",
+            severidade="AVISO",
+            mensagem=(f"{anomalia['serie']} = {anomalia['valor']} "
+                      f"(habitual {anomalia['esperado']} ± {anomalia['desvio']}, z={anomalia['z']})"),
+            componente="Linha de base",
+            valor=anomalia["valor"],
+        )
+    incrementar_contador("aviso", len(novas))
+    
+    principal = max(novas, key=lambda anomalia: anomalia["z"])
+    extras = f" (+{len(novas) - 1})" if len(novas) > 1 else ""
+    return (f"ANOMALIA: {principal['serie']} = {principal['valor']} "
+            f"(habitual {principal['esperado']}){extras}")
+
+_SATURACAO_ATIVA = {"download": False, "upload": False}
+
+def avaliar_saturacao(utilizacao: Optional[Dict]) -> Optional[str]:
+    """
+    Registra o início (AVISO) e o fim (INFO) de saturação sustentada do link.
+    
+    Args:
+        utilizacao: Resumo de UtilizacaoLink.resumo() presente no snapshot
+        
+    Returns:
+        Mensagem de alerta quando algum sentido acabou de saturar, ou None
+    """
+    if not utilizacao:
+        return None
+    
+    mensagens = []
+    for sentido, saturado in utilizacao["saturado"].items():
+        if saturado == _SATURACAO_ATIVA.get(sentido, False):
+            continue
+        _SATURACAO_ATIVA[sentido] = saturado
+        capacidade = utilizacao["capacidade"][f"{sentido}_mbps"]
+        if saturado:
+            mensagens.append(f"{sentido} acima de {CONFIG['SATURACAO_LIMIAR']}% de {capacidade} Mbps "
+                             f"por {CONFIG['SATURACAO_DURACAO']}s")
+            registrar_evento(
+                tipo="SATURACAO",
+                severidade="AVISO",
+                mensagem=f"Link saturado: {mensagens[-1]}",
+                componente="WAN",
+                valor=capacidade,
+            )
+            incrementar_contador("aviso")
+        else:
+            registrar_evento(
+                tipo="SATURACAO_FIM",
+                severidade="INFO",
+                mensagem=f"Fim da saturação do link ({sentido})",
+                componente="WAN",
+            )
+    return f"SATURAÇÃO: {'; '.join(mensagens)}" if mensagens else None
+
+# Contagem do resumo de conexões comparada a cada limite
+_REGRAS_CONEXOES = {
+    "conexoes": ("total", "conexões TCP"),
+    "conexoes_time_wait": ("TIME_WAIT", "TIME_WAIT"),
+    "conexoes_syn_recv": ("SYN_RECV", "SYN_RECV"),
+    "conexoes_close_wait": ("CLOSE_WAIT", "CLOSE_WAIT"),
+}
+_CONEXOES_ATIVAS: Dict[str, bool] = {}
+
+def descrever_conexoes(conexoes: Dict, estado: Optional[str], limite: int = 3) -> str:
+    """
+    Resume as portas locais e os pares remotos com mais conexões (no estado).
+    
+    Returns:
+        Ex: " | Portas: 443 (9120), 80 (310) | Pares: 10.0.0.7 (4500)" ou ""
+    """
+    partes = []
+    for titulo, tabela, chave in (("Portas", "portas", "porta"), ("Pares", "pares", "ip")):
+        linhas = [(linha[chave], linha["estados"].get(estado, 0) if estado else linha["total"])
+                  for linha in conexoes[tabela]]
+        linhas = sorted((linha for linha in linhas if linha[1]), key=lambda linha: -linha[1])[:limite]
+        if linhas:
+            partes.append(f" | {titulo}: " + ", ".join(f"{nome} ({quantidade})" for nome, quantidade in linhas))
+    return "".join(partes)
+
+def avaliar_conexoes(conexoes: Optional[Dict]) -> Optional[str]:
+    """
+    Registra o início (AVISO) e o fim (INFO) de cada limite de conexões
+    TCP ultrapassado (total, TIME_WAIT, SYN_RECV, CLOSE_WAIT).
+    
+    Args:
+        conexoes: Resumo de ColetorConexoes.amostrar() presente no snapshot
+        
+    Returns:
+        Mensagem de alerta quando algum limite acabou de ser ultrapassado, ou None
+    """
+    if not conexoes:
+        return None
+    
+    mensagens = []
+    for chave_limite, (estado, rotulo) in _REGRAS_CONEXOES.items():
+        quantidade = conexoes["total"] if estado == "total" else conexoes["estados"].get(estado, 0)
+        acima = quantidade >= LIMITES[chave_limite]
+        # Contagem parcial é limite inferior: confirma um início, mas não um fim
+        if acima == _CONEXOES_ATIVAS.get(chave_limite, False) or (not acima and conexoes.get("parcial")):
+            continue
+        _CONEXOES_ATIVAS[chave_limite] = acima
+        if acima:
+            mensagens.append(f"{quantidade} {rotulo} (limite {LIMITES[chave_limite]})"
+                             + descrever_conexoes(conexoes, None if estado == "total" else estado))
+            registrar_evento(
+                tipo="CONEXOES",
+                severidade="AVISO",
+                mensagem=f"Conexões: {mensagens[-1]}",
+                componente="TCP",
+                valor=quantidade,
+            )
+            incrementar_contador("aviso")
+        else:
+            registrar_evento(
+                tipo="CONEXOES_FIM",
+                severidade="INFO",
+                mensagem=f"{rotulo} abaixo do limite ({quantidade})",
+                componente="TCP",
+                valor=quantidade,
+            )
+    return f"CONEXÕES: {'; '.join(mensagens)}" if mensagens else None
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 8.1 PIPELINE DE SNAPSHOTS (COLETA → ALERTAS → TRANSMISSÃO)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ColetorMetricas:
+    """
+    Coleta um snapshot bruto das métricas locais e WAN.
+    
+    `coletar()` é síncrono e bloqueante (psutil, ping), por isso o loop de
+    coleta o executa em uma thread, fora do event loop.
+    """
+    
+    def __init__(self):
+        self._io = ColetorIO()
+        self._io.coletar()  # Linha de base para as primeiras taxas
+        self._processos = RastreadorProcessos(
+            top_n=CONFIG["PROCESSOS_TOP_N"],
+            max_por_ciclo=CONFIG["PROCESSOS_MAX_POR_CICLO"],
+        )
+        self._hardware = GerenciadorColetores(CONFIG["COLETORES"])
+        self._hardware.iniciar()
+        self._conexoes = ColetorConexoes()
+        self._conexoes.iniciar()
+        self._ultimo: Optional[Dict] = None
+        psutil.cpu_percent(interval=None)  # Referência: as leituras seguintes cobrem o intervalo desde a anterior
+    
+    def fechar(self) -> None:
+        """Libera os recursos dos coletores de hardware e para a amostragem de conexões."""
+        self._hardware.fechar()
+        self._conexoes.fechar()
+    
+    def coletar(self) -> Dict:
+        """
+        Returns:
+            Snapshot bruto (valores numéricos, sem formatação)
+        """
+        with PERF.medir("cpu"):
+            cpu = psutil.cpu_percent(interval=None)
+        with PERF.medir("ram"):
+            ram = psutil.virtual_memory()
+        caminho_disco = "C:" if os.name == "nt" else "/"
+        with PERF.medir("disco"):
+            disco = psutil.disk_usage(caminho_disco)
+        
+        with PERF.medir("io"):
+            io = self._io.coletar()
+        with PERF.medir("hardware"):
+            hardware = self._hardware.amostrar()
+        gpus = hardware["gpu"]
+        temperaturas = hardware["temperatura"]
+        
+        # Coletar dados WAN
+        with PERF.medir("wan"):
+            wan = obter_dados_wan_reais()
+        
+        with PERF.medir("processos"):
+            processos = self._processos.coletar()
+        
+        with PERF.medir("info_host"):
+            info_host = obter_info_host()
+        
+        estado = ESTADO.ler()
+        t = time.time()
+        if not UTILIZACAO.amostrando and not UTILIZACAO.em_teste:
+            UTILIZACAO.registrar(t, *UTILIZACAO.somar(io["interfaces"]))  # Sem a thread: resolução do tick
+        with PERF.medir("utilizacao"):
+            utilizacao = UTILIZACAO.resumo(estado.dados["capacidade_link"], t)
+        
+        self._ultimo = {
+            "t": t,
+            "info": info_host,
+            "cpu": round(cpu, 1),
+            "ram": round(ram.percent, 1),
+            "disco": round(disco.percent, 1),
+            "rx": io["rx"],
+            "tx": io["tx"],
+            "interfaces": io["interfaces"],
+            "discos": io["discos"],
+            "particoes": io["particoes"],
+            "gpu": gpus[0] if gpus else GPU_INDISPONIVEL,
+            "gpus": gpus,
+            "temperaturas": temperaturas,
+            "temperatura_cpu": temperatura_cpu(temperaturas),
+            "wan": wan,
+            "processos": processos,
+            "velocidade": estado.dados["velocidade"],
+            "testando": estado.dados["testando"],
+            "utilizacao": utilizacao,
+            "conexoes": self._conexoes.ultimo,
+        }
+        return self._ultimo
+    
+    def coletar_rajada(self, metricas: Sequence[str], alvos: Sequence[str]) -> Dict:
+        """
+        Modo rajada: reamostra só as métricas e os alvos WAN perto do limite
+        e reaproveita o restante do último snapshot completo.
+        
+        Args:
+            metricas: Subconjunto de "cpu", "ram", "disco", "temperatura_cpu"
+            alvos: Nomes dos alvos WAN a pingar novamente
+        """
+        if self._ultimo is None:
+            return self.coletar()
+        
+        snapshot = dict(self._ultimo)
+        snapshot["t"] = time.time()
+        if "cpu" in metricas:
+            snapshot["cpu"] = round(psutil.cpu_percent(interval=None), 1)
+        if "ram" in metricas:
+            snapshot["ram"] = round(psutil.virtual_memory().percent, 1)
+        if "disco" in metricas:
+            snapshot["disco"] = round(psutil.disk_usage("C:" if os.name == "nt" else "/").percent, 1)
+        if "temperatura_cpu" in metricas:
+            temperaturas = self._hardware.amostrar(forcar=("temperatura",))["temperatura"]
+            snapshot["temperaturas"] = temperaturas
+            snapshot["temperatura_cpu"] = temperatura_cpu(temperaturas)
+        if alvos:
+            with PERF.medir("wan"):
+                novos = {w["nome"]: w for w in obter_dados_wan_reais(
+                    [alvo for alvo in ALVOS_WAN if alvo["nome"] in alvos])}
+            snapshot["wan"] = [novos.get(w["nome"], w) for w in snapshot["wan"]]
+        
+        estado = ESTADO.ler()
+        snapshot["velocidade"] = estado.dados["velocidade"]
+        snapshot["testando"] = estado.dados["testando"]
+        if UTILIZACAO.amostrando:
+            snapshot["utilizacao"] = UTILIZACAO.resumo(estado.dados["capacidade_link"], snapshot["t"])
+        snapshot["conexoes"] = self._conexoes.ultimo
+        return snapshot
+
+def metricas_perto_do_limite(snapshot: Dict) -> Tuple[List[str], List[str]]:
+    """
+    Returns:
+        Tupla (métricas locais, nomes de alvos WAN) acima de RAJADA_FRACAO
+        do respectivo limite em LIMITES
+    """
+    fracao = CONFIG["RAJADA_FRACAO"]
+    metricas = [
+        chave for chave in ("cpu", "ram", "disco", "temperatura_cpu")
+        if snapshot.get(chave) is not None and snapshot[chave] >= LIMITES[chave] * fracao
+    ]
+    # Alvos DOWN ficam de fora: cada ping esperaria o timeout inteiro
+    alvos = [
+        w["nome"] for w in snapshot["wan"]
+        if w["status"] == "UP" and (w["latencia_ms"] >= LIMITES["ping"] * fracao
+                                    or w["perda_pacotes"] >= LIMITES["perda_pacotes"] * fracao)
+    ]
+    return metricas, alvos
+
+class AmostragemAdaptativa:
+    """
+    Escolhe a cadência do próximo tick a partir do snapshot anterior:
+    
+    - ocioso: ninguém consome os dados (sem clientes, sem gravação) e nada
+      está perto dos limites → COLETA_INTERVALO_OCIOSO
+    - normal: COLETA_INTERVALO
+    - rajada: alguma métrica ou alvo WAN perto do limite → só eles são
+      reamostrados a cada COLETA_INTERVALO_RAJADA (a coleta completa segue
+      na cadência normal), por pelo menos RAJADA_PERMANENCIA segundos
+    """
+    
+    def __init__(self):
+        self.modo = "normal"
+        self.metricas: List[str] = []
+        self.alvos: List[str] = []
+        self._fim_rajada = 0.0
+    
+    @property
+    def intervalo(self) -> float:
+        if self.modo == "rajada":
+            return min(CONFIG["COLETA_INTERVALO_RAJADA"], CONFIG["COLETA_INTERVALO"])
+        if self.modo == "ocioso":
+            return max(CONFIG["COLETA_INTERVALO_OCIOSO"], CONFIG["COLETA_INTERVALO"])
+        return CONFIG["COLETA_INTERVALO"]
+    
+    def avaliar(self, snapshot: Dict, ha_interessados: bool) -> None:
+        agora = time.monotonic()
+        metricas, alvos = metricas_perto_do_limite(snapshot)
+        if metricas or alvos:
+            self._fim_rajada = agora + CONFIG["RAJADA_PERMANENCIA"]
+            # Acumula durante a permanência para não alternar a cada oscilação
+            if self.modo == "rajada":
+                metricas = sorted(set(metricas) | set(self.metricas))
+                alvos = sorted(set(alvos) | set(self.alvos))
+            self.metricas, self.alvos = metricas, alvos
+        
+        modo_anterior = self.modo
+        if agora < self._fim_rajada:
+            self.modo = "rajada"
+        else:
+            self.metricas, self.alvos = [], []
+            self.modo = "normal" if ha_interessados else "ocioso"
+        
+        if self.modo != modo_anterior:
+            logger.info(f"⏱️  Amostragem: {modo_anterior} → {self.modo} ({self.intervalo:g}s)"
+                        + (f" [{', '.join(self.metricas + self.alvos)}]" if self.modo == "rajada" else ""))
+    
+    def despertar(self) -> None:
+        """Um consumidor apareceu durante o modo ocioso."""
+        if self.modo == "ocioso":
+            self.modo = "normal"
+            logger.info(f"⏱️  Amostragem: ocioso → normal ({self.intervalo:g}s)")
+    
+    def descrever(self) -> Dict:
+        intervalo = self.intervalo
+        return {
+            "modo": self.modo,
+            "intervalo_s": intervalo,
+            "taxa_hz": round(1 / intervalo, 2) if intervalo > 0 else None,
+            "metricas": self.metricas,
+            "alvos": self.alvos,
+        }
+
+def ha_interessados() -> bool:
+    """Há clientes (locais ou em workers) ou gravação consumindo os snapshots?"""
+    if HUB.quantidade or GRAVADOR is not None:
+        return True
+    return MEMORIA is not None and MEMORIA.interesse_recente()
+
+# Anomalias ativas do último tick completo (reaproveitadas nos de rajada)
+_ANOMALIAS_ATIVAS: List[Dict] = []
+
+async def processar_snapshot(snapshot: Dict, completa: bool = True) -> Dict:
+    """
+    Aplica alertas, notificações e acumulados sobre um snapshot e monta o
+    payload do dashboard. Usado tanto na coleta real quanto na reprodução.
+    
+    Args:
+        snapshot: Snapshot bruto (ColetorMetricas.coletar ou gravação)
+        completa: False nos ticks de rajada: SLA e linhas de base só
+                  avançam nos ticks completos (cadência de COLETA_INTERVALO)
+        
+    Returns:
+        Payload enviado aos clientes WebSocket
+    """
+    cpu = snapshot["cpu"]
+    ram = snapshot["ram"]
+    wan = snapshot["wan"]
+    
+    # Calcular uptime
+    segundos_uptime = int(time.time() - ESTADO["uptime_inicio"])
+    uptime_formatado = formatar_tempo_decorrido(segundos_uptime)
+    
+    global _ANOMALIAS_ATIVAS
+    anomalias_novas = []
+    if completa:
+        with PERF.medir("sla"):
+            # Na reprodução vale o relógio gravado (sondas fora de ordem são descartadas)
+            SLA.registrar_wan(wan, snapshot["t"] if CONFIG["REPRODUCAO_ARQUIVO"] else SLA.agora())
+        
+        # Linhas de base (anomalias em relação ao comportamento habitual)
+        with PERF.medir("anomalias"):
+            anomalias_novas, _ANOMALIAS_ATIVAS = BASES.atualizar(*series_do_snapshot(snapshot), snapshot["t"])
+    
+    # Lógica de alertas (só transições geram eventos e notificações)
+    with PERF.medir("alertas"):
+        alerta_ativo, mensagem_alerta, alerta_novo = avaliar_alertas(
+            cpu, ram, wan, snapshot.get("processos"), snapshot.get("temperatura_cpu"), snapshot["t"]
+        )
+        mensagem_anomalia = avaliar_anomalias(anomalias_novas)
+        mensagem_saturacao = avaliar_saturacao(snapshot.get("utilizacao"))
+        mensagem_conexoes = avaliar_conexoes(snapshot.get("conexoes"))
+    
+    # Enviar alerta se necessário (limites estáticos têm prioridade)
+    wpp_enviado = False
+    if alerta_ativo:
+        if alerta_novo:
+            wpp_enviado = await enviar_whatsapp(mensagem_alerta)
+    elif mensagem_anomalia or mensagem_saturacao or mensagem_conexoes:
+        alerta_ativo, mensagem_alerta = True, mensagem_anomalia or mensagem_saturacao or mensagem_conexoes
+        wpp_enviado = await enviar_whatsapp(mensagem_alerta)
+    
+    # Atualizar máximos (só publica nova versão quando um pico é superado)
+    def atualizar_maximos(dados):
+        acumuladas = dados["metricas_acumuladas"]
+        if cpu <= acumuladas["cpu_max"] and ram <= acumuladas["ram_max"]:
+            return None
+        return {"metricas_acumuladas": {
+            **acumuladas,
+            "cpu_max": max(acumuladas["cpu_max"], cpu),
+            "ram_max": max(acumuladas["ram_max"], ram),
+        }}
+    ESTADO.atualizar(atualizar_maximos)
+    estado = ESTADO.ler()
+    
+    return {
+        "t": snapshot["t"],
+        "timestamp": datetime.fromtimestamp(snapshot["t"]).strftime("%H:%M:%S"),
+        "modo": "reproducao" if CONFIG["REPRODUCAO_ARQUIVO"] else "ao_vivo",
+        "local": {
+            "info": snapshot["info"],
+            "metricas": {
+                "cpu": cpu,
+                "ram": ram,
+                "disco": snapshot["disco"],
+                "rx": formatar_bytes(snapshot["rx"]),
+                "tx": formatar_bytes(snapshot["tx"]),
+                "rx_bs": round(snapshot["rx"], 1),
+                "tx_bs": round(snapshot["tx"], 1),
+                "temperatura_cpu": snapshot.get("temperatura_cpu"),
+            },
+            "interfaces": snapshot.get("interfaces"),
+            "discos": snapshot.get("discos"),
+            "particoes": snapshot.get("particoes"),
+            "gpu": snapshot["gpu"],
+            "gpus": snapshot.get("gpus", [snapshot["gpu"]]),
+            "temperaturas": snapshot.get("temperaturas", []),
+            "processos": snapshot.get("processos"),
+        },
+        "velocidade": snapshot["velocidade"],
+        "testando": snapshot["testando"],
+        "utilizacao": snapshot.get("utilizacao"),
+        "conexoes": snapshot.get("conexoes"),
+        "wan": wan,
+        "uptime": uptime_formatado,
+        "alerta": {
+            "ativo": alerta_ativo,
+            "mensagem": mensagem_alerta,
+            "whatsapp_enviado": wpp_enviado
+        },
+        "contadores": estado.dados["contadores_alertas"],
+        "amostragem": snapshot.get("amostragem"),
+        "anomalias": sorted(_ANOMALIAS_ATIVAS, key=lambda a: -a["z"])[:20],
+        "capacidades": obter_capacidades(),
+        "versao": estado.versao,
+    }
+
+_IGUAL = object()  # Sentinela de diferenca_payload: nada mudou
+
+def _nomes_unicos(valor: Any) -> Optional[List[str]]:
+    """Nomes dos itens de uma lista de dicts com "nome" únicos (ex: wan), senão None."""
+    if not isinstance(valor, list) or not valor:
+        return None
+    nomes = []
+    for item in valor:
+        if not isinstance(item, dict) or "nome" not in item:
+            return None
+        nomes.append(item["nome"])
+    return nomes if len(set(nomes)) == len(nomes) else None
+
+def diferenca_payload(anterior: Any, atual: Any) -> Any:
+    """
+    Diferença entre dois payloads no formato JSON Merge Patch (RFC 7386):
+    só as chaves alteradas, null = chave removida, demais listas inteiras.
+    
+    Listas de dicts com "nome" único (alvos WAN) viram
+    {"$por_nome": {nome: diferença}, "$ordem": [nomes]} ("$ordem" só quando
+    a ordem ou o conjunto muda): um alvo alterado não reenvia a lista toda.
+    
+    Returns:
+        A diferença, ou _IGUAL se nada mudou
+    """
+    if anterior is atual:
+        return _IGUAL
+    
+    if isinstance(atual, dict) and isinstance(anterior, dict):
+        diferenca = {}
+        for chave, valor in atual.items():
+            if chave not in anterior:
+                diferenca[chave] = valor
+                continue
+            mudanca = diferenca_payload(anterior[chave], valor)
+            if mudanca is not _IGUAL:
+                diferenca[chave] = mudanca
+        for chave in anterior.keys() - atual.keys():
+            diferenca[chave] = None
+        return diferenca or _IGUAL
+    
+    nomes_atuais = _nomes_unicos(atual)
+    nomes_anteriores = _nomes_unicos(anterior) if nomes_atuais else None
+    if nomes_atuais and nomes_anteriores:
+        anteriores = dict(zip(nomes_anteriores, anterior))
+        por_nome = {}
+        for nome, item in zip(nomes_atuais, atual):
+            mudanca = diferenca_payload(anteriores[nome], item) if nome in anteriores else item
+            if mudanca is not _IGUAL:
+                por_nome[nome] = mudanca
+        diferenca = {"$por_nome": por_nome} if por_nome else {}
+        if nomes_atuais != nomes_anteriores:
+            diferenca["$ordem"] = nomes_atuais
+        return diferenca or _IGUAL
+    
+    return _IGUAL if anterior == atual else atual
+
+def filtrar_alvos(payload: Dict, alvos: frozenset) -> Dict:
+    """Restringe a lista/diferença "wan" de um payload ou delta aos alvos assinados."""
+    wan = payload.get("wan")
+    if isinstance(wan, list):
+        return {**payload, "wan": [w for w in wan if w["nome"] in alvos]}
+    if isinstance(wan, dict):
+        filtrado = {"$por_nome": {nome: mudanca for nome, mudanca in wan.get("$por_nome", {}).items()
+                                  if nome in alvos}}
+        if "$ordem" in wan:
+            filtrado["$ordem"] = [nome for nome in wan["$ordem"] if nome in alvos]
+        return {**payload, "wan": filtrado}
+    return payload
+
+class QuadroTransmissao(NamedTuple):
+    """Quadro publicado no hub, compartilhado por todos os clientes."""
+    seq: int
+    texto: str                    # Payload completo (JSON)
+    payload: Optional[Dict]
+    delta: Optional[Dict]         # Diferença para o quadro seq - 1 (None = não calculada)
+    texto_delta: Optional[str]    # {"delta": ...} já serializado
+
+@dataclass
+class AssinaturaCliente:
+    """
+    Preferências de um cliente WebSocket, enviadas por ele como
+    {"assinar": {"delta": true, "alvos": ["Google DNS", ...], "historico": true}}.
+    """
+    delta: bool = False
+    alvos: Optional[frozenset] = None   # None = todos os alvos WAN
+    ultimo_seq: int = 0                 # Último quadro enviado (base do próximo delta)
+    historico_pendente: bool = False    # Enviar o histórico compacto antes do próximo quadro
+    
+    def atualizar(self, mensagem: str) -> bool:
+        """
+        Returns:
+            True se a mensagem era uma assinatura válida
+        """
+        try:
+            pedido = json.loads(mensagem)["assinar"]
+            delta = bool(pedido.get("delta", False))
+            historico = bool(pedido.get("historico", False))
+            alvos = pedido.get("alvos")
+            alvos = frozenset(str(alvo) for alvo in alvos) if alvos else None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return False
+        self.delta, self.alvos = delta, alvos
+        self.historico_pendente = self.historico_pendente or historico
+        self.ultimo_seq = 0  # O próximo quadro é completo
+        return True
+    
+    def codificar(self, quadro: QuadroTransmissao) -> str:
+        """
+        Texto a enviar: o delta quando o cliente recebeu o quadro anterior,
+        senão o payload completo (primeiro quadro ou quadros descartados).
+        """
+        encadeado = self.delta and quadro.delta is not None and self.ultimo_seq == quadro.seq - 1
+        self.ultimo_seq = quadro.seq
+        if encadeado:
+            if self.alvos is None:
+                return quadro.texto_delta
+            return json.dumps({"delta": filtrar_alvos(quadro.delta, self.alvos)},
+                              ensure_ascii=False, separators=(",", ":"))
+        if self.alvos is None or quadro.payload is None:
+            return quadro.texto
+        return json.dumps(filtrar_alvos(quadro.payload, self.alvos), ensure_ascii=False, separators=(",", ":"))
+
+class HubTransmissao:
+    """
+    Distribui cada quadro JSON a todos os clientes WebSocket conectados.
+    
+    Cada cliente tem uma fila de um único quadro: um cliente lento perde
+    quadros intermediários e recebe sempre o mais recente, sem acumular
+    memória nem atrasar os demais. Com algum cliente assinando deltas, a
+    diferença para o quadro anterior é calculada e serializada uma única
+    vez por publicação e compartilhada por todos eles.
+    """
+    
+    def __init__(self):
+        self._filas: Dict[int, asyncio.Queue] = {}
+        self._assinantes_delta: set = set()
+        self._seq = 0
+        self._payload_anterior: Optional[Dict] = None
+        self.ultimo_quadro: Optional[QuadroTransmissao] = None
+    
+    @property
+    def quantidade(self) -> int:
+        return len(self._filas)
+    
+    def conectar(self, cliente_id: int) -> asyncio.Queue:
+        """Registra um cliente; o último quadro já publicado é entregue de imediato."""
+        fila = asyncio.Queue(maxsize=1)
+        if self.ultimo_quadro is not None:
+            fila.put_nowait(self.ultimo_quadro)
+        self._filas[cliente_id] = fila
+        return fila
+    
+    def desconectar(self, cliente_id: int) -> None:
+        self._filas.pop(cliente_id, None)
+        self._assinantes_delta.discard(cliente_id)
+    
+    def interromper(self, cliente_id: int) -> None:
+        """Acorda o envio de um cliente que desconectou (a fila recebe None)."""
+        fila = self._filas.get(cliente_id)
+        if fila is not None:
+            if fila.full():
+                fila.get_nowait()
+            fila.put_nowait(None)
+    
+    def reenviar(self, cliente_id: int) -> None:
+        """Reentrega o último quadro a um cliente que acabou de mudar a assinatura."""
+        fila = self._filas.get(cliente_id)
+        if fila is not None and fila.empty() and self.ultimo_quadro is not None:
+            fila.put_nowait(self.ultimo_quadro)
+    
+    def assinar_delta(self, cliente_id: int, ativo: bool) -> None:
+        if ativo:
+            self._assinantes_delta.add(cliente_id)
+        else:
+            self._assinantes_delta.discard(cliente_id)
+    
+    def publicar(self, texto: str, payload: Optional[Dict] = None) -> None:
+        """Entrega `texto` (e o delta, se houver assinantes) a todas as filas, descartando quadros não lidos."""
+        self._seq += 1
+        delta = texto_delta = None
+        if self._assinantes_delta and payload is not None and self._payload_anterior is not None:
+            with PERF.medir("delta"):
+                delta = diferenca_payload(self._payload_anterior, payload)
+                if delta is _IGUAL:
+                    delta = {}
+                texto_delta = json.dumps({"delta": delta}, ensure_ascii=False, separators=(",", ":"))
+        self._payload_anterior = payload
+        
+        quadro = QuadroTransmissao(self._seq, texto, payload, delta, texto_delta)
+        self.ultimo_quadro = quadro
+        for fila in self._filas.values():
+            if fila.full():
+                fila.get_nowait()
+            fila.put_nowait(quadro)
+
+HUB = HubTransmissao()
+
+async def publicar_snapshot(snapshot: Dict, completa: bool = True) -> None:
+    """
+    Leva um snapshot bruto por todo o pipeline: gravação (se ativa),
+    alertas/notificações, serialização e envio aos clientes.
+    
+    Ticks de rajada (completa=False) só atualizam os campos reamostrados
+    e transmitem: gravação, histórico, SLA e linhas de base seguem a
+    cadência dos ticks completos.
+    """
+    inicio = time.perf_counter()
+    
+    if GRAVADOR is not None and completa:
+        with PERF.medir("gravacao"):
+            GRAVADOR.gravar(snapshot)
+    
+    payload = await processar_snapshot(snapshot, completa)
+    if completa:
+        ARQUIVOS.adicionar("historico", HISTORICO.adicionar(payload))
+    
+    with PERF.medir("json"):
+        texto = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    with PERF.medir("broadcast"):
+        HUB.publicar(texto, payload)
+    
+    if MEMORIA is not None:
+        with PERF.medir("memoria_compartilhada"):
+            publicar_memoria_compartilhada(texto)
+    
+    PERF.registrar("tick", (time.perf_counter() - inicio) * 1000)
+
+async def loop_coleta() -> None:
+    """Loop único de coleta: um snapshot por intervalo, para todos os clientes."""
+    coletor = await asyncio.to_thread(ColetorMetricas)  # Inicia backends de hardware fora do loop
+    amostragem = AmostragemAdaptativa()
+    loop = asyncio.get_running_loop()
+    ultima_completa = float("-inf")
+    logger.info("✅ Loop de coleta iniciado")
+    
+    try:
+        while True:
+            inicio = loop.time()
+            try:
+                completa = (amostragem.modo != "rajada"
+                            or inicio - ultima_completa >= CONFIG["COLETA_INTERVALO"])
+                with PERF.medir("coleta"):
+                    if completa:
+                        snapshot = await asyncio.to_thread(coletor.coletar)
+                        ultima_completa = inicio
+                    else:
+                        snapshot = await asyncio.to_thread(
+                            coletor.coletar_rajada, amostragem.metricas, amostragem.alvos
+                        )
+                snapshot["amostragem"] = amostragem.descrever()
+                await publicar_snapshot(snapshot, completa)
+                amostragem.avaliar(snapshot, ha_interessados())
+            except Exception as e:
+                logger.error(f"❌ Erro na coleta: {e}")
+            
+            # No modo ocioso, acorda assim que surgir um consumidor
+            restante = amostragem.intervalo - (loop.time() - inicio)
+            while restante > 0:
+                if amostragem.modo != "ocioso":
+                    await asyncio.sleep(restante)
+                    break
+                await asyncio.sleep(min(restante, 0.5))
+                if ha_interessados():
+                    amostragem.despertar()
+                    break
+                restante = amostragem.intervalo - (loop.time() - inicio)
+    finally:
+        coletor.fechar()
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 8.2 GRAVAÇÃO E REPRODUÇÃO DE SNAPSHOTS
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Formato .nocrec: cabeçalho fixo seguido de quadros
+#   <uint32 tamanho><float64 timestamp><snapshot JSON comprimido com zlib>
+# Um quadro de tamanho 0 marca o início de uma sessão de gravação (o
+# arquivo é anexado a cada execução). Um quadro truncado no fim (queda do
+# processo) é ignorado na leitura.
+CABECALHO_GRAVACAO = b"NOCREC1\n"
+_QUADRO_GRAVACAO = struct.Struct("<Id")
+_LOTE_REPRODUCAO = 32  # Quadros lidos e descomprimidos por ida à thread
+
+class GravadorSnapshots:
+    """
+    Grava snapshots brutos em um arquivo .nocrec (somente anexação).
+    
+    O tick só serializa o snapshot e o enfileira; compressão, escrita e
+    flush ficam numa thread própria (flush quando a fila esvazia).
+    """
+    
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.quadros = 0
+        novo = not os.path.exists(caminho) or os.path.getsize(caminho) == 0
+        self._arquivo = open(caminho, "ab")
+        if novo:
+            self._arquivo.write(CABECALHO_GRAVACAO)
+        self._arquivo.write(_QUADRO_GRAVACAO.pack(0, time.time()))  # Marcador de sessão
+        self._fila: "queue.Queue[Optional[Tuple[float, bytes]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._escrever_continuamente, daemon=True)
+        self._thread.start()
+    
+    def gravar(self, snapshot: Dict) -> None:
+        texto = json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))
+        self._fila.put((snapshot["t"], texto.encode("utf-8")))
+        self.quadros += 1
+    
+    def _escrever_continuamente(self) -> None:
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            timestamp, dados = item
+            dados = zlib.compress(dados)
+            try:
+                self._arquivo.write(_QUADRO_GRAVACAO.pack(len(dados), timestamp) + dados)
+                if self._fila.empty():
+                    self._arquivo.flush()
+            except OSError as e:
+                logger.error(f"❌ Erro ao gravar snapshot: {e}")
+        self._arquivo.close()
+    
+    def fechar(self) -> None:
+        """Grava o que estiver na fila e fecha o arquivo (bloqueante)."""
+        self._fila.put(None)
+        self._thread.join()
+
+GRAVADOR: Optional[GravadorSnapshots] = None
+
+def ler_gravacao(caminho: str) -> Iterator[Tuple[float, Optional[Dict]]]:
+    """
+    Lê um arquivo .nocrec quadro a quadro.
+    
+    Args:
+        caminho: Arquivo gravado por GravadorSnapshots
+        
+    Yields:
+        Tuplas (timestamp, snapshot); snapshot None = início de uma sessão
+    """
+    with open(caminho, "rb") as arquivo:
+        if arquivo.read(len(CABECALHO_GRAVACAO)) != CABECALHO_GRAVACAO:
+            raise ValueError(f"{caminho} não é uma gravação do NOC Commander")
+        
+        while True:
+            cabecalho = arquivo.read(_QUADRO_GRAVACAO.size)
+            if len(cabecalho) < _QUADRO_GRAVACAO.size:
+                return
+            tamanho, timestamp = _QUADRO_GRAVACAO.unpack(cabecalho)
+            if tamanho == 0:
+                yield timestamp, None
+                continue
+            dados = arquivo.read(tamanho)
+            if len(dados) < tamanho:
+                logger.warning(f"⚠️  Quadro truncado ignorado no fim de {caminho}")
+                return
+            yield timestamp, json.loads(zlib.decompress(dados))
+
+async def loop_reproducao() -> None:
+    """
+    Reproduz uma gravação pelo pipeline normal (alertas, notificações e
+    WebSocket), respeitando os intervalos originais divididos pela velocidade.
+    
+    Leitura e descompressão rodam em lotes numa thread. A espera entre
+    quadros é limitada a REPRODUCAO_PAUSA_MAXIMA e zerada no início de cada
+    sessão, para não atravessar o intervalo em que nada era gravado.
+    """
+    caminho = CONFIG["REPRODUCAO_ARQUIVO"]
+    velocidade = CONFIG["REPRODUCAO_VELOCIDADE"]
+    logger.info(f"⏯️  Reproduzindo {caminho} ({velocidade or 'máxima'}x)")
+    
+    while True:
+        quadros = 0
+        anterior = None
+        leitor = ler_gravacao(caminho)
+        while True:
+            lote = await asyncio.to_thread(lambda: list(itertools.islice(leitor, _LOTE_REPRODUCAO)))
+            if not lote:
+                break
+            for timestamp, snapshot in lote:
+                if snapshot is None:
+                    anterior = None  # Nova sessão
+                    continue
+                if anterior is not None and velocidade > 0:
+                    espera = max(0.0, timestamp - anterior) / velocidade
+                    await asyncio.sleep(min(espera, CONFIG["REPRODUCAO_PAUSA_MAXIMA"]))
+                elif velocidade <= 0:
+                    await asyncio.sleep(0)
+                anterior = timestamp
+                await publicar_snapshot(snapshot)
+                quadros += 1
+        
+        logger.info(f"⏹️  Reprodução concluída: {quadros} snapshots")
+        if not CONFIG["REPRODUCAO_REPETIR"] or quadros == 0:
+            return
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 8.3 SNAPSHOTS EM MEMÓRIA COMPARTILHADA (MÚLTIPLOS WORKERS)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class MemoriaSnapshots:
+    """
+    Segmento `multiprocessing.shared_memory` protegido por seqlock.
+    
+    Um único escritor (processo coletor) publica o último quadro JSON e,
+    quando muda, o estado global exportado. Vários leitores (workers) leem
+    sem lock: a sequência é ímpar durante a escrita e, se mudar durante a
+    leitura, o leitor tenta de novo.
+    
+    Os workers com clientes marcam um horário de "interesse" fora do
+    seqlock; o coletor o consulta para decidir se pode ficar ocioso. Também
+    fora do seqlock fica o controle da instrumentação (PERF ligado e um
+    contador de reinícios): o POST /api/debug/perf de qualquer processo
+    vale para todos.
+    
+    Os leitores decodificam o quadro direto do segmento (memoryview), sem
+    uma cópia intermediária em bytes.
+    
+    Layout: [seq u64][versão do estado u64][tam. quadro u32][tam. estado u32]
+            [interesse f64][perf ligado u32][perf reinícios u32]
+            [área do quadro][área do estado]
+    """
+    
+    _CABECALHO = struct.Struct("<QQII")
+    _SEQ = struct.Struct("<Q")
+    _TAMANHOS = struct.Struct("<QII")  # Resto do cabeçalho (após seq)
+    _INTERESSE = struct.Struct("<d")
+    _CONTROLE = struct.Struct("<II")
+    
+    def __init__(self, memoria: shared_memory.SharedMemory, dono: bool):
+        self._memoria = memoria
+        self._dono = dono
+        self._buffer = memoria.buf
+        self._inicio_controle = self._CABECALHO.size + self._INTERESSE.size
+        inicio = self._inicio_controle + self._CONTROLE.size
+        area = (memoria.size - inicio) // 2
+        self._inicio_quadro = inicio
+        self._inicio_estado = inicio + area
+        self._capacidade = area
+        self._seq = 0
+        self._reinicios_perf = 0
+        self.versao_publicada = -1
+    
+    @property
+    def nome(self) -> str:
+        return self._memoria.name
+    
+    @classmethod
+    def criar(cls, tamanho: int) -> "MemoriaSnapshots":
+        memoria = shared_memory.SharedMemory(create=True, size=tamanho)
+        tamanho_inicial = cls._CABECALHO.size + cls._INTERESSE.size + cls._CONTROLE.size
+        memoria.buf[:tamanho_inicial] = bytes(tamanho_inicial)
+        segmento = cls(memoria, dono=True)
+        segmento.controlar_perf(habilitado=PERF.habilitado)
+        return segmento
+    
+    @classmethod
+    def anexar(cls, nome: str) -> "MemoriaSnapshots":
+        """
+        Abre um segmento existente sem assumir a responsabilidade de removê-lo.
+        Antes do Python 3.13 o registro no resource_tracker é inofensivo: os
+        processos filhos (spawn) compartilham o tracker do processo principal.
+        """
+        if sys.version_info >= (3, 13):
+            memoria = shared_memory.SharedMemory(name=nome, track=False)
+        else:
+            memoria = shared_memory.SharedMemory(name=nome)
+        return cls(memoria, dono=False)
+    
+    def publicar(self, quadro: bytes, estado: Optional[bytes], versao_estado: int) -> bool:
+        """
+        Escreve um quadro (e o estado, se não for None). Só o coletor escreve.
+        
+        Returns:
+            False se os dados não couberem no segmento
+        """
+        if len(quadro) > self._capacidade or (estado is not None and len(estado) > self._capacidade):
+            return False
+        
+        buffer = self._buffer
+        _, versao_atual, _, tamanho_estado = self._CABECALHO.unpack_from(buffer, 0)
+        
+        self._seq += 1  # ímpar: escrita em andamento
+        self._SEQ.pack_into(buffer, 0, self._seq)
+        
+        buffer[self._inicio_quadro:self._inicio_quadro + len(quadro)] = quadro
+        if estado is not None:
+            buffer[self._inicio_estado:self._inicio_estado + len(estado)] = estado
+            versao_atual, tamanho_estado = versao_estado, len(estado)
+        
+        # Versão e tamanhos ainda com seq ímpar; o seq par vai por último, sozinho
+        self._TAMANHOS.pack_into(buffer, self._SEQ.size, versao_atual, len(quadro), tamanho_estado)
+        self._seq += 1  # par: dados consistentes
+        self._SEQ.pack_into(buffer, 0, self._seq)
+        return True
+    
+    def sequencia(self) -> int:
+        return self._SEQ.unpack_from(self._buffer, 0)[0]
+    
+    def sinalizar_interesse(self) -> None:
+        """Worker: há clientes conectados neste processo."""
+        self._INTERESSE.pack_into(self._buffer, self._CABECALHO.size, time.time())
+    
+    def interesse_recente(self, janela: float = 2.0) -> bool:
+        """Coletor: algum worker teve clientes nos últimos `janela` segundos?"""
+        marcado = self._INTERESSE.unpack_from(self._buffer, self._CABECALHO.size)[0]
+        return time.time() - marcado < janela
+    
+    def controlar_perf(self, habilitado: Optional[bool] = None, reiniciar: bool = False) -> None:
+        """Qualquer processo: liga/desliga ou zera a instrumentação de todos."""
+        ligado, reinicios = self._CONTROLE.unpack_from(self._buffer, self._inicio_controle)
+        if habilitado is not None:
+            ligado = int(habilitado)
+        self._CONTROLE.pack_into(self._buffer, self._inicio_controle, ligado, reinicios + int(reiniciar))
+    
+    def aplicar_controle_perf(self) -> None:
+        """Aplica ao PERF local o que algum processo pediu via controlar_perf()."""
+        ligado, reinicios = self._CONTROLE.unpack_from(self._buffer, self._inicio_controle)
+        PERF.habilitado = bool(ligado)
+        if reinicios != self._reinicios_perf:
+            self._reinicios_perf = reinicios
+            PERF.reiniciar()
+    
+    def ler(self, versao_conhecida: int) -> Optional[Tuple[int, str, int, Optional[str]]]:
+        """
+        Lê o quadro atual; o estado só é lido se a versão for diferente.
+        
+        Returns:
+            (seq, quadro, versão do estado, estado ou None) já decodificados,
+            ou None se a escrita não terminou durante as tentativas
+        """
+        buffer = self._buffer
+        for _ in range(100):
+            seq, versao, tamanho_quadro, tamanho_estado = self._CABECALHO.unpack_from(buffer, 0)
+            if seq % 2:
+                continue
+            
+            try:
+                # str() decodifica direto do memoryview; uma escrita concorrente
+                # pode gerar UTF-8 inválido, descartado pela nova tentativa
+                quadro = str(buffer[self._inicio_quadro:self._inicio_quadro + tamanho_quadro], "utf-8")
+                estado = None
+                if versao != versao_conhecida and tamanho_estado:
+                    estado = str(buffer[self._inicio_estado:self._inicio_estado + tamanho_estado], "utf-8")
+            except UnicodeDecodeError:
+                continue
+            
+            if self.sequencia() == seq:
+                return seq, quadro, versao, estado
+        return None
+    
+    def fechar(self) -> None:
+        self._buffer.release()
+        self._memoria.close()
+        if self._dono:
+            self._memoria.unlink()
+
+MEMORIA: Optional[MemoriaSnapshots] = None          # Coletor: segmento em que publica
+MEMORIA_LEITURA: Optional[MemoriaSnapshots] = None  # Worker: segmento de onde lê
+
+def publicar_memoria_compartilhada(texto: str) -> None:
+    """Publica o quadro e, se mudou desde a última vez, o estado global."""
+    MEMORIA.aplicar_controle_perf()
+    estado = None
+    versao = ESTADO.versao
+    if versao != MEMORIA.versao_publicada:
+        exportado = ESTADO.exportar()
+        versao = exportado["versao"]
+        estado = json.dumps(exportado, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    if MEMORIA.publicar(texto.encode("utf-8"), estado, versao):
+        if estado is not None:
+            MEMORIA.versao_publicada = versao
+    else:
+        logger.error("❌ Snapshot maior que a memória compartilhada (aumente SHM_TAMANHO)")
+
+async def loop_leitor_memoria() -> None:
+    """
+    Worker: repassa aos seus clientes cada quadro publicado pelo coletor e
+    replica o estado global localmente (para as rotas REST).
+    
+    O histórico do worker começa com o que o coletor já persistiu
+    (ARQUIVOS, quando PERSISTENCIA_DIR está ativo) e segue com os quadros
+    lidos; sem persistência, só cobre o período desde o início do worker.
+    As linhas de base (BASES) existem apenas no coletor: as anomalias
+    chegam prontas no payload.
+    """
+    global MEMORIA_LEITURA
+    memoria = MEMORIA_LEITURA = MemoriaSnapshots.anexar(CONFIG["SHM_NOME"])
+    ultima_seq = 0
+    versao_estado = -1
+    logger.info(f"✅ Worker {os.getpid()} lendo snapshots de {CONFIG['SHM_NOME']}")
+    
+    if ARQUIVOS.diretorio:
+        agora = time.time()
+        inicio = agora - CONFIG["HISTORICO_PONTOS"] * CONFIG["COLETA_INTERVALO"]
+        HISTORICO.carregar(await asyncio.to_thread(lambda: list(ARQUIVOS.ler("historico", inicio, agora))))
+    
+    seq_invalida = None
+    try:
+        while True:
+            try:
+                memoria.aplicar_controle_perf()
+                seq = memoria.sequencia()
+                if seq != ultima_seq and seq % 2 == 0:
+                    lido = memoria.ler(versao_estado)
+                    if lido is not None:
+                        seq_lida, texto, versao, estado = lido
+                        try:
+                            exportado = json.loads(estado) if estado is not None else None
+                            payload = json.loads(texto)
+                        except ValueError as e:
+                            # Leitura inconsistente: ignora e tenta de novo no próximo ciclo
+                            if seq_lida != seq_invalida:
+                                seq_invalida = seq_lida
+                                logger.warning(f"⚠️  Quadro {seq_lida} ilegível na memória compartilhada: {e}")
+                        else:
+                            ultima_seq = seq_lida
+                            if exportado is not None:
+                                ESTADO.importar(exportado)
+                                versao_estado = versao
+                            with PERF.medir("broadcast"):
+                                HUB.publicar(texto, payload)
+                            HISTORICO.adicionar(payload)
+                if HUB.quantidade:
+                    memoria.sinalizar_interesse()
+            except Exception as e:
+                logger.error(f"❌ Erro ao ler a memória compartilhada: {e}")
+            await asyncio.sleep(CONFIG["SHM_POLL_INTERVALO"])
+    except asyncio.CancelledError:
+        raise
+    except BaseException as e:
+        logger.critical(f"❌ Leitor da memória compartilhada encerrado ({e!r}): "
+                        f"o worker {os.getpid()} não enviará mais quadros")
+        raise
+    finally:
+        MEMORIA_LEITURA = None
+        memoria.fechar()
+
+def executar_processo_coletor() -> None:
+    """Ponto de entrada do processo coletor (modo com vários workers)."""
+    global MEMORIA
+    
+    async def principal():
+        await iniciar_sistema()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await encerrar_sistema()
+    
+    MEMORIA = MemoriaSnapshots.anexar(CONFIG["SHM_NOME"])
+    try:
+        asyncio.run(principal())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        MEMORIA.fechar()
+
+def executar_multiprocesso() -> None:
+    """
+    Cria o segmento compartilhado, inicia um único processo coletor e sobe
+    o uvicorn com CONFIG["WORKERS"] workers que apenas leem os snapshots.
+    """
+    global LOG_LISTENER
+    import multiprocessing
+    import uvicorn
+    
+    # Só o coletor grava o arquivo de log
+    encerrar_logging()
+    LOG_LISTENER = configurar_logging(gravar_arquivo=False)
+    
+    memoria = MemoriaSnapshots.criar(CONFIG["SHM_TAMANHO"])
+    CONFIG["SHM_NOME"] = memoria.nome
+    os.environ["NOC_CONFIG"] = json.dumps(CONFIG)
+    
+    contexto = multiprocessing.get_context("spawn")
+    os.environ["NOC_PAPEL"] = "coletor"
+    coletor = contexto.Process(target=executar_processo_coletor, name="noc-coletor", daemon=True)
+    coletor.start()
+    os.environ["NOC_PAPEL"] = "leitor"
+    logger.info(f"✅ Coletor (pid {coletor.pid}) publicando em {memoria.nome}")
+    
+    try:
+        uvicorn.run(
+            f"{os.path.splitext(os.path.basename(__file__))[0]}:app",
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            host=CONFIG["HOST"],
+            port=CONFIG["PORTA"],
+            workers=CONFIG["WORKERS"],
+            log_level="info"
+        )
+    finally:
+        coletor.terminate()
+        coletor.join(timeout=5)
+        memoria.fechar()
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 8.4 DISPONIBILIDADE E SLA DOS LINKS WAN
+# ═══════════════════════════════════════════════════════════════════════════
+
+class IntervalosAcumulados:
+    """
+    Intervalos [início, fim] disjuntos e ordenados, com a duração acumulada
+    antes de cada um. Estender o último intervalo ou abrir um novo é O(1);
+    a duração dentro de qualquer período sai de duas buscas binárias.
+    
+    O tempo nunca volta: abrir/estender antes do último fim é ajustado para
+    ele, e pares fora de ordem (arquivos antigos) são ordenados e fundidos.
+    """
+    
+    def __init__(self, pares: Sequence[float] = ()):
+        self._reconstruir(pares)
+    
+    def _reconstruir(self, pares: Sequence[float]) -> None:
+        intervalos = list(zip(pares[0::2], pares[1::2]))
+        if any(b[0] < a[1] or b[1] < b[0] for a, b in zip(intervalos, intervalos[1:])):
+            fundidos: List[List[float]] = []
+            for inicio, fim in sorted((inicio, max(inicio, fim)) for inicio, fim in intervalos):
+                if fundidos and inicio <= fundidos[-1][1]:
+                    fundidos[-1][1] = max(fundidos[-1][1], fim)
+                else:
+                    fundidos.append([inicio, fim])
+            pares = [v for par in fundidos for v in par]
+        self.inicios = array.array("d", pares[0::2])
+        self.fins = array.array("d", pares[1::2])
+        self._acumulado = array.array("d")
+        total = 0.0
+        for inicio, fim in zip(self.inicios, self.fins):
+            self._acumulado.append(total)
+            total += fim - inicio
+    
+    def __len__(self) -> int:
+        return len(self.inicios)
+    
+    def abrir(self, t: float) -> None:
+        anterior = 0.0
+        if self.inicios:
+            anterior = self._acumulado[-1] + self.fins[-1] - self.inicios[-1]
+            t = max(t, self.fins[-1])
+        self.inicios.append(t)
+        self.fins.append(t)
+        self._acumulado.append(anterior)
+    
+    def estender(self, t: float) -> None:
+        self.fins[-1] = max(self.fins[-1], t)
+    
+    def _faixa(self, inicio: float, fim: float) -> Tuple[int, int]:
+        """Índices [k0, k1) dos intervalos que tocam o período."""
+        return bisect.bisect_right(self.fins, inicio), bisect.bisect_left(self.inicios, fim)
+    
+    def duracao(self, inicio: float, fim: float) -> float:
+        """Tempo coberto pelos intervalos dentro de [inicio, fim]."""
+        k0, k1 = self._faixa(inicio, fim)
+        if k0 >= k1:
+            return 0.0
+        total = self._acumulado[k1 - 1] + self.fins[k1 - 1] - self.inicios[k1 - 1] - self._acumulado[k0]
+        total -= max(0.0, inicio - self.inicios[k0])
+        total -= max(0.0, self.fins[k1 - 1] - fim)
+        return max(0.0, total)
+    
+    def contar(self, inicio: float, fim: float) -> int:
+        """Quantidade de intervalos que tocam [inicio, fim]."""
+        k0, k1 = self._faixa(inicio, fim)
+        return max(0, k1 - k0)
+    
+    def descartar_ate(self, limite: float) -> None:
+        """Remove os intervalos encerrados antes de `limite`."""
+        k = bisect.bisect_left(self.fins, limite)
+        if k:
+            self._reconstruir([v for par in zip(self.inicios[k:], self.fins[k:]) for v in par])
+    
+    def exportar(self) -> List[float]:
+        return [v for par in zip(self.inicios, self.fins) for v in par]
+
+class SerieSLA:
+    """
+    Disponibilidade de um alvo (ou provedor): períodos observados, quedas
+    e, por hora, o tempo dentro dos SLOs de latência e perda.
+    
+    horas[hora epoch] = [segundos observados, segundos UP,
+                         segundos UP com latência no SLO, segundos com perda no SLO,
+                         soma latência × segundos]
+    """
+    
+    def __init__(self, dados: Optional[Dict] = None):
+        dados = dados or {}
+        self.observado = IntervalosAcumulados(dados.get("observado", ()))
+        self.quedas = IntervalosAcumulados(dados.get("quedas", ()))
+        self.down: bool = dados.get("down", False)
+        # Latência/perda da última sonda: valem, com down, até a próxima
+        self.latencia: float = dados.get("latencia", 0.0)
+        self.perda: float = dados.get("perda", 0.0)
+        self.desde: Optional[float] = dados.get("desde")
+        self.ultima: Optional[float] = dados.get("ultima")
+        self.horas: Dict[int, List[float]] = {int(h): v for h, v in dados.get("horas", {}).items()}
+    
+    def registrar(self, t: float, down: bool, latencia: float, perda: float) -> None:
+        """Incorpora uma sonda (O(1)). Sondas anteriores à última são descartadas."""
+        if self.ultima is not None and t < self.ultima:
+            return
+        continuo = self.ultima is not None and t - self.ultima <= CONFIG["SLA_LACUNA_MAXIMA"]
+        if continuo:
+            # O estado anterior (status, latência e perda) vale até esta sonda
+            self.observado.estender(t)
+            if self.down:
+                self.quedas.estender(t)
+            peso = t - self.ultima
+            bucket = self.horas.setdefault(int(self.ultima // 3600), [0.0] * 5)
+            bucket[0] += peso
+            if not self.down:
+                bucket[1] += peso
+                if self.latencia <= LIMITES["ping"]:
+                    bucket[2] += peso
+                bucket[4] += self.latencia * peso
+            if self.perda <= LIMITES["perda_pacotes"]:
+                bucket[3] += peso
+        else:
+            self.observado.abrir(t)
+        
+        if down and not (self.down and continuo):
+            self.quedas.abrir(t)
+        if down != self.down or self.desde is None:
+            self.desde = t
+        self.down = down
+        self.latencia = latencia
+        self.perda = perda
+        self.ultima = t
+    
+    def resumo(self, inicio: float, fim: float) -> Dict:
+        observado = self.observado.duracao(inicio, fim)
+        indisponivel = self.quedas.duracao(inicio, fim)
+        quedas = self.quedas.contar(inicio, fim)
+        disponivel = observado - indisponivel
+        
+        horas = [v for h, v in self.horas.items() if inicio // 3600 <= h <= fim // 3600]
+        segundos, segundos_up, latencia_ok, perda_ok, soma_latencia = (
+            [sum(coluna) for coluna in zip(*horas)] if horas else [0.0] * 5)
+        
+        disponibilidade = round(100 * disponivel / observado, 4) if observado else None
+        return {
+            "estado": "DOWN" if self.down else "UP",
+            "desde": self.desde,
+            "observado_s": round(observado, 1),
+            "indisponivel_s": round(indisponivel, 1),
+            "disponibilidade_pct": disponibilidade,
+            "cumpre_meta": disponibilidade >= CONFIG["SLA_META"] if disponibilidade is not None else None,
+            "quedas": quedas,
+            "mttr_s": round(indisponivel / quedas, 1) if quedas else None,
+            "mtbf_s": round(disponivel / quedas, 1) if quedas else None,
+            "latencia": {
+                "slo_ms": LIMITES["ping"],
+                "dentro_slo_pct": round(100 * latencia_ok / segundos_up, 2) if segundos_up else None,
+                "media_ms": round(soma_latencia / segundos_up, 1) if segundos_up else None,
+            },
+            "perda": {
+                "slo_pct": LIMITES["perda_pacotes"],
+                "dentro_slo_pct": round(100 * perda_ok / segundos, 2) if segundos else None,
+            },
+        }
+    
+    def descartar_ate(self, limite: float) -> None:
+        self.observado.descartar_ate(limite)
+        self.quedas.descartar_ate(limite)
+        hora_limite = limite // 3600
+        for hora in [h for h in self.horas if h < hora_limite]:
+            del self.horas[hora]
+    
+    def exportar(self) -> Dict:
+        return {
+            "observado": self.observado.exportar(),
+            "quedas": self.quedas.exportar(),
+            "down": self.down,
+            "latencia": self.latencia,
+            "perda": self.perda,
+            "desde": self.desde,
+            "ultima": self.ultima,
+            "horas": self.horas,
+        }
+
+class ContabilidadeSLA:
+    """
+    Disponibilidade incremental por alvo WAN e por provedor (o provedor só
+    cai quando todos os seus alvos estão DOWN). Períodos sem amostras
+    (monitor parado) não contam nem como disponível nem como queda.
+    
+    Ao vivo, as sondas usam agora(): epoch ancorado no relógio monotônico,
+    imune a ajustes do relógio de parede para trás.
+    """
+    
+    def __init__(self):
+        self.series: Dict[str, SerieSLA] = {}
+        self._lock = threading.Lock()
+        self._ancora = (time.time(), time.monotonic())
+    
+    def agora(self) -> float:
+        """
+        Epoch monotônico para as sondas. Um salto do relógio para a frente
+        maior que SLA_LACUNA_MAXIMA (ex: suspensão) reancora e vira lacuna;
+        um salto para trás é ignorado.
+        """
+        parede, monotonico = self._ancora
+        t = parede + time.monotonic() - monotonico
+        real = time.time()
+        if real - t > CONFIG["SLA_LACUNA_MAXIMA"]:
+            self._ancora = (real, time.monotonic())
+            t = real
+        return t
+    
+    def registrar_wan(self, wan: List[Dict], t: float) -> None:
+        provedores: Dict[str, List[Dict]] = {}
+        with self._lock:
+            for w in wan:
+                self._serie(f"alvo/{w['nome']}").registrar(
+                    t, w["status"] == "DOWN", w["latencia_ms"], w["perda_pacotes"])
+                provedores.setdefault(w["provedor"], []).append(w)
+            for provedor, links in provedores.items():
+                ativos = [w for w in links if w["status"] != "DOWN"]
+                self._serie(f"provedor/{provedor}").registrar(
+                    t, not ativos,
+                    min((w["latencia_ms"] for w in ativos), default=0.0),
+                    min(w["perda_pacotes"] for w in links))
+    
+    def _serie(self, chave: str) -> SerieSLA:
+        serie = self.series.get(chave)
+        if serie is None:
+            serie = self.series[chave] = SerieSLA()
+        return serie
+    
+    def consultar(self, inicio: float, fim: float, filtro: Optional[str] = None) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                chave: serie.resumo(inicio, fim)
+                for chave, serie in self.series.items()
+                if not filtro or filtro.lower() in chave.lower()
+            }
+    
+    def exportar(self) -> Dict:
+        limite = time.time() - CONFIG["SLA_RETENCAO_DIAS"] * 86400
+        with self._lock:
+            for serie in self.series.values():
+                serie.descartar_ate(limite)
+            return {"formato": 1, "series": {chave: serie.exportar() for chave, serie in self.series.items()}}
+    
+    def importar(self, dados: Dict) -> None:
+        with self._lock:
+            self.series = {chave: SerieSLA(serie) for chave, serie in dados.get("series", {}).items()}
+    
+    def salvar(self, caminho: str) -> None:
+        """Grava de forma atômica (arquivo temporário + rename)."""
+        texto = json.dumps(self.exportar(), separators=(",", ":"))
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+        os.replace(temporario, caminho)
+    
+    def carregar(self, caminho: str) -> bool:
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                self.importar(json.load(arquivo))
+            return True
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Arquivo de SLA ilegível ({caminho}): {e}")
+            return False
+
+SLA = ContabilidadeSLA()
+
+def periodo_sla(periodo: str, agora: Optional[datetime] = None) -> Tuple[float, float]:
+    """
+    Converte um período nomeado em (início, fim) epoch.
     
-    wan_lista = []
+    Args:
+        periodo: "24h", "7d", "30d" (janelas móveis) ou "dia", "semana",
+                 "mes", "mes_anterior", "ano" (calendário, hora local)
+    """
+    agora = agora or datetime.now()
+    fim = agora.timestamp()
+    moveis = {"24h": 1, "7d": 7, "30d": 30}
+    if periodo in moveis:
+        return fim - moveis[periodo] * 86400, fim
     
-    for alvo in alvos:
-        ms = ping_real(alvo["ip"])
-        status = "UP" if ms != 9999 else "DOWN"
-        perda = 0.0 if ms != 9999 else 100.0
+    hoje = agora.replace(hour=0, minute=0, second=0, microsecond=0)
+    if periodo == "dia":
+        inicio = hoje
+    elif periodo == "semana":
+        inicio = hoje - timedelta(days=hoje.weekday())
+    elif periodo == "mes":
+        inicio = hoje.replace(day=1)
+    elif periodo == "mes_anterior":
+        fim_mes = hoje.replace(day=1)
+        return (fim_mes - timedelta(days=1)).replace(day=1).timestamp(), fim_mes.timestamp()
+    elif periodo == "ano":
+        inicio = hoje.replace(month=1, day=1)
+    else:
+        raise ValueError(f"Período desconhecido: {periodo}")
+    return inicio.timestamp(), fim
+
+async def salvar_sla_periodico() -> None:
+    """Persiste a contabilidade de SLA a cada SLA_SALVAR_INTERVALO segundos."""
+    while True:
+        await asyncio.sleep(CONFIG["SLA_SALVAR_INTERVALO"])
+        try:
+            await asyncio.to_thread(SLA.salvar, CONFIG["SLA_ARQUIVO"])
+        except OSError as e:
+            logger.error(f"❌ Erro ao salvar SLA: {e}")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 8.5 PERSISTÊNCIA E EXPORTAÇÃO (HISTÓRICO E EVENTOS)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class ArquivosDiarios:
+    """
+    Histórico e eventos em arquivos diários JSON-lines comprimidos
+    (`historico-AAAA-MM-DD.jsonl.gz`, `eventos-AAAA-MM-DD.jsonl.gz`).
+    
+    Os registros ficam em um buffer e, a cada PERSISTENCIA_INTERVALO
+    segundos, viram um novo membro gzip no fim do arquivo do dia: o arquivo
+    nunca é reescrito e um crash perde no máximo um intervalo. Só o
+    processo coletor grava (`ativo`); qualquer processo pode ler.
+    
+    Para o histórico, cada dia tem também um índice das colunas achatadas
+    que já apareceram (`historico-AAAA-MM-DD.colunas.json`): a exportação
+    monta o cabeçalho sem uma passada pelos dados.
+    """
+    
+    TIPOS = ("historico", "eventos")
+    
+    def __init__(self, diretorio: Optional[str]):
+        self.diretorio = diretorio
+        self.ativo = False
+        self._buffer: Dict[Tuple[str, str], List[str]] = {}
+        self._colunas: Dict[str, Dict[str, None]] = {}  # dia -> colunas (ordem de chegada)
+        self._colunas_novas: Set[str] = set()  # Dias com índice a regravar
+        self._lock = threading.Lock()
+        self._ultimo_expurgo: Optional[str] = None
+    
+    def caminho(self, tipo: str, dia: str) -> str:
+        return os.path.join(self.diretorio, f"{tipo}-{dia}.jsonl.gz")
+    
+    def caminho_colunas(self, dia: str) -> str:
+        return os.path.join(self.diretorio, f"historico-{dia}.colunas.json")
+    
+    def adicionar(self, tipo: str, registro: Dict) -> None:
+        if not self.ativo:
+            return
+        linha = json.dumps(registro, ensure_ascii=False, separators=(",", ":"))
+        dia = datetime.fromtimestamp(registro["t"]).strftime("%Y-%m-%d")
+        colunas = achatar_ponto(registro) if tipo == "historico" else None
+        with self._lock:
+            self._buffer.setdefault((tipo, dia), []).append(linha)
+            if colunas is not None:
+                conhecidas = self._colunas.setdefault(dia, {})
+                antes = len(conhecidas)
+                conhecidas.update(dict.fromkeys(colunas))
+                if len(conhecidas) != antes:
+                    self._colunas_novas.add(dia)
+    
+    def descarregar(self) -> int:
+        """
+        Grava o buffer (bloqueante: chamar fora do event loop).
         
-        wan_lista.append({
-            "nome": alvo["nome"],
-            "provedor": alvo["provedor"],
-            "tipo": "ICMP",
-            "status": status,
-            "latencia_ms": ms if ms != 9999 else 0,
-            "perda_pacotes": perda,
-            "jitter": 0.0,
-            "banda_down": "--",
-            "banda_up": "--",
-        })
+        Returns:
+            Quantidade de registros gravados
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+            indices = {dia: list(self._colunas[dia]) for dia in self._colunas_novas}
+            self._colunas_novas = set()
+            # Dias fechados não recebem mais pontos; um atrasado recria o índice e é mesclado abaixo
+            ontem = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+            self._colunas = {dia: c for dia, c in self._colunas.items() if dia >= ontem}
+        if not buffer and not indices:
+            return 0
+        
+        os.makedirs(self.diretorio, exist_ok=True)
+        # Índice antes dos dados: uma coluna sem valores é inofensiva; dados sem coluna, não
+        for dia, colunas in indices.items():
+            caminho = self.caminho_colunas(dia)
+            colunas = list(dict.fromkeys(self._ler_colunas(caminho) + colunas))
+            with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+                json.dump(colunas, arquivo, ensure_ascii=False)
+            os.replace(caminho + ".tmp", caminho)
+        
+        total = 0
+        for (tipo, dia), linhas in buffer.items():
+            dados = ("\n".join(linhas) + "\n").encode("utf-8")
+            with open(self.caminho(tipo, dia), "ab") as arquivo:
+                arquivo.write(gzip.compress(dados, compresslevel=6))
+            total += len(linhas)
+        
+        hoje = datetime.now().strftime("%Y-%m-%d")
+        if self._ultimo_expurgo != hoje:
+            self._ultimo_expurgo = hoje
+            self.expurgar()
+        return total
     
-    return wan_lista
+    def expurgar(self) -> None:
+        """Remove arquivos mais antigos que PERSISTENCIA_RETENCAO_DIAS."""
+        limite = (datetime.now() - timedelta(days=CONFIG["PERSISTENCIA_RETENCAO_DIAS"])).strftime("%Y-%m-%d")
+        for nome in os.listdir(self.diretorio):
+            partes = re.match(r"^(\w+)-(\d{4}-\d{2}-\d{2})\.(?:jsonl\.gz|colunas\.json)$", nome)
+            if partes and partes.group(1) in self.TIPOS and partes.group(2) < limite:
+                os.remove(os.path.join(self.diretorio, nome))
+                logger.info(f"🗑️  Removido por retenção: {nome}")
+    
+    @staticmethod
+    def _ler_colunas(caminho: str) -> List[str]:
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return []
+        except ValueError as e:
+            logger.warning(f"⚠️  {caminho} inválido: {e}")
+            return []
+    
+    def colunas(self, inicio: float, fim: float) -> Tuple[List[str], bool]:
+        """
+        Colunas achatadas do histórico no período, pelos índices diários e
+        pelo que ainda está em memória (bloqueante: chamar fora do loop).
+        
+        Returns:
+            (colunas em ordem de chegada, completo): completo é False se
+            algum dia com dados não tem índice (gravado por versão anterior)
+        """
+        colunas: Dict[str, None] = {}
+        completo = True
+        if not self.diretorio:
+            return [], completo
+        with self._lock:
+            em_memoria = {dia: list(c) for dia, c in self._colunas.items()}
+        dia = datetime.fromtimestamp(inicio).replace(hour=0, minute=0, second=0, microsecond=0)
+        ultimo = datetime.fromtimestamp(fim)
+        while dia <= ultimo:
+            nome_dia = dia.strftime("%Y-%m-%d")
+            dia += timedelta(days=1)
+            indice = self._ler_colunas(self.caminho_colunas(nome_dia))
+            if not indice and os.path.exists(self.caminho("historico", nome_dia)):
+                completo = False
+            colunas.update(dict.fromkeys(indice))
+            colunas.update(dict.fromkeys(em_memoria.get(nome_dia, ())))
+        return list(colunas), completo
+    
+    def ler(self, tipo: str, inicio: float, fim: float, incluir_buffer: bool = False) -> Iterator[Dict]:
+        """
+        Registros com inicio <= t <= fim, em ordem, um arquivo por vez.
+        
+        Com incluir_buffer, cada dia é seguido do que ainda está no buffer
+        (cópia tirada antes da leitura, sem gravar nada): o que um
+        descarregar() concorrente levou ao arquivo não sai duas vezes.
+        """
+        if not self.diretorio:
+            return
+        pendentes: Dict[str, List[str]] = {}
+        if incluir_buffer:
+            with self._lock:
+                pendentes = {dia: list(linhas) for (tipo_buffer, dia), linhas in self._buffer.items()
+                             if tipo_buffer == tipo}
+        dia = datetime.fromtimestamp(inicio).replace(hour=0, minute=0, second=0, microsecond=0)
+        ultimo = datetime.fromtimestamp(fim)
+        while dia <= ultimo:
+            nome_dia = dia.strftime("%Y-%m-%d")
+            caminho = self.caminho(tipo, nome_dia)
+            dia += timedelta(days=1)
+            ultimo_t, vistas = float("-inf"), set()
+            if os.path.exists(caminho):
+                try:
+                    with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+                        for linha in arquivo:
+                            registro = json.loads(linha)
+                            if registro["t"] != ultimo_t:
+                                ultimo_t, vistas = registro["t"], set()
+                            vistas.add(linha.rstrip("\n"))
+                            if inicio <= registro["t"] <= fim:
+                                yield registro
+                except (EOFError, gzip.BadGzipFile, ValueError) as e:
+                    # Membro final truncado (ex: queda de energia durante a gravação)
+                    logger.warning(f"⚠️  {caminho} truncado: {e}")
+            for linha in pendentes.get(nome_dia, ()):
+                registro = json.loads(linha)
+                if registro["t"] < ultimo_t or (registro["t"] == ultimo_t and linha in vistas):
+                    continue
+                if inicio <= registro["t"] <= fim:
+                    yield registro
+
+ARQUIVOS = ArquivosDiarios(CONFIG["PERSISTENCIA_DIR"])
+
+async def persistir_periodico() -> None:
+    """Grava o buffer de histórico/eventos a cada PERSISTENCIA_INTERVALO segundos."""
+    while True:
+        await asyncio.sleep(CONFIG["PERSISTENCIA_INTERVALO"])
+        try:
+            with PERF.medir("persistencia"):
+                await asyncio.to_thread(ARQUIVOS.descarregar)
+        except OSError as e:
+            logger.error(f"❌ Erro ao persistir histórico: {e}")
+
+def achatar_ponto(ponto: Dict) -> Dict[str, Any]:
+    """
+    Converte um ponto de histórico em colunas planas:
+    cpu, ram, ..., wan/<alvo>/latencia_ms, link/download/p95_mbps,
+    conexoes/TIME_WAIT, interface/<nic>/rx, disco/<dev>/leitura.
+    """
+    linha = {chave: ponto.get(chave) for chave in ("t", "cpu", "ram", "disco", "rx", "tx", "temperatura_cpu")}
+    linha["data_hora"] = datetime.fromtimestamp(ponto["t"]).isoformat(timespec="seconds")
+    for nome, (status, latencia, perda) in (ponto.get("wan") or {}).items():
+        linha[f"wan/{nome}/status"] = status
+        linha[f"wan/{nome}/latencia_ms"] = latencia
+        linha[f"wan/{nome}/perda_pacotes"] = perda
+    for sentido, (media, p95, pico) in (ponto.get("link") or {}).items():
+        linha[f"link/{sentido}/media_mbps"] = media
+        linha[f"link/{sentido}/p95_mbps"] = p95
+        linha[f"link/{sentido}/pico_mbps"] = pico
+    for chave, quantidade in (ponto.get("conexoes") or {}).items():
+        linha[f"conexoes/{chave}"] = quantidade
+    for prefixo, chave in (("interface", "interfaces"), ("disco", "discos")):
+        tabela = ponto.get(chave)
+        if tabela:
+            for nome, valores in zip(tabela["nomes"], tabela["valores"]):
+                for campo, valor in zip(tabela["campos"], valores):
+                    linha[f"{prefixo}/{nome}/{campo}"] = valor
+    return linha
+
+COLUNAS_EVENTOS = ["t", "timestamp", "tipo", "severidade", "componente", "mensagem", "valor"]
+
+def colunas_padrao(tipo: str, inicio: float, fim: float) -> List[str]:
+    """
+    Cabeçalho antes do filtro do cliente: a união das colunas que existiram
+    no período (alvos, NICs e discos), lida dos índices diários de
+    ArquivosDiarios, sem passar pelos dados (bloqueante: chamar fora do loop).
+    """
+    if tipo == "eventos":
+        return list(COLUNAS_EVENTOS)
+    colunas = dict.fromkeys(["t", "data_hora", "cpu", "ram", "disco", "rx", "tx", "temperatura_cpu"])
+    indexadas, completo = ARQUIVOS.colunas(inicio, fim)
+    colunas.update(dict.fromkeys(indexadas))
+    if not indexadas or not completo:
+        # Dias sem índice: ao menos os alvos configurados
+        colunas.update(dict.fromkeys(f"wan/{alvo['nome']}/{campo}" for alvo in ALVOS_WAN
+                                     for campo in ("status", "latencia_ms", "perda_pacotes")))
+    return list(colunas)
+
+def filtrar_colunas(colunas: List[str], padroes: Sequence[str], alvos: Sequence[str]) -> List[str]:
+    """
+    Args:
+        padroes: Padrões fnmatch (ex: "cpu", "wan/*/latencia_ms"); vazio = todas
+        alvos: Mantém só as colunas wan/ desses alvos; vazio = todos
+    """
+    if padroes:
+        colunas = [c for c in colunas if c == "t" or any(fnmatch.fnmatchcase(c, p) for p in padroes)]
+    if alvos:
+        colunas = [c for c in colunas if not c.startswith("wan/") or c.split("/")[1] in alvos]
+    return colunas
+
+def linhas_exportacao(tipo: str, inicio: float, fim: float, alvos: Sequence[str]) -> Iterator[Dict]:
+    """Registros planos (histórico achatado ou eventos) no período, incluindo o buffer."""
+    for registro in ARQUIVOS.ler(tipo, inicio, fim, incluir_buffer=True):
+        if tipo == "historico":
+            yield achatar_ponto(registro)
+        elif not alvos or any(alvo in registro["mensagem"] or alvo in registro["componente"]
+                              for alvo in alvos):
+            yield registro
+
+def _em_lotes(linhas: Iterator[Dict]) -> Iterator[List[Dict]]:
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= CONFIG["EXPORTACAO_LOTE"]:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def gerar_csv(linhas: Iterator[Dict], colunas: List[str]) -> Iterator[bytes]:
+    saida = io.StringIO()
+    escritor = csv.DictWriter(saida, fieldnames=colunas, extrasaction="ignore")
+    escritor.writeheader()
+    for lote in _em_lotes(linhas):
+        escritor.writerows(lote)
+        yield saida.getvalue().encode("utf-8")
+        saida.seek(0)
+        saida.truncate()
+    if saida.tell():
+        yield saida.getvalue().encode("utf-8")
+
+def gerar_jsonl(linhas: Iterator[Dict], colunas: List[str]) -> Iterator[bytes]:
+    for lote in _em_lotes(linhas):
+        yield "".join(
+            json.dumps({c: linha.get(c) for c in colunas}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for linha in lote
+        ).encode("utf-8")
+
+class _SaidaEmBlocos(io.RawIOBase):
+    """Arquivo só de escrita cujo conteúdo é retirado em blocos pelo gerador."""
+    
+    def __init__(self):
+        self._blocos: List[bytes] = []
+        self._posicao = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, dados) -> int:
+        self._blocos.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+    
+    def tell(self) -> int:
+        return self._posicao
+    
+    def retirar(self) -> bytes:
+        dados, self._blocos = b"".join(self._blocos), []
+        return dados
+
+def gerar_parquet(linhas: Iterator[Dict], colunas: List[str]) -> Iterator[bytes]:
+    """Um row group por lote: a memória fica limitada ao tamanho do lote."""
+    pa = DEPENDENCIAS["pyarrow"].obter()
+    texto = {"data_hora", "timestamp", "tipo", "severidade", "componente", "mensagem"}
+    esquema = pa.schema([
+        (c, pa.string() if c in texto or c.endswith("/status") else pa.float64()) for c in colunas
+    ])
+    saida = _SaidaEmBlocos()
+    with pa.parquet.ParquetWriter(saida, esquema, compression="zstd") as escritor:
+        for lote in _em_lotes(linhas):
+            escritor.write_table(pa.Table.from_pylist(lote, schema=esquema))
+            yield saida.retirar()
+    yield saida.retirar()
+
+def comprimir_gzip(blocos: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+FORMATOS_EXPORTACAO = {
+    "csv": (gerar_csv, "text/csv; charset=utf-8"),
+    "jsonl": (gerar_jsonl, "application/x-ndjson"),
+    "parquet": (gerar_parquet, "application/vnd.apache.parquet"),
+}
+
+def interpretar_instante(valor: Optional[str], padrao: float) -> float:
+    """Aceita epoch ("1767225600") ou ISO 8601 ("2026-01-01", "2026-01-01T08:00")."""
+    if not valor:
+        return padrao
+    try:
+        return float(valor)
+    except ValueError:
+        return datetime.fromisoformat(valor).timestamp()
 
 # ═══════════════════════════════════════════════════════════════════════════
 # 9. SERVIDOR FASTAPI
@@ -563,368 +4855,1081 @@ app = FastAPI(
     version="12.0"
 )
 
+TAREFAS_FUNDO: List[asyncio.Task] = []
+
 @app.on_event("startup")
-def iniciar_sistema():
+async def iniciar_sistema():
     """Inicializa workers ao iniciar o servidor."""
+    global GRAVADOR
+    
     logger.info("=" * 80)
     logger.info("🚀 NOC COMMANDER v12.0 - INICIANDO")
     logger.info("=" * 80)
     
-    # Iniciar worker de speedtest
-    thread_speedtest = threading.Thread(target=worker_speedtest, daemon=True)
-    thread_speedtest.start()
-    logger.info("✅ Worker de Speedtest iniciado")
+    # Dashboard: hash e pré-compressão uma única vez, fora do event loop
+    await asyncio.to_thread(RECURSOS.montar)
+    
+    if PAPEL_PROCESSO == "leitor":
+        # Worker: sem coletores, apenas repassa o que o coletor publica
+        TAREFAS_FUNDO.append(asyncio.create_task(loop_leitor_memoria()))
+    elif CONFIG["REPRODUCAO_ARQUIVO"]:
+        # Modo reprodução: coletores e speedtest desligados
+        TAREFAS_FUNDO.append(asyncio.create_task(loop_reproducao()))
+    else:
+        if CONFIG["GRAVACAO_ARQUIVO"]:
+            GRAVADOR = GravadorSnapshots(CONFIG["GRAVACAO_ARQUIVO"])
+            logger.info(f"⏺️  Gravando snapshots em {CONFIG['GRAVACAO_ARQUIVO']}")
+        
+        if CONFIG["PERSISTENCIA_DIR"]:
+            ARQUIVOS.ativo = True
+            TAREFAS_FUNDO.append(asyncio.create_task(persistir_periodico()))
+        
+        if CONFIG["SLA_ARQUIVO"]:
+            if SLA.carregar(CONFIG["SLA_ARQUIVO"]):
+                logger.info(f"📊 SLA carregado de {CONFIG['SLA_ARQUIVO']} ({len(SLA.series)} séries)")
+            TAREFAS_FUNDO.append(asyncio.create_task(salvar_sla_periodico()))
+        
+        UTILIZACAO.iniciar()
+        
+        # Iniciar worker de speedtest
+        thread_speedtest = threading.Thread(target=worker_speedtest, daemon=True)
+        thread_speedtest.start()
+        logger.info("✅ Worker de Speedtest iniciado")
+        
+        TAREFAS_FUNDO.append(asyncio.create_task(loop_coleta()))
+    
+    # Instrumentação (o amostrador só mede quando PERF está habilitado)
+    TAREFAS_FUNDO.append(asyncio.create_task(monitorar_lag_loop()))
+    if CONFIG["PERF_LOG_INTERVALO"] > 0:
+        TAREFAS_FUNDO.append(asyncio.create_task(registrar_perf_periodico()))
+    
+    # Dependências opcionais: sondadas em paralelo, sem bloquear o servidor
+    if PAPEL_PROCESSO != "leitor":
+        TAREFAS_FUNDO.append(asyncio.create_task(sondar_dependencias()))
+    
+    TEMPOS_INICIALIZACAO["pronto_ms"] = round(
+        (time.time() - psutil.Process().create_time()) * 1000, 1
+    )
+    logger.info(f"⏱️  Servidor pronto em {TEMPOS_INICIALIZACAO['pronto_ms']:.0f} ms "
+                f"(importação: {TEMPOS_INICIALIZACAO['importacao_ms']:.0f} ms)")
+
+async def sondar_dependencias() -> None:
+    """Resolve todas as dependências opcionais em paralelo (thread pool)."""
+    loop = asyncio.get_running_loop()
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        loop.run_in_executor(None, dependencia.obter)
+        for dependencia in DEPENDENCIAS.values()
+    ))
+    TEMPOS_INICIALIZACAO["dependencias_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    
+    disponiveis = [d.nome for d in DEPENDENCIAS.values() if d.disponivel]
+    logger.info(f"🧩 Dependências sondadas em {TEMPOS_INICIALIZACAO['dependencias_ms']:.0f} ms: "
+                f"{', '.join(disponiveis) or 'nenhuma opcional disponível'}")
+
+def obter_capacidades() -> Dict[str, bool]:
+    """Backends opcionais já disponíveis (False enquanto pendentes)."""
+    return {
+        chave: dependencia.estado()["status"] == "disponivel"
+        for chave, dependencia in DEPENDENCIAS.items()
+    }
+
+@app.on_event("shutdown")
+async def encerrar_sistema():
+    """Interrompe as tarefas de fundo e fecha a gravação em andamento."""
+    for tarefa in TAREFAS_FUNDO:
+        tarefa.cancel()
+    TAREFAS_FUNDO.clear()
+    
+    if GRAVADOR is not None:
+        await asyncio.to_thread(GRAVADOR.fechar)
+        logger.info(f"⏺️  Gravação encerrada: {GRAVADOR.quadros} snapshots")
+    
+    if PAPEL_PROCESSO != "leitor" and not CONFIG["REPRODUCAO_ARQUIVO"] and CONFIG["SLA_ARQUIVO"]:
+        try:
+            SLA.salvar(CONFIG["SLA_ARQUIVO"])
+        except OSError as e:
+            logger.error(f"❌ Erro ao salvar SLA: {e}")
+    
+    if ARQUIVOS.ativo:
+        try:
+            ARQUIVOS.descarregar()
+        except OSError as e:
+            logger.error(f"❌ Erro ao persistir histórico: {e}")
+
+@app.get("/")
+async def index(request: Request):
+    """Retorna a página do dashboard (revalidada por ETag)."""
+    return RECURSOS.responder("/", request)
+
+@app.get("/static/{caminho:path}")
+async def recurso_estatico(caminho: str, request: Request):
+    """CSS, JS e fontes do dashboard, com hash no nome (cache imutável)."""
+    return RECURSOS.responder(f"/static/{caminho}", request)
+
+@app.get("/api/status")
+async def obter_status():
+    """Retorna status atual do sistema."""
+    estado = ESTADO.ler()
+    return {
+        "sistema": "NOC Commander v12",
+        "status": "Operacional",
+        "timestamp": datetime.now().isoformat(),
+        "versao_estado": estado.versao,
+        "eventos_totais": len(estado.dados["eventos"]),
+        "alertas_totais": len(estado.dados["alertas"]),
+        "modo": "reproducao" if CONFIG["REPRODUCAO_ARQUIVO"] else "ao_vivo",
+        "gravando": GRAVADOR is not None,
+        "clientes": HUB.quantidade,
+        "processo": {"papel": PAPEL_PROCESSO, "pid": os.getpid(), "workers": CONFIG["WORKERS"]},
+        "dependencias": {chave: d.estado() for chave, d in DEPENDENCIAS.items()},
+        "inicializacao": TEMPOS_INICIALIZACAO,
+    }
+
+@app.get("/api/estado")
+async def obter_estado(desde: int = -1, chaves: Optional[str] = None):
+    """
+    Retorna o estado global se ele mudou após a versão `desde`.
+    
+    Args:
+        desde: Última versão conhecida pelo cliente (-1 = sempre retornar)
+        chaves: Lista separada por vírgulas (ex: "velocidade,contadores_alertas")
+    """
+    estado = ESTADO.ler()
+    selecionadas = [c.strip() for c in chaves.split(",") if c.strip()] if chaves else []
+    
+    if not estado.mudou_desde(desde, *selecionadas):
+        return {"versao": estado.versao, "alterado": False}
+    
+    dados = estado.dados
+    if selecionadas:
+        dados = {chave: dados[chave] for chave in selecionadas if chave in dados}
+    return {"versao": estado.versao, "alterado": True, "estado": dados}
+
+@app.get("/api/historico")
+async def obter_historico(desde: float = 0, limite: Optional[int] = None,
+                          campos: Optional[str] = None):
+    """
+    Retorna o histórico recente de métricas (mais antigo primeiro).
+    
+    Args:
+        desde: Apenas pontos posteriores a este epoch
+        limite: Máximo de pontos
+        campos: Lista separada por vírgulas (ex: "cpu,rx,interfaces")
+    """
+    selecionados = [c.strip() for c in campos.split(",") if c.strip()] if campos else []
+    pontos = HISTORICO.consultar(desde, limite, selecionados)
+    return {"capacidade": HISTORICO.capacidade, "total": len(pontos), "pontos": pontos}
+
+@app.get("/api/sla")
+async def obter_sla(periodo: str = "mes", inicio: Optional[float] = None,
+                    fim: Optional[float] = None, filtro: Optional[str] = None):
+    """
+    Disponibilidade, MTTR/MTBF e cumprimento dos SLOs de latência e perda
+    por alvo WAN e por provedor.
+    
+    Args:
+        periodo: "24h", "7d", "30d", "dia", "semana", "mes", "mes_anterior", "ano"
+        inicio, fim: Período explícito em epoch (substitui `periodo`)
+        filtro: Trecho do nome da série (ex: "provedor/", "Google")
+    """
+    try:
+        inicio_periodo, fim_periodo = periodo_sla(periodo)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    inicio_periodo = inicio if inicio is not None else inicio_periodo
+    fim_periodo = fim if fim is not None else fim_periodo
+    
+    if PAPEL_PROCESSO == "leitor" and CONFIG["SLA_ARQUIVO"]:
+        # Workers não coletam: leem o que o coletor persistiu
+        await asyncio.to_thread(SLA.carregar, CONFIG["SLA_ARQUIVO"])
+    
+    return {
+        "inicio": datetime.fromtimestamp(inicio_periodo).isoformat(timespec="seconds"),
+        "fim": datetime.fromtimestamp(fim_periodo).isoformat(timespec="seconds"),
+        "meta_pct": CONFIG["SLA_META"],
+        "series": await asyncio.to_thread(SLA.consultar, inicio_periodo, fim_periodo, filtro),
+    }
+
+@app.get("/api/export")
+async def exportar(tipo: str = "historico", formato: str = "csv", inicio: Optional[str] = None,
+                   fim: Optional[str] = None, colunas: Optional[str] = None,
+                   alvos: Optional[str] = None, compactar: bool = False):
+    """
+    Exporta histórico ou eventos persistidos em streaming (memória constante).
+    
+    Args:
+        tipo: "historico" ou "eventos"
+        formato: "csv", "jsonl" ou "parquet" (requer pyarrow)
+        inicio, fim: Epoch ou ISO 8601 (padrão: últimas 24 h)
+        colunas: Padrões separados por vírgula (ex: "cpu,ram,wan/*/latencia_ms")
+        alvos: Alvos WAN separados por vírgula (filtra colunas wan/ e eventos)
+        compactar: Comprime a resposta em gzip (arquivo .gz)
+    """
+    if tipo not in ArquivosDiarios.TIPOS:
+        raise HTTPException(status_code=400, detail=f"Tipo inválido: {tipo}")
+    if formato not in FORMATOS_EXPORTACAO:
+        raise HTTPException(status_code=400, detail=f"Formato inválido: {formato}")
+    if formato == "parquet" and not await asyncio.to_thread(lambda: DEPENDENCIAS["pyarrow"].disponivel):
+        raise HTTPException(status_code=501, detail="Parquet indisponível. Instale com: pip install pyarrow")
+    if not CONFIG["PERSISTENCIA_DIR"]:
+        raise HTTPException(status_code=404, detail="Persistência desativada (PERSISTENCIA_DIR)")
+    
+    agora = time.time()
+    try:
+        fim_periodo = interpretar_instante(fim, agora)
+        inicio_periodo = interpretar_instante(inicio, fim_periodo - 86400)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Data inválida: {e}")
+    
+    lista_alvos = [a.strip() for a in alvos.split(",") if a.strip()] if alvos else []
+    padroes = [c.strip() for c in colunas.split(",") if c.strip()] if colunas else []
+    todas = await asyncio.to_thread(colunas_padrao, tipo, inicio_periodo, fim_periodo)
+    selecionadas = filtrar_colunas(todas, padroes, lista_alvos if tipo == "historico" else [])
+    
+    gerador, tipo_midia = FORMATOS_EXPORTACAO[formato]
+    blocos = gerador(linhas_exportacao(tipo, inicio_periodo, fim_periodo, lista_alvos), selecionadas)
+    nome = (f"noc_{tipo}_{datetime.fromtimestamp(inicio_periodo):%Y%m%d%H%M}"
+            f"_{datetime.fromtimestamp(fim_periodo):%Y%m%d%H%M}.{formato}")
+    if compactar:
+        blocos = comprimir_gzip(blocos)
+        nome += ".gz"
+        tipo_midia = "application/gzip"
+    
+    return StreamingResponse(blocos, media_type=tipo_midia,
+                             headers={"Content-Disposition": f'attachment; filename="{nome}"'})
+
+@app.get("/api/debug/perf")
+async def obter_perf(detalhado: bool = True):
+    """
+    Retorna as medições internas (coletores, loop, ticks e clientes).
+    
+    Com vários workers, cada processo mede só o próprio trabalho: o worker
+    que atende a requisição informa o broadcast e os seus clientes ("processo"
+    identifica qual); coleta e ticks ficam no coletor, que os escreve no log
+    a cada PERF_LOG_INTERVALO segundos.
+    """
+    return {**PERF.resumo(detalhado=detalhado), "inicializacao": TEMPOS_INICIALIZACAO,
+            "processo": {"papel": PAPEL_PROCESSO, "pid": os.getpid()}}
+
+@app.post("/api/debug/perf")
+async def configurar_perf(habilitado: Optional[bool] = None, reiniciar: bool = False):
+    """
+    Liga/desliga a instrumentação em tempo de execução ou zera as medições
+    (em todos os processos, quando há vários workers).
+    """
+    segmento = MEMORIA or MEMORIA_LEITURA
+    if segmento is not None:
+        segmento.controlar_perf(habilitado, reiniciar)
+        segmento.aplicar_controle_perf()  # Os demais processos aplicam no próximo ciclo
+    else:
+        if habilitado is not None:
+            PERF.habilitado = habilitado
+        if reiniciar:
+            PERF.reiniciar()
+    if habilitado is not None:
+        logger.info(f"📊 Instrumentação {'habilitada' if habilitado else 'desabilitada'}")
+    return {"habilitado": PERF.habilitado}
+
+@app.websocket("/ws")
+async def ws_endpoint(ws: WebSocket):
+    """
+    WebSocket para streaming de dados em tempo real.
+    
+    O cliente pode enviar {"assinar": {"delta": true, "alvos": [...]}} a
+    qualquer momento para passar a receber diferenças ({"delta": ...}) e/ou
+    só alguns alvos WAN; o quadro seguinte é sempre completo. Com
+    "historico": true, antes dele vem {"historico": ...} com os últimos
+    SPARKLINE_MINUTOS em float32/base64 (HistoricoMetricas.compacto).
+    """
+    await ws.accept()
+    logger.info("📡 Novo cliente WebSocket conectado")
+    endereco = f"{ws.client.host}:{ws.client.port}" if ws.client else "desconhecido"
+    cliente_id = PERF.registrar_cliente(endereco)
+    fila = HUB.conectar(cliente_id)
+    assinatura = AssinaturaCliente()
+    
+    async def receber_mensagens():
+        try:
+            while True:
+                mensagem = await ws.receive_text()
+                if assinatura.atualizar(mensagem):
+                    HUB.assinar_delta(cliente_id, assinatura.delta)
+                    HUB.reenviar(cliente_id)
+                else:
+                    logger.debug(f"Mensagem WebSocket ignorada de {endereco}: {mensagem[:100]}")
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.debug(f"Recepção WebSocket encerrada ({endereco}): {e}")
+        HUB.interromper(cliente_id)
+    
+    recepcao = asyncio.create_task(receber_mensagens())
+    
+    try:
+        while True:
+            quadro = await fila.get()
+            if quadro is None:
+                break  # Cliente desconectou
+            
+            if assinatura.historico_pendente:
+                assinatura.historico_pendente = False
+                with PERF.medir("historico_compacto"):
+                    historico = await asyncio.to_thread(
+                        HISTORICO.compacto, CONFIG["SPARKLINE_MINUTOS"] * 60,
+                        CONFIG["SPARKLINE_PONTOS"], assinatura.alvos)
+                await ws.send_text(json.dumps({"historico": historico}, ensure_ascii=False,
+                                              separators=(",", ":")))
+            
+            texto = assinatura.codificar(quadro)
+            
+            inicio_envio = time.perf_counter()
+            await ws.send_text(texto)
+            if PERF.habilitado:
+                PERF.registrar_envio(
+                    cliente_id,
+                    (time.perf_counter() - inicio_envio) * 1000,
+                    len(texto.encode("utf-8"))
+                )
+    
+    except WebSocketDisconnect:
+        pass
+    
+    except Exception as e:
+        logger.error(f"❌ Erro WebSocket: {e}")
+    
+    finally:
+        recepcao.cancel()
+        HUB.desconectar(cliente_id)
+        PERF.remover_cliente(cliente_id)
+        logger.info("📡 Cliente WebSocket desconectado")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 10. CONTEÚDO HTML DO DASHBOARD
+# ═══════════════════════════════════════════════════════════════════════════
+
+CONTEUDO_CSS = r"""
+:root {
+    --bg: #020617;
+    --card: #0f172a;
+    --border: #1e293b;
+    --text: #f8fafc;
+    --dim: #94a3b8;
+    --blue: #38bdf8;
+    --green: #4ade80;
+    --warn: #facc15;
+    --danger: #ef4444;
+    --purple: #a855f7;
+    --sans: 'Inter', system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif;
+    --mono: 'JetBrains Mono', ui-monospace, Consolas, 'DejaVu Sans Mono', monospace;
+}
+
+* {
+    box-sizing: border-box;
+    margin: 0;
+    padding: 0;
+}
+
+body {
+    font-family: var(--sans);
+    background: var(--bg);
+    color: var(--text);
+    height: 100vh;
+    overflow: hidden;
+    padding: 10px;
+}
+
+.container {
+    display: grid;
+    grid-template-columns: 350px 1fr 400px;
+    grid-template-rows: 60px 1fr 180px;
+    gap: 12px;
+    height: 100%;
+}
+
+.header {
+    grid-column: 1 / -1;
+    background: var(--card);
+    border: 1px solid var(--border);
+    border-radius: 10px;
+    padding: 15px;
+    display: flex;
+    align-items: center;
+    justify-content: space-between;
+}
+
+.logo {
+    font-size: 1.5rem;
+    font-weight: 900;
+    color: var(--blue);
+    letter-spacing: -0.5px;
+}
+
+.kpi-bar {
+    display: flex;
+    gap: 12px;
+    align-items: center;
+}
+
+.kpi-chip {
+    background: var(--card);
+    padding: 8px 16px;
+    border-radius: 999px;
+    border: 1px solid var(--border);
+    display: flex;
+    gap: 8px;
+    align-items: center;
+    font-size: 0.85rem;
+}
+
+.box {
+    background: var(--card);
+    border: 1px solid var(--border);
+    border-radius: 10px;
+    padding: 15px;
+    display: flex;
+    flex-direction: column;
+}
+
+.box-title {
+    font-size: 0.75rem;
+    font-weight: 700;
+    color: var(--dim);
+    text-transform: uppercase;
+    letter-spacing: 1px;
+    margin-bottom: 12px;
+}
+
+.metric {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    padding: 8px 0;
+    border-bottom: 1px solid rgba(148,163,184,0.15);
+}
+
+.metric:last-child {
+    border-bottom: none;
+}
+
+.metric-label {
+    font-size: 0.8rem;
+    color: var(--dim);
+}
+
+.metric-value {
+    font-family: var(--mono);
+    font-weight: 700;
+    color: var(--text);
+}
+
+.progress-bar {
+    background: rgba(15,23,42,0.9);
+    height: 6px;
+    border-radius: 999px;
+    overflow: hidden;
+    margin-top: 4px;
+}
+
+.progress-fill {
+    height: 100%;
+    transition: width 0.3s ease;
+}
+
+.sparkline {
+    display: block;
+    width: 100%;
+    height: 28px;
+    margin-top: 4px;
+}
+
+.sparkline-wan {
+    flex: 1;
+    min-width: 40px;
+    max-width: 120px;
+    height: 18px;
+    margin: 0 8px;
+}
+
+.status-badge {
+    display: inline-block;
+    padding: 4px 10px;
+    border-radius: 999px;
+    font-size: 0.7rem;
+    font-weight: 700;
+}
+
+.status-ok {
+    background: rgba(74,222,128,0.15);
+    color: var(--green);
+}
+
+.status-warn {
+    background: rgba(250,204,21,0.15);
+    color: var(--warn);
+}
+
+.status-danger {
+    background: rgba(239,68,68,0.15);
+    color: var(--danger);
+}
+
+.col-left {
+    grid-row: 2 / -1;
+    display: flex;
+    flex-direction: column;
+    gap: 12px;
+}
+
+.col-center {
+    grid-row: 2 / 3;
+    display: flex;
+    flex-direction: column;
+    gap: 12px;
+}
+
+.col-right {
+    grid-row: 2 / -1;
+    display: flex;
+    flex-direction: column;
+    gap: 12px;
+}
+
+.footer {
+    grid-column: 2 / 3;
+    grid-row: 3 / 4;
+    display: grid;
+    grid-template-columns: 1fr 1fr 1fr;
+    gap: 12px;
+}
+
+.alert-modal {
+    position: fixed;
+    inset: 0;
+    background: rgba(15,23,42,0.96);
+    z-index: 999;
+    display: none;
+    align-items: center;
+    justify-content: center;
+    flex-direction: column;
+    border: 3px solid var(--danger);
+}
+
+.alert-modal.active {
+    display: flex;
+}
+
+.alert-title {
+    font-size: 3rem;
+    color: var(--danger);
+    margin-bottom: 20px;
+    font-weight: 900;
+}
+
+.alert-message {
+    font-family: var(--mono);
+    font-size: 1.5rem;
+    color: var(--text);
+    margin-bottom: 30px;
+}
+
+.btn-acknowledge {
+    padding: 12px 32px;
+    font-weight: bold;
+    cursor: pointer;
+    border-radius: 999px;
+    border: none;
+    background: var(--danger);
+    color: white;
+    font-size: 1rem;
+}
+"""
+
+CONTEUDO_JS = r"""
+"use strict";
+
+// Renderização incremental: o estado recebido (completo ou por deltas) é
+// aplicado a cada mensagem, mas o DOM só é tocado uma vez por quadro de
+// animação e apenas nos campos que mudaram. Com a aba oculta, no máximo
+// um render a cada INTERVALO_OCULTO_MS.
+const INTERVALO_OCULTO_MS = 5000;
+const RECONEXAO_MAX_MS = 10000;
+// Pontos por série: SPARKLINE_MINUTOS na cadência de rajada (preenchido ao montar)
+const SPARKLINE_CAPACIDADE = {{sparkline_capacidade}};
+
+let estado = null;
+let agendado = false;
+let ultimoRender = 0;
+let alertaExibido = "";
+let reconexaoMs = 500;
+
+// ─── Escritas no DOM só quando o valor muda ───────────────────────────────
+
+const elementos = new Map();
+const escritos = new Map();
+
+function el(id) {
+    let elemento = elementos.get(id);
+    if (!elemento) {
+        elemento = document.getElementById(id);
+        elementos.set(id, elemento);
+    }
+    return elemento;
+}
 
-@app.get("/")
-async def index():
-    """Retorna o dashboard HTML."""
-    return HTMLResponse(CONTEUDO_HTML)
+function texto(id, valor) {
+    if (escritos.get(id) !== valor) {
+        escritos.set(id, valor);
+        el(id).textContent = valor;
+    }
+}
 
-@app.get("/api/status")
-async def obter_status():
-    """Retorna status atual do sistema."""
-    return {
-        "sistema": "NOC Commander v12",
-        "status": "Operacional",
-        "timestamp": datetime.now().isoformat(),
-        "eventos_totais": len(ESTADO["eventos"]),
-        "alertas_totais": len(ESTADO["alertas"]),
+function largura(id, valor) {
+    const chave = id + "|width";
+    if (escritos.get(chave) !== valor) {
+        escritos.set(chave, valor);
+        el(id).style.width = valor;
     }
+}
 
-@app.websocket("/ws")
-async def ws_endpoint(ws: WebSocket):
-    """WebSocket para streaming de dados em tempo real."""
-    await ws.accept()
-    logger.info("📡 Novo cliente WebSocket conectado")
-    
-    ultima_io = psutil.net_io_counters()
-    ultimo_tempo = time.time()
-    
-    try:
-        while True:
-            # Coletar métricas locais
-            cpu = psutil.cpu_percent(interval=0.1)
-            ram = psutil.virtual_memory()
-            caminho_disco = "C:" if os.name == "nt" else "/"
-            disco = psutil.disk_usage(caminho_disco)
-            
-            ultima_io, ultimo_tempo, rx, tx = obter_velocidade_rede(ultima_io, ultimo_tempo)
-            gpu = obter_dados_gpu()
-            
-            # Coletar dados WAN
-            wan = obter_dados_wan_reais()
-            
-            # Calcular uptime
-            segundos_uptime = int(time.time() - ESTADO["uptime_inicio"])
-            uptime_formatado = formatar_tempo_decorrido(segundos_uptime)
-            
-            # Lógica de alertas
-            alerta_ativo = False
-            mensagem_alerta = ""
-            
-            # Verificar limites
-            if cpu >= LIMITES["cpu"]:
-                alerta_ativo = True
-                mensagem_alerta = f"CPU CRÍTICA: {cpu}%"
-                ESTADO["contadores_alertas"]["critico"] += 1
-            
-            elif ram.percent >= LIMITES["ram"]:
-                alerta_ativo = True
-                mensagem_alerta = f"RAM CRÍTICA: {ram.percent}%"
-                ESTADO["contadores_alertas"]["critico"] += 1
-            
-            # Verificar WAN
-            links_down = sum(1 for w in wan if w["status"] == "DOWN")
-            if links_down >= 2:
-                alerta_ativo = True
-                mensagem_alerta = f"WAN CRÍTICA: {links_down} links desconectados"
-                ESTADO["contadores_alertas"]["critico"] += 1
-            
-            # Enviar alerta se necessário
-            wpp_enviado = False
-            if alerta_ativo:
-                wpp_enviado = await enviar_whatsapp(mensagem_alerta)
-                registrar_evento(
-                    tipo="ALERTA",
-                    severidade="CRÍTICO",
-                    mensagem=mensagem_alerta,
-                    componente="Sistema"
-                )
-            
-            # Atualizar máximos
-            ESTADO["metricas_acumuladas"]["cpu_max"] = max(
-                ESTADO["metricas_acumuladas"]["cpu_max"], cpu
-            )
-            ESTADO["metricas_acumuladas"]["ram_max"] = max(
-                ESTADO["metricas_acumuladas"]["ram_max"], ram.percent
-            )
-            
-            # Preparar payload
-            payload = {
-                "timestamp": datetime.now().strftime("%H:%M:%S"),
-                "local": {
-                    "info": obter_info_host(),
-                    "metricas": {
-                        "cpu": round(cpu, 1),
-                        "ram": round(ram.percent, 1),
-                        "disco": round(disco.percent, 1),
-                        "rx": formatar_bytes(rx),
-                        "tx": formatar_bytes(tx),
-                    },
-                    "gpu": gpu,
-                },
-                "velocidade": ESTADO["velocidade"],
-                "testando": ESTADO["testando"],
-                "wan": wan,
-                "uptime": uptime_formatado,
-                "alerta": {
-                    "ativo": alerta_ativo,
-                    "mensagem": mensagem_alerta,
-                    "whatsapp_enviado": wpp_enviado
-                },
-                "contadores": ESTADO["contadores_alertas"],
-            }
-            
-            await ws.send_json(payload)
-            await asyncio.sleep(CONFIG["COLETA_INTERVALO"])
-    
-    except Exception as e:
-        logger.error(f"❌ Erro WebSocket: {e}")
-    
-    finally:
-        logger.info("📡 Cliente WebSocket desconectado")
+// ─── Séries das sparklines (buffers circulares tipados) ────────────────────
 
-# ═══════════════════════════════════════════════════════════════════════════
-# 10. CONTEÚDO HTML DO DASHBOARD
-# ═══════════════════════════════════════════════════════════════════════════
+class Serie {
+    constructor(capacidade) {
+        this.t = new Float64Array(capacidade);
+        this.v = new Float32Array(capacidade);
+        this.inicio = 0;
+        this.tamanho = 0;
+        this.versao = 0;  // Muda a cada ponto: o canvas só redesenha quando muda
+    }
 
-CONTEUDO_HTML = r"""
-<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>NOC Commander v12 - Dashboard de Monitoramento</title>
-    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;800&family=JetBrains+Mono:wght@500;700&display=swap" rel="stylesheet">
-    <style>
-        :root {
-            --bg: #020617;
-            --card: #0f172a;
-            --border: #1e293b;
-            --text: #f8fafc;
-            --dim: #94a3b8;
-            --blue: #38bdf8;
-            --green: #4ade80;
-            --warn: #facc15;
-            --danger: #ef4444;
-            --purple: #a855f7;
-        }
-        
-        * {
-            box-sizing: border-box;
-            margin: 0;
-            padding: 0;
-        }
-        
-        body {
-            font-family: 'Inter', system-ui, sans-serif;
-            background: var(--bg);
-            color: var(--text);
-            height: 100vh;
-            overflow: hidden;
-            padding: 10px;
-        }
-        
-        .container {
-            display: grid;
-            grid-template-columns: 350px 1fr 400px;
-            grid-template-rows: 60px 1fr 180px;
-            gap: 12px;
-            height: 100%;
-        }
-        
-        .header {
-            grid-column: 1 / -1;
-            background: var(--card);
-            border: 1px solid var(--border);
-            border-radius: 10px;
-            padding: 15px;
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-        }
-        
-        .logo {
-            font-size: 1.5rem;
-            font-weight: 900;
-            color: var(--blue);
-            letter-spacing: -0.5px;
-        }
-        
-        .kpi-bar {
-            display: flex;
-            gap: 12px;
-            align-items: center;
-        }
-        
-        .kpi-chip {
-            background: var(--card);
-            padding: 8px 16px;
-            border-radius: 999px;
-            border: 1px solid var(--border);
-            display: flex;
-            gap: 8px;
-            align-items: center;
-            font-size: 0.85rem;
-        }
-        
-        .box {
-            background: var(--card);
-            border: 1px solid var(--border);
-            border-radius: 10px;
-            padding: 15px;
-            display: flex;
-            flex-direction: column;
-        }
-        
-        .box-title {
-            font-size: 0.75rem;
-            font-weight: 700;
-            color: var(--dim);
-            text-transform: uppercase;
-            letter-spacing: 1px;
-            margin-bottom: 12px;
-        }
-        
-        .metric {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 8px 0;
-            border-bottom: 1px solid rgba(148,163,184,0.15);
-        }
-        
-        .metric:last-child {
-            border-bottom: none;
-        }
-        
-        .metric-label {
-            font-size: 0.8rem;
-            color: var(--dim);
-        }
-        
-        .metric-value {
-            font-family: 'JetBrains Mono';
-            font-weight: 700;
-            color: var(--text);
-        }
-        
-        .progress-bar {
-            background: rgba(15,23,42,0.9);
-            height: 6px;
-            border-radius: 999px;
-            overflow: hidden;
-            margin-top: 4px;
-        }
-        
-        .progress-fill {
-            height: 100%;
-            transition: width 0.3s ease;
+    ultimoT() {
+        return this.tamanho ? this.t[(this.inicio + this.tamanho - 1) % this.t.length] : -Infinity;
+    }
+
+    adicionar(t, valor) {
+        if (t <= this.ultimoT()) {
+            return;
         }
-        
-        .status-badge {
-            display: inline-block;
-            padding: 4px 10px;
-            border-radius: 999px;
-            font-size: 0.7rem;
-            font-weight: 700;
+        const capacidade = this.t.length;
+        const i = (this.inicio + this.tamanho) % capacidade;
+        this.t[i] = t;
+        this.v[i] = valor == null ? NaN : valor;
+        if (this.tamanho < capacidade) {
+            this.tamanho++;
+        } else {
+            this.inicio = (this.inicio + 1) % capacidade;
         }
-        
-        .status-ok {
-            background: rgba(74,222,128,0.15);
-            color: var(--green);
+        this.versao++;
+    }
+
+    percorrer(desde, funcao) {
+        const capacidade = this.t.length;
+        for (let k = 0; k < this.tamanho; k++) {
+            const i = (this.inicio + k) % capacidade;
+            if (this.t[i] >= desde) {
+                funcao(this.t[i], this.v[i]);
+            }
         }
-        
-        .status-warn {
-            background: rgba(250,204,21,0.15);
-            color: var(--warn);
+    }
+
+    maximo(desde) {
+        let maximo = 0;
+        this.percorrer(desde, (t, valor) => {
+            if (valor > maximo) {
+                maximo = valor;
+            }
+        });
+        return maximo;
+    }
+}
+
+const series = new Map();  // "cpu", "ram", "rx", "tx", "latencia/<alvo>" → Serie
+let janelaSegundos = 600;
+let tempoAtual = 0;
+
+function serie(nome) {
+    let encontrada = series.get(nome);
+    if (!encontrada) {
+        encontrada = new Serie(SPARKLINE_CAPACIDADE);
+        series.set(nome, encontrada);
+    }
+    return encontrada;
+}
+
+function decodificarFloat32(base64) {
+    const binario = atob(base64);
+    const bytes = new Uint8Array(binario.length);
+    for (let i = 0; i < binario.length; i++) {
+        bytes[i] = binario.charCodeAt(i);
+    }
+    return new Float32Array(bytes.buffer);
+}
+
+function aplicarHistorico(historico) {
+    janelaSegundos = historico.segundos;
+    if (historico.t0 === null) {
+        return;
+    }
+    const offsets = decodificarFloat32(historico.t);
+    for (const nome in historico.series) {
+        const valores = decodificarFloat32(historico.series[nome]);
+        const anterior = series.get(nome);
+        const nova = new Serie(SPARKLINE_CAPACIDADE);
+        for (let i = 0; i < offsets.length; i++) {
+            nova.adicionar(historico.t0 + offsets[i], valores[i]);
         }
-        
-        .status-danger {
-            background: rgba(239,68,68,0.15);
-            color: var(--danger);
+        // Pontos ao vivo que chegaram antes do histórico
+        if (anterior) {
+            anterior.percorrer(nova.ultimoT() + 1e-3, (t, valor) => nova.adicionar(t, valor));
         }
-        
-        .col-left {
-            grid-row: 2 / -1;
-            display: flex;
-            flex-direction: column;
-            gap: 12px;
+        series.set(nome, nova);
+    }
+}
+
+function registrarPontos(dados) {
+    const t = dados.t;
+    if (!(t > tempoAtual)) {
+        return;
+    }
+    tempoAtual = t;
+    const metricas = dados.local.metricas;
+    serie("cpu").adicionar(t, metricas.cpu);
+    serie("ram").adicionar(t, metricas.ram);
+    serie("rx").adicionar(t, metricas.rx_bs);
+    serie("tx").adicionar(t, metricas.tx_bs);
+    for (const w of dados.wan) {
+        serie("latencia/" + w.nome).adicionar(t, w.status === "UP" ? w.latencia_ms : null);
+    }
+}
+
+let cores = null;
+
+// Tamanho de cada canvas (px CSS) vindo do ResizeObserver: desenhar nunca
+// lê o layout, então não força reflow entre as escritas no DOM.
+const tamanhos = new WeakMap();
+const desenhados = new WeakMap();  // canvas → assinatura do último desenho
+const observador = new ResizeObserver(entradas => {
+    for (const entrada of entradas) {
+        tamanhos.set(entrada.target, entrada.contentRect);
+        desenhados.delete(entrada.target);
+    }
+    agendar();
+});
+
+function observar(canvas) {
+    if (!tamanhos.has(canvas)) {
+        tamanhos.set(canvas, null);  // Tamanho chega no callback, após o layout
+        observador.observe(canvas);
+    }
+}
+
+// escalaFixa: máximo do eixo (0 = maior valor visível); cor: índice inicial em `cores`.
+// Só redesenha quando alguma série ganhou ponto, a janela ou o tamanho mudou.
+function desenharSparkline(canvas, nomes, escalaFixa, cor) {
+    observar(canvas);
+    const tamanho = tamanhos.get(canvas);
+    const dpr = window.devicePixelRatio || 1;
+    const largura = tamanho ? Math.round(tamanho.width * dpr) : 0;
+    const altura = tamanho ? Math.round(tamanho.height * dpr) : 0;
+    if (!largura || !altura) {
+        return;
+    }
+    const lista = nomes.map(nome => series.get(nome)).filter(Boolean);
+    const assinatura = [largura, altura, janelaSegundos].concat(lista, lista.map(s => s.versao));
+    const anterior = desenhados.get(canvas);
+    if (anterior && anterior.length === assinatura.length && anterior.every((v, i) => v === assinatura[i])) {
+        return;
+    }
+    desenhados.set(canvas, assinatura);
+
+    if (cores === null) {
+        const estilo = getComputedStyle(document.documentElement);
+        cores = ["--blue", "--purple", "--green", "--warn"].map(v => estilo.getPropertyValue(v).trim());
+    }
+    if (canvas.width !== largura || canvas.height !== altura) {
+        canvas.width = largura;
+        canvas.height = altura;
+    }
+    const ctx = canvas.getContext("2d");
+    ctx.clearRect(0, 0, largura, altura);
+
+    // A janela termina no ponto mais recente das próprias séries
+    const fim = Math.max(...lista.map(s => s.ultimoT()), -Infinity);
+    const inicio = (Number.isFinite(fim) ? fim : tempoAtual) - janelaSegundos;
+    let maximo = escalaFixa || 0;
+    if (!escalaFixa) {
+        for (const s of lista) {
+            maximo = Math.max(maximo, s.maximo(inicio));
         }
-        
-        .col-center {
-            grid-row: 2 / 3;
-            display: flex;
-            flex-direction: column;
-            gap: 12px;
+    }
+    if (!(maximo > 0)) {
+        maximo = 1;
+    }
+
+    ctx.lineWidth = dpr;
+    lista.forEach((s, indice) => {
+        ctx.strokeStyle = cores[(cor + indice) % cores.length];
+        ctx.beginPath();
+        let desenhando = false;
+        s.percorrer(inicio, (t, valor) => {
+            if (Number.isNaN(valor)) {
+                desenhando = false;  // Lacuna (ex: alvo DOWN)
+                return;
+            }
+            const x = (t - inicio) / janelaSegundos * largura;
+            const y = altura - dpr - Math.min(valor / maximo, 1) * (altura - 2 * dpr);
+            if (desenhando) {
+                ctx.lineTo(x, y);
+            } else {
+                ctx.moveTo(x, y);
+                desenhando = true;
+            }
+        });
+        ctx.stroke();
+    });
+}
+
+// ─── Protocolo: quadros completos ou {"delta": ...} (JSON Merge Patch) ────
+
+function possui(objeto, chave) {
+    return Object.prototype.hasOwnProperty.call(objeto, chave);
+}
+
+function aplicarDelta(alvo, patch) {
+    if (patch === null || typeof patch !== "object" || Array.isArray(patch)) {
+        return patch;
+    }
+    if (possui(patch, "$por_nome") || possui(patch, "$ordem")) {
+        // Lista de itens identificados por "nome" (alvos WAN)
+        const anteriores = new Map((Array.isArray(alvo) ? alvo : []).map(item => [item.nome, item]));
+        const mudancas = patch["$por_nome"] || {};
+        const ordem = patch["$ordem"] || Array.from(anteriores.keys());
+        return ordem.map(nome => possui(mudancas, nome)
+            ? aplicarDelta(anteriores.get(nome), mudancas[nome])
+            : anteriores.get(nome));
+    }
+    // Subárvores sem mudança mantêm a identidade (o render as ignora)
+    const resultado = alvo && typeof alvo === "object" && !Array.isArray(alvo) ? Object.assign({}, alvo) : {};
+    for (const chave in patch) {
+        if (patch[chave] === null) {
+            delete resultado[chave];
+        } else {
+            resultado[chave] = aplicarDelta(resultado[chave], patch[chave]);
         }
-        
-        .col-right {
-            grid-row: 2 / -1;
-            display: flex;
-            flex-direction: column;
-            gap: 12px;
+    }
+    return resultado;
+}
+
+function conectar() {
+    const protocolo = location.protocol === "https:" ? "wss://" : "ws://";
+    const ws = new WebSocket(protocolo + location.host + "/ws");
+
+    ws.onopen = function() {
+        reconexaoMs = 500;
+        // ?alvos=A,B limita a lista WAN (telas com poucos recursos)
+        const alvos = new URLSearchParams(location.search).get("alvos");
+        ws.send(JSON.stringify({assinar: {
+            delta: true,
+            historico: true,
+            alvos: alvos ? alvos.split(",").map(alvo => alvo.trim()).filter(Boolean) : null,
+        }}));
+    };
+
+    ws.onmessage = function(event) {
+        const mensagem = JSON.parse(event.data);
+        if (possui(mensagem, "historico")) {
+            aplicarHistorico(mensagem.historico);
+            agendar();
+            return;
         }
-        
-        .footer {
-            grid-column: 2 / 3;
-            grid-row: 3 / 4;
-            display: grid;
-            grid-template-columns: 1fr 1fr 1fr;
-            gap: 12px;
+        if (possui(mensagem, "delta")) {
+            if (estado === null) {
+                return;  // Delta sem base: o servidor envia um quadro completo a seguir
+            }
+            estado = aplicarDelta(estado, mensagem.delta);
+        } else {
+            estado = mensagem;
         }
-        
-        .alert-modal {
-            position: fixed;
-            inset: 0;
-            background: rgba(15,23,42,0.96);
-            z-index: 999;
-            display: none;
-            align-items: center;
-            justify-content: center;
-            flex-direction: column;
-            border: 3px solid var(--danger);
+        registrarPontos(estado);
+        agendar();
+    };
+
+    ws.onclose = function() {
+        estado = null;
+        setTimeout(conectar, reconexaoMs);
+        reconexaoMs = Math.min(reconexaoMs * 2, RECONEXAO_MAX_MS);
+    };
+}
+
+// ─── Agendamento ──────────────────────────────────────────────────────────
+
+function agendar() {
+    if (agendado || estado === null) {
+        return;
+    }
+    agendado = true;
+    if (document.hidden) {
+        // requestAnimationFrame não roda em abas ocultas
+        const espera = Math.max(0, ultimoRender + INTERVALO_OCULTO_MS - performance.now());
+        setTimeout(renderizar, espera);
+    } else {
+        requestAnimationFrame(renderizar);
+    }
+}
+
+document.addEventListener("visibilitychange", function() {
+    if (!document.hidden && !agendado) {
+        agendar();
+    }
+});
+
+// ─── Render ───────────────────────────────────────────────────────────────
+
+const linhasWan = new Map();  // nome → {raiz, badge, dado, classe, texto}
+
+function renderizarWan(lista) {
+    const container = el("wan-list");
+    const vistos = new Set();
+    let anterior = null;
+    let ativos = 0;
+    const graficos = [];
+
+    for (const w of lista) {
+        vistos.add(w.nome);
+        if (w.status === "UP") {
+            ativos++;
         }
-        
-        .alert-modal.active {
-            display: flex;
+        let linha = linhasWan.get(w.nome);
+        if (!linha) {
+            const raiz = document.createElement("div");
+            raiz.className = "metric";
+            const rotulo = document.createElement("span");
+            rotulo.className = "metric-label";
+            rotulo.textContent = w.nome;
+            const grafico = document.createElement("canvas");
+            grafico.className = "sparkline-wan";
+            const badge = document.createElement("span");
+            raiz.append(rotulo, grafico, badge);
+            linha = {raiz: raiz, badge: badge, grafico: grafico, dado: null, classe: "", texto: ""};
+            linhasWan.set(w.nome, linha);
         }
-        
-        .alert-title {
-            font-size: 3rem;
-            color: var(--danger);
-            margin-bottom: 20px;
-            font-weight: 900;
+
+        if (linha.dado !== w) {
+            linha.dado = w;
+            const classe = "status-badge " + (w.status === "UP" ? "status-ok" : "status-danger");
+            if (linha.classe !== classe) {
+                linha.classe = classe;
+                linha.badge.className = classe;
+            }
+            const conteudo = w.status + " (" + w.latencia_ms + "ms)";
+            if (linha.texto !== conteudo) {
+                linha.texto = conteudo;
+                linha.badge.textContent = conteudo;
+            }
         }
-        
-        .alert-message {
-            font-family: 'JetBrains Mono';
-            font-size: 1.5rem;
-            color: var(--text);
-            margin-bottom: 30px;
+
+        graficos.push(linha);
+
+        // Só move o nó se ele não estiver logo após o anterior
+        const esperado = anterior ? anterior.nextSibling : container.firstChild;
+        if (esperado !== linha.raiz) {
+            container.insertBefore(linha.raiz, esperado);
         }
-        
-        .btn-acknowledge {
-            padding: 12px 32px;
-            font-weight: bold;
-            cursor: pointer;
-            border-radius: 999px;
-            border: none;
-            background: var(--danger);
-            color: white;
-            font-size: 1rem;
+        anterior = linha.raiz;
+    }
+
+    for (const [nome, linha] of linhasWan) {
+        if (!vistos.has(nome)) {
+            linha.raiz.remove();
+            linhasWan.delete(nome);
         }
-    </style>
+    }
+    texto("kpi-wan", ativos + "/" + lista.length);
+
+    // Depois das escritas no DOM; cada canvas só redesenha se a série mudou
+    for (const linha of graficos) {
+        desenharSparkline(linha.grafico, ["latencia/" + linha.dado.nome], 0, 2);
+    }
+}
+
+function renderizar() {
+    agendado = false;
+    ultimoRender = performance.now();
+    const dados = estado;
+    if (dados === null) {
+        return;
+    }
+    const metricas = dados.local.metricas;
+
+    // KPIs e métricas locais
+    texto("kpi-cpu", metricas.cpu + "%");
+    texto("kpi-ram", metricas.ram + "%");
+    texto("kpi-uptime", dados.uptime);
+    texto("local-info", dados.local.info.hostname + " (" + dados.local.info.ip + ")");
+    texto("local-cpu", metricas.cpu + "%");
+    largura("bar-cpu", metricas.cpu + "%");
+    texto("local-ram", metricas.ram + "%");
+    largura("bar-ram", metricas.ram + "%");
+    texto("local-disk", metricas.disco + "%");
+    largura("bar-disk", metricas.disco + "%");
+
+    // Velocidade
+    texto("speed-down", dados.velocidade.download + " Mbps");
+    texto("speed-up", dados.velocidade.upload + " Mbps");
+    texto("speed-ping", dados.velocidade.ping + " ms");
+    texto("speed-isp", dados.velocidade.isp);
+    texto("speed-status", dados.velocidade.status);
+
+    // Utilização passiva: menor janela (p95 por sentido)
+    const janela = dados.utilizacao && Object.values(dados.utilizacao.janelas)[0];
+    const uso = s => janela && janela[s] && janela[s].uso_p95_pct != null ? janela[s].uso_p95_pct + "%" : "--";
+    texto("speed-uso", "⬇ " + uso("download") + " ⬆ " + uso("upload"));
+
+    texto("local-rede", "⬇ " + metricas.rx + " ⬆ " + metricas.tx);
+    const tcp = dados.conexoes;
+    texto("local-tcp", tcp ? tcp.total + (tcp.parcial ? "+" : "") + " · TW " + (tcp.estados.TIME_WAIT || 0)
+        + (tcp.portas.length ? " · :" + tcp.portas[0].porta : "") : "--");
+
+    // Sparklines locais
+    desenharSparkline(el("spark-cpu"), ["cpu"], 100, 0);
+    desenharSparkline(el("spark-ram"), ["ram"], 100, 1);
+    desenharSparkline(el("spark-rede"), ["rx", "tx"], 0, 2);
+
+    // WAN
+    renderizarWan(dados.wan);
+
+    // Contadores
+    texto("alert-count", String(dados.contadores.critico));
+    texto("warn-count", String(dados.contadores.aviso));
+    texto("event-count", String(dados.contadores.info));
+
+    // Alerta: exibido quando surge ou muda de mensagem
+    const mensagem = dados.alerta && dados.alerta.ativo ? dados.alerta.mensagem : "";
+    if (mensagem && mensagem !== alertaExibido) {
+        texto("alertMessage", mensagem);
+        el("alertModal").classList.add("active");
+    }
+    alertaExibido = mensagem;
+}
+
+function fecharAlerta() {
+    el("alertModal").classList.remove("active");
+}
+
+conectar();
+"""
+
+# Página sem estilos/scripts embutidos: {{css}}, {{js}} e {{fontes}} são
+# substituídos pelos endereços com hash (RecursosEstaticos.montar)
+CONTEUDO_HTML = r"""
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>NOC Commander v12 - Dashboard de Monitoramento</title>
+{{fontes}}    <link rel="stylesheet" href="{{css}}">
 </head>
 <body>
     <div class="alert-modal" id="alertModal">
@@ -954,7 +5959,7 @@ CONTEUDO_HTML = r"""
                 </div>
                 <div class="kpi-chip">
                     <span style="color:var(--dim)">UPTIME</span>
-                    <span id="kpi-uptime" style="color:var(--text); font-weight:700; font-family:'JetBrains Mono'">--:--:--</span>
+                    <span id="kpi-uptime" style="color:var(--text); font-weight:700; font-family:var(--mono)">--:--:--</span>
                 </div>
             </div>
         </div>
@@ -971,6 +5976,7 @@ CONTEUDO_HTML = r"""
                 <div class="progress-bar">
                     <div class="progress-fill" id="bar-cpu" style="width:0%; background:var(--blue)"></div>
                 </div>
+                <canvas class="sparkline" id="spark-cpu"></canvas>
                 
                 <div class="metric" style="margin-top:10px">
                     <span class="metric-label">RAM</span>
@@ -979,6 +5985,7 @@ CONTEUDO_HTML = r"""
                 <div class="progress-bar">
                     <div class="progress-fill" id="bar-ram" style="width:0%; background:var(--purple)"></div>
                 </div>
+                <canvas class="sparkline" id="spark-ram"></canvas>
                 
                 <div class="metric" style="margin-top:10px">
                     <span class="metric-label">DISCO</span>
@@ -987,6 +5994,17 @@ CONTEUDO_HTML = r"""
                 <div class="progress-bar">
                     <div class="progress-fill" id="bar-disk" style="width:0%; background:var(--warn)"></div>
                 </div>
+                
+                <div class="metric" style="margin-top:10px">
+                    <span class="metric-label">REDE</span>
+                    <span class="metric-value" id="local-rede" style="font-size:0.75rem">--</span>
+                </div>
+                <canvas class="sparkline" id="spark-rede"></canvas>
+                
+                <div class="metric" style="margin-top:10px">
+                    <span class="metric-label">TCP</span>
+                    <span class="metric-value" id="local-tcp" style="font-size:0.75rem">--</span>
+                </div>
             </div>
         </div>
         
@@ -1020,6 +6038,10 @@ CONTEUDO_HTML = r"""
                     <span class="metric-label">Status</span>
                     <span class="status-badge status-ok" id="speed-status">Online</span>
                 </div>
+                <div class="metric">
+                    <span class="metric-label">Uso do link (p95)</span>
+                    <span class="metric-value" id="speed-uso">--</span>
+                </div>
             </div>
         </div>
         
@@ -1039,85 +6061,245 @@ CONTEUDO_HTML = r"""
         </div>
     </div>
     
-    <script>
-        const ws = new WebSocket("ws://localhost:8000/ws");
-        
-        ws.onmessage = function(event) {
-            const dados = JSON.parse(event.data);
-            
-            // Atualizar KPIs
-            document.getElementById("kpi-cpu").textContent = dados.local.metricas.cpu + "%";
-            document.getElementById("kpi-ram").textContent = dados.local.metricas.ram + "%";
-            document.getElementById("kpi-uptime").textContent = dados.uptime;
-            
-            // Atualizar métricas locais
-            document.getElementById("local-info").textContent = 
-                dados.local.info.hostname + " (" + dados.local.info.ip + ")";
-            document.getElementById("local-cpu").textContent = dados.local.metricas.cpu + "%";
-            document.getElementById("bar-cpu").style.width = dados.local.metricas.cpu + "%";
-            
-            document.getElementById("local-ram").textContent = dados.local.metricas.ram + "%";
-            document.getElementById("bar-ram").style.width = dados.local.metricas.ram + "%";
-            
-            document.getElementById("local-disk").textContent = dados.local.metricas.disco + "%";
-            document.getElementById("bar-disk").style.width = dados.local.metricas.disco + "%";
-            
-            // Atualizar velocidade
-            document.getElementById("speed-down").textContent = dados.velocidade.download + " Mbps";
-            document.getElementById("speed-up").textContent = dados.velocidade.upload + " Mbps";
-            document.getElementById("speed-ping").textContent = dados.velocidade.ping + " ms";
-            document.getElementById("speed-isp").textContent = dados.velocidade.isp;
-            document.getElementById("speed-status").textContent = dados.velocidade.status;
+    <script src="{{js}}" defer></script>
+</body>
+</html>
+"""
+
+# ═══════════════════════════════════════════════════════════════════════════
+# 10.1 RECURSOS ESTÁTICOS (HASH, PRÉ-COMPRESSÃO E CACHE)
+# ═══════════════════════════════════════════════════════════════════════════
+
+class Recurso(NamedTuple):
+    """Recurso do dashboard com as variantes comprimidas já prontas."""
+    tipo: str
+    hash: str
+    cache: str
+    variantes: Dict[str, bytes]  # "br", "gzip", "identity" → corpo
+
+# Extensão → (Content-Type, formato do @font-face)
+_TIPOS_FONTE = {
+    ".woff2": ("font/woff2", "woff2"),
+    ".woff": ("font/woff", "woff"),
+    ".ttf": ("font/ttf", "truetype"),
+    ".otf": ("font/otf", "opentype"),
+}
+
+class RecursosEstaticos:
+    """
+    Dashboard servido como recursos separados: página, CSS, JS e fontes.
+    
+    Tudo é montado uma vez na inicialização. CSS, JS e fontes levam um hash
+    do conteúdo no nome (/static/noc.<hash>.css) e são imutáveis por um
+    ano; a página, que aponta para esses nomes, é revalidada por ETag
+    (recarregar custa um 304). Texto é pré-comprimido com gzip e, se
+    disponível, brotli; a variante segue o Accept-Encoding do cliente.
+    
+    Fontes em FONTES_DIR viram @font-face locais: "Inter-600.woff2" é a
+    família Inter, peso 600; sem peso no nome, uma fonte variável. Sem
+    arquivos valem as fontes do sistema: nada é buscado na internet.
+    """
+    
+    IMUTAVEL = "public, max-age=31536000, immutable"
+    REVALIDAR = "no-cache"
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recursos: Optional[Dict[str, Recurso]] = None
+    
+    @staticmethod
+    def _comprimir(conteudo: bytes) -> Dict[str, bytes]:
+        variantes = {"identity": conteudo, "gzip": gzip.compress(conteudo, compresslevel=9, mtime=0)}
+        brotli = DEPENDENCIAS["brotli"].obter()
+        if brotli is not None:
+            variantes["br"] = brotli.compress(conteudo, quality=11)
+        return {codificacao: corpo for codificacao, corpo in variantes.items()
+                if codificacao == "identity" or len(corpo) < len(conteudo)}
+    
+    def _adicionar(self, recursos: Dict[str, Recurso], caminho: str, conteudo: bytes, tipo: str,
+                   comprimir: bool = True) -> str:
+        """
+        Args:
+            caminho: Ex: "/static/noc.css" (o hash entra antes da extensão); "/" = página
             
-            // Atualizar WAN
-            let wanHtml = "";
-            for (let w of dados.wan) {
-                let statusClass = w.status === "UP" ? "status-ok" : "status-danger";
-                wanHtml += `
-                    <div class="metric">
-                        <span class="metric-label">${w.nome}</span>
-                        <span class="status-badge ${statusClass}">${w.status} (${w.latencia_ms}ms)</span>
-                    </div>
-                `;
-            }
-            document.getElementById("wan-list").innerHTML = wanHtml;
+        Returns:
+            Caminho publicado
+        """
+        hash_conteudo = hashlib.sha256(conteudo).hexdigest()[:12]
+        cache = self.REVALIDAR
+        if caminho != "/":
+            base, extensao = os.path.splitext(caminho)
+            caminho, cache = f"{base}.{hash_conteudo}{extensao}", self.IMUTAVEL
+        variantes = self._comprimir(conteudo) if comprimir else {"identity": conteudo}
+        recursos[caminho] = Recurso(tipo, hash_conteudo, cache, variantes)
+        return caminho
+    
+    def _adicionar_fontes(self, recursos: Dict[str, Recurso]) -> Tuple[str, str]:
+        """
+        Returns:
+            Tupla (regras @font-face, links de preload da página)
+        """
+        diretorio = CONFIG["FONTES_DIR"]
+        if not diretorio:
+            return "", ""
+        if not os.path.isabs(diretorio):
+            diretorio = os.path.join(os.path.dirname(os.path.abspath(__file__)), diretorio)
+        try:
+            arquivos = sorted(os.listdir(diretorio))
+        except OSError:
+            return "", ""
+        
+        regras, preload = [], []
+        for arquivo in arquivos:
+            nome, extensao = os.path.splitext(arquivo)
+            if extensao.lower() not in _TIPOS_FONTE:
+                continue
+            tipo, formato = _TIPOS_FONTE[extensao.lower()]
+            with open(os.path.join(diretorio, arquivo), "rb") as f:
+                conteudo = f.read()
             
-            // Atualizar contadores
-            document.getElementById("alert-count").textContent = dados.contadores.critico;
-            document.getElementById("warn-count").textContent = dados.contadores.aviso;
-            document.getElementById("event-count").textContent = dados.contadores.info;
+            familia, _, peso = nome.rpartition("-")
+            if not (familia and peso.isdigit()):
+                familia, peso = nome, "100 900"
+            # woff/woff2 já são comprimidos
+            caminho = self._adicionar(recursos, f"/static/fontes/{nome}{extensao}", conteudo, tipo,
+                                      comprimir=formato in ("truetype", "opentype"))
+            regras.append(f'@font-face {{ font-family: "{familia}"; font-weight: {peso}; '
+                          f'font-display: swap; src: url("{caminho}") format("{formato}"); }}\n')
+            if formato == "woff2":
+                preload.append(f'    <link rel="preload" href="{caminho}" as="font" type="{tipo}" crossorigin>\n')
+        return "".join(regras), "".join(preload)
+    
+    def montar(self) -> Dict[str, Recurso]:
+        """Monta (uma única vez) e retorna os recursos por caminho."""
+        if self._recursos is not None:
+            return self._recursos
+        
+        with self._lock:
+            if self._recursos is None:
+                inicio = time.perf_counter()
+                recursos: Dict[str, Recurso] = {}
+                regras, preload = self._adicionar_fontes(recursos)
+                css = self._adicionar(recursos, "/static/noc.css", (regras + CONTEUDO_CSS).encode("utf-8"),
+                                      "text/css; charset=utf-8")
+                # Capacidade das sparklines: a janela inteira na cadência mais rápida (rajada)
+                capacidade = math.ceil(CONFIG["SPARKLINE_MINUTOS"] * 60
+                                       / min(CONFIG["COLETA_INTERVALO_RAJADA"], CONFIG["COLETA_INTERVALO"]))
+                conteudo_js = CONTEUDO_JS.replace("{{sparkline_capacidade}}", str(capacidade))
+                js = self._adicionar(recursos, "/static/noc.js", conteudo_js.encode("utf-8"),
+                                     "text/javascript; charset=utf-8")
+                pagina = (CONTEUDO_HTML.lstrip()
+                          .replace("{{fontes}}", preload)
+                          .replace("{{css}}", css)
+                          .replace("{{js}}", js))
+                self._adicionar(recursos, "/", pagina.encode("utf-8"), "text/html; charset=utf-8")
+                
+                TEMPOS_INICIALIZACAO["recursos_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+                logger.info(f"🗂️  Dashboard: {len(recursos)} recursos pré-comprimidos em "
+                            f"{TEMPOS_INICIALIZACAO['recursos_ms']:.0f} ms "
+                            f"(brotli: {'sim' if DEPENDENCIAS['brotli'].disponivel else 'não'})")
+                self._recursos = recursos
+        return self._recursos
+    
+    @staticmethod
+    def _negociar(aceitas: str, variantes: Dict[str, bytes]) -> str:
+        """Escolhe br, gzip ou identity a partir do Accept-Encoding (respeitando q=0)."""
+        pesos = {}
+        for item in aceitas.split(","):
+            nome, _, parametros = item.partition(";")
+            peso = 1.0
+            parametros = parametros.strip()
+            if parametros.startswith("q="):
+                try:
+                    peso = float(parametros[2:])
+                except ValueError:
+                    peso = 0.0
+            pesos[nome.strip().lower()] = peso
+        for codificacao in ("br", "gzip"):
+            if codificacao in variantes and pesos.get(codificacao, pesos.get("*", 0.0)) > 0:
+                return codificacao
+        return "identity"
+    
+    def responder(self, caminho: str, request: Request) -> Response:
+        """
+        Returns:
+            200 com a variante negociada, ou 304 se o ETag do cliente ainda vale
             
-            // Mostrar alerta se necessário
-            if (dados.alerta.ativo) {
-                document.getElementById("alertMessage").textContent = dados.alerta.mensagem;
-                document.getElementById("alertModal").classList.add("active");
-            }
-        };
+        Raises:
+            HTTPException: 404 para caminhos desconhecidos (ex: hash de versão antiga)
+        """
+        recurso = self.montar().get(caminho)
+        if recurso is None:
+            raise HTTPException(status_code=404, detail="Recurso não encontrado")
         
-        function fecharAlerta() {
-            document.getElementById("alertModal").classList.remove("active");
+        codificacao = self._negociar(request.headers.get("accept-encoding", ""), recurso.variantes)
+        sufixo = "" if codificacao == "identity" else f"-{codificacao}"
+        cabecalhos = {
+            "ETag": f'"{recurso.hash}{sufixo}"',
+            "Cache-Control": recurso.cache,
+            "Vary": "Accept-Encoding",
         }
-    </script>
-</body>
-</html>
-"""
+        
+        # Qualquer variante do mesmo conteúdo ainda vale
+        for etag in request.headers.get("if-none-match", "").split(","):
+            etag = etag.strip()
+            if etag.startswith("W/"):
+                etag = etag[2:]
+            if etag == "*" or etag.strip('"').split("-")[0] == recurso.hash:
+                return Response(status_code=304, headers=cabecalhos)
+        
+        if sufixo:
+            cabecalhos["Content-Encoding"] = codificacao
+        return Response(recurso.variantes[codificacao], media_type=recurso.tipo, headers=cabecalhos)
+
+RECURSOS = RecursosEstaticos()
+
+TEMPOS_INICIALIZACAO["importacao_ms"] = round((time.perf_counter() - _INICIO_IMPORTACAO) * 1000, 1)
 
 # ═══════════════════════════════════════════════════════════════════════════
 # 11. PONTO DE ENTRADA
 # ═══════════════════════════════════════════════════════════════════════════
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
     
+    parser = argparse.ArgumentParser(description="NOC Commander v12")
+    parser.add_argument("--gravar", metavar="ARQUIVO",
+                        help="Grava os snapshots coletados em ARQUIVO (.nocrec)")
+    parser.add_argument("--reproduzir", metavar="ARQUIVO",
+                        help="Reproduz uma gravação no lugar dos coletores")
+    parser.add_argument("--velocidade", type=float, default=CONFIG["REPRODUCAO_VELOCIDADE"],
+                        help="Velocidade da reprodução (1 = tempo real, 0 = sem espera)")
+    parser.add_argument("--repetir", action="store_true",
+                        help="Reinicia a reprodução ao chegar no fim")
+    parser.add_argument("--workers", type=int, default=CONFIG["WORKERS"],
+                        help="Workers uvicorn (>1 usa um processo coletor e memória compartilhada)")
+    parser.add_argument("--coletores", metavar="NOMES",
+                        help="Coletores de hardware separados por vírgula "
+                             f"({', '.join(COLETORES_HARDWARE)}); padrão: detecção automática")
+    args = parser.parse_args()
+    
+    CONFIG["GRAVACAO_ARQUIVO"] = args.gravar or CONFIG["GRAVACAO_ARQUIVO"]
+    CONFIG["REPRODUCAO_ARQUIVO"] = args.reproduzir or CONFIG["REPRODUCAO_ARQUIVO"]
+    CONFIG["REPRODUCAO_VELOCIDADE"] = args.velocidade
+    CONFIG["REPRODUCAO_REPETIR"] = args.repetir or CONFIG["REPRODUCAO_REPETIR"]
+    CONFIG["WORKERS"] = max(1, args.workers)
+    if args.coletores:
+        CONFIG["COLETORES"] = [nome.strip() for nome in args.coletores.split(",") if nome.strip()]
+    
     logger.info("=" * 80)
     logger.info("NOC COMMANDER v12.0 - INICIANDO SERVIDOR")
     logger.info("=" * 80)
     logger.info(f"🌐 Acesse: http://{CONFIG['HOST']}:{CONFIG['PORTA']}")
     logger.info("=" * 80)
     
-    uvicorn.run(
-        app,
-        host=CONFIG["HOST"],
-        port=CONFIG["PORTA"],
-        log_level="info"
-    )
+    if CONFIG["WORKERS"] > 1:
+        executar_multiprocesso()
+    else:
+        uvicorn.run(
+            app,
+            host=CONFIG["HOST"],
+            port=CONFIG["PORTA"],
+            log_level="info"
+        )
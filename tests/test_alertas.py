@@ -0,0 +1,51 @@
+"""
+Limites estáticos x linha de base: um incidente novo e sustentado não pode
+virar "habitual para o horário" só porque o perfil da hora amadureceu com
+o próprio incidente.
+"""
+
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import noc_commander_v12_melhorado as noc
+
+INICIO = datetime(2026, 3, 2, 14, 0)
+WAN = [{"nome": "A", "status": "UP"}]
+
+@pytest.fixture(params=["numpy", "listas"])
+def bases(request, monkeypatch):
+    if request.param == "listas":
+        monkeypatch.setattr(noc.DEPENDENCIAS["numpy"], "obter", lambda: None)
+    bases = noc.LinhasDeBase()
+    monkeypatch.setattr(noc, "BASES", bases)
+    monkeypatch.setattr(noc, "_ALERTAS_ATIVOS", {})
+    return bases
+
+def tick(bases, t: float, cpu: float):
+    bases.atualizar(["cpu", "ram", "temperatura_cpu"], [cpu, 40.0, math.nan], t)
+    return noc.avaliar_alertas(cpu, 40.0, WAN, t=t)
+
+def test_incidente_novo_continua_critico(bases):
+    t0 = INICIO.timestamp()
+    for segundo in range(900):
+        ativo, mensagem, _ = tick(bases, t0 + segundo, 96.0)
+        assert ativo, f"alerta rebaixado após {segundo}s"
+        assert "habitual" not in mensagem
+
+def test_limite_recorrente_na_mesma_hora_vira_aviso(bases):
+    for dia in range(noc.CONFIG["BASE_MIN_DIAS_HABITUAL"]):
+        t0 = (INICIO + timedelta(days=dia)).timestamp()
+        for segundo in range(0, 1200, 2):
+            tick(bases, t0 + segundo, 96.0)
+
+    t = (INICIO + timedelta(days=noc.CONFIG["BASE_MIN_DIAS_HABITUAL"])).timestamp()
+    noc._ALERTAS_ATIVOS.clear()
+    ativo, mensagem, novo = tick(bases, t, 96.0)
+    assert not ativo and not novo
+    assert noc._ALERTAS_ATIVOS["cpu"][0] == "AVISO"
@@ -0,0 +1,57 @@
+"""
+Cabeçalho da exportação: vem dos índices de colunas de ArquivosDiarios,
+sem ler os dados, e cobre alvos/NICs que sumiram no meio do período.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import noc_commander_v12_melhorado as noc
+
+ONTEM = (datetime.now() - timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0).timestamp()
+HOJE = ONTEM + 86400
+
+def ponto(t: float, alvos, nics) -> dict:
+    return {
+        "t": t, "cpu": 10.0, "ram": 20.0, "disco": 30.0, "rx": 1.0, "tx": 2.0, "temperatura_cpu": None,
+        "wan": {alvo: ["UP", 12.0, 0.0] for alvo in alvos},
+        "interfaces": {"nomes": list(nics), "campos": ["rx", "tx"], "valores": [[1, 2] for _ in nics]},
+    }
+
+@pytest.fixture
+def arquivos(tmp_path, monkeypatch):
+    arquivos = noc.ArquivosDiarios(str(tmp_path))
+    arquivos.ativo = True
+    monkeypatch.setattr(noc, "ARQUIVOS", arquivos)
+    return arquivos
+
+def test_cabecalho_sem_passada_pelos_dados(arquivos, monkeypatch):
+    arquivos.adicionar("historico", ponto(ONTEM, ["Antigo"], ["eth0"]))
+    arquivos.descarregar()
+    arquivos.adicionar("historico", ponto(HOJE, ["Novo"], ["eth1"]))  # Ainda no buffer
+    
+    def proibido(*args, **kwargs):
+        raise AssertionError("colunas_padrao leu os dados")
+    monkeypatch.setattr(arquivos, "ler", proibido)
+    
+    colunas = noc.colunas_padrao("historico", ONTEM - 60, HOJE + 60)
+    for coluna in ("wan/Antigo/latencia_ms", "wan/Novo/status", "interface/eth0/rx", "interface/eth1/tx"):
+        assert coluna in colunas
+    assert colunas[:2] == ["t", "data_hora"]
+
+def test_indice_sobrevive_ao_reinicio(arquivos, tmp_path):
+    arquivos.adicionar("historico", ponto(HOJE, ["A"], ["eth0"]))
+    arquivos.descarregar()
+    reiniciado = noc.ArquivosDiarios(str(tmp_path))
+    reiniciado.ativo = True
+    reiniciado.adicionar("historico", ponto(HOJE + 1, ["B"], ["eth0"]))
+    reiniciado.descarregar()
+    
+    colunas, completo = noc.ArquivosDiarios(str(tmp_path)).colunas(HOJE - 60, HOJE + 60)
+    assert completo
+    assert "wan/A/status" in colunas and "wan/B/status" in colunas
@@ -0,0 +1,50 @@
+"""
+FiltroRepeticoes: o total suprimido sai quando a janela expira, mesmo que
+a mensagem não volte, e não se perde ao descartar janelas por excesso.
+"""
+
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import noc_commander_v12_melhorado as noc
+
+def registro(mensagem: str, t: float) -> logging.LogRecord:
+    r = logging.LogRecord("teste", logging.WARNING, __file__, 1, mensagem, None, None)
+    r.created = t
+    return r
+
+def filtro(limite=2, janela=10.0):
+    emitidos = []
+    return noc.FiltroRepeticoes(limite, janela, emitidos.append), emitidos
+
+def test_resumo_no_proximo_registro_de_outra_chave():
+    f, emitidos = filtro()
+    aceitos = [f.filter(registro(f"CPU CRÍTICA: {90 + i}%", i * 0.1)) for i in range(5)]
+    assert aceitos == [True, True, False, False, False]
+    
+    assert f.filter(registro("outra coisa", 5.0)) and not emitidos
+    assert f.filter(registro("outra coisa", 11.0))
+    assert len(emitidos) == 1
+    assert emitidos[0].getMessage() == "CPU CRÍTICA: 94% (+3 repetições suprimidas em 10.0s)"
+    assert emitidos[0].levelno == logging.WARNING
+
+def test_descartar_por_excesso_de_chaves_preserva_totais(monkeypatch):
+    monkeypatch.setattr(noc.FiltroRepeticoes, "_MAX_CHAVES", 3)
+    f, emitidos = filtro(limite=1)
+    f.filter(registro("repetida", 0.0))
+    f.filter(registro("repetida", 0.1))
+    for i, letra in enumerate("abc"):
+        f.filter(registro(f"chave {letra}", 1.0 + i))
+    assert [r.getMessage() for r in emitidos] == ["repetida (+1 repetições suprimidas em 10.0s)"]
+
+def test_descarregar_emite_pendentes():
+    f, emitidos = filtro(limite=1)
+    for i in range(3):
+        f.filter(registro("repetida", i))
+    f.descarregar()
+    assert [r.getMessage() for r in emitidos] == ["repetida (+2 repetições suprimidas em 10.0s)"]
+    f.descarregar()
+    assert len(emitidos) == 1
@@ -0,0 +1,95 @@
+"""
+Seqlock de MemoriaSnapshots entre processos: um escritor publicando
+quadros de tamanhos variados e um leitor em outro processo nunca podem
+ver um quadro inconsistente que passe na verificação da sequência.
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import noc_commander_v12_melhorado as noc
+
+DURACAO = 3.0
+
+def quadro(i: int) -> bytes:
+    """JSON válido cujo tamanho varia bastante entre publicações consecutivas."""
+    return json.dumps({"i": i, "dados": "x" * (i * 7919 % 5000)}).encode("utf-8")
+
+def escrever(nome: str, parar) -> None:
+    memoria = noc.MemoriaSnapshots.anexar(nome)
+    i = 0
+    while not parar.is_set():
+        i += 1
+        estado = quadro(i) if i % 3 == 0 else None
+        memoria.publicar(quadro(i), estado, i)
+    memoria.fechar()
+
+def test_leitor_nunca_ve_quadro_inconsistente():
+    memoria = noc.MemoriaSnapshots.criar(64 * 1024)
+    contexto = multiprocessing.get_context("spawn")
+    parar = contexto.Event()
+    escritor = contexto.Process(target=escrever, args=(memoria.nome, parar))
+    escritor.start()
+    try:
+        while memoria.sequencia() == 0:
+            time.sleep(0.01)
+        
+        leituras = invalidas = 0
+        fim = time.monotonic() + DURACAO
+        while time.monotonic() < fim:
+            lido = memoria.ler(-1)
+            if lido is None:
+                continue
+            _, texto, versao, estado = lido
+            leituras += 1
+            try:
+                json.loads(texto)
+                if estado is not None:
+                    assert json.loads(estado)["i"] == versao
+            except ValueError:
+                invalidas += 1
+    finally:
+        parar.set()
+        escritor.join(timeout=10)
+        memoria.fechar()
+    
+    assert leituras > 1000
+    assert invalidas == 0
+
+class _Registrador:
+    """Struct que anota (offset, tamanho) de cada pack_into."""
+    
+    def __init__(self, estrutura, escritas):
+        self._estrutura = estrutura
+        self._escritas = escritas
+        self.size = estrutura.size
+    
+    def pack_into(self, buffer, offset, *valores):
+        self._escritas.append((offset, self.size, valores))
+        self._estrutura.pack_into(buffer, offset, *valores)
+    
+    def unpack_from(self, buffer, offset=0):
+        return self._estrutura.unpack_from(buffer, offset)
+
+def test_seq_par_e_a_ultima_escrita_e_nao_cobre_os_tamanhos(monkeypatch):
+    # Em máquinas de um núcleo a corrida acima quase nunca aparece: aqui a
+    # ordem das escritas é verificada diretamente
+    escritas = []
+    for atributo in ("_CABECALHO", "_SEQ", "_TAMANHOS"):
+        monkeypatch.setattr(noc.MemoriaSnapshots, atributo,
+                            _Registrador(getattr(noc.MemoriaSnapshots, atributo), escritas))
+    memoria = noc.MemoriaSnapshots.criar(64 * 1024)
+    try:
+        for i in range(1, 4):
+            escritas.clear()
+            memoria.publicar(quadro(i), quadro(i), i)
+            offset, tamanho, valores = escritas[-1]
+            assert (offset, tamanho) == (0, 8) and valores[0] % 2 == 0
+            assert all(valores[0] % 2 for offset, _, valores in escritas[:-1] if offset == 0)
+    finally:
+        memoria.fechar()
@@ -0,0 +1,37 @@
+"""
+SLA por hora: cada intervalo entre sondas é ponderado pelo estado da sonda
+que o abriu, o mesmo critério de observado/quedas.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import noc_commander_v12_melhorado as noc
+
+T0 = 1_700_000_000.0 - 1_700_000_000.0 % 3600
+
+def test_slos_concordam_com_disponibilidade():
+    lenta, rapida = noc.LIMITES["ping"] * 3, noc.LIMITES["ping"] / 2
+    alta, baixa = noc.LIMITES["perda_pacotes"] * 3, 0.0
+    serie = noc.SerieSLA()
+    # UP lento e com perda por 30 s, DOWN por 60 s, UP rápido por 10 s
+    serie.registrar(T0, False, lenta, alta)
+    serie.registrar(T0 + 30, True, 0.0, 100.0)
+    serie.registrar(T0 + 60, True, 0.0, 100.0)
+    serie.registrar(T0 + 90, False, rapida, baixa)
+    serie.registrar(T0 + 100, False, rapida, baixa)
+    
+    resumo = serie.resumo(T0, T0 + 100)
+    assert resumo["disponibilidade_pct"] == 40.0
+    assert resumo["latencia"]["dentro_slo_pct"] == 25.0
+    assert resumo["latencia"]["media_ms"] == round((lenta * 30 + rapida * 10) / 40, 1)
+    assert resumo["perda"]["dentro_slo_pct"] == 10.0
+
+def test_estado_da_ultima_sonda_sobrevive_a_exportacao():
+    serie = noc.SerieSLA()
+    serie.registrar(T0, False, noc.LIMITES["ping"] * 3, 0.0)
+    serie = noc.SerieSLA(serie.exportar())
+    serie.registrar(T0 + 10, False, 1.0, 0.0)
+    assert serie.resumo(T0, T0 + 10)["latencia"]["dentro_slo_pct"] == 0.0